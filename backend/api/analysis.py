@@ -1,16 +1,43 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import List, Dict, Any, Optional, Sequence, Literal, Tuple, AsyncIterator, Awaitable, Callable, Union
 import pdfplumber
+import numpy as np
+import asyncio
 import io
-import re
+import json
+import os
+import time
 
-from core.skill_extractor import extract_skills_from_text, normalize_skills
-from core.data_loader import data_loader
-from core.ai_analyzer import call_gemini_analyzer, call_gemini_coach
+from core.skill_extractor import normalize_skills, skill_extraction_cache, skill_normalization_cache
+from core.inference_pool import extract_skills_async, skill_inference_pool
+from core.data_loader import get_data_loader
+from core.ai_analyzer import (
+    call_gemini_analyzer,
+    call_gemini_coach,
+    call_gemini_combined,
+    ANALYSIS_MODE_COMBINED,
+    ANALYSIS_MODE_TWO_CALL,
+    GEMINI_ANALYSIS_MODE,
+    ItemCallback,
+)
+from core.warmup import skills_gap_warmup, ANALYSIS_SUBSYSTEMS, WARMUP_RETRY_AFTER_SECONDS
+from core.llm_cache import llm_response_cache
+from core.cv_index import get_cv_index, skill_id, SOURCE_ANALYSIS
+from core.scoring import SkillScorer, SkillSpace, demand_weight, must_have_skills
+from core.cache import make_cache_key
+from core.redaction import RedactionSession, redact, redaction_metrics, PII_REDACTION_ENABLED
+from app.utils.security_utils import get_current_user, get_optional_user
+from app.services.structured_cv_store import sync_cv_index
 
 router = APIRouter()
 
+# Jobs scraped by /api/jobs/search (see app/routes/job.py)
+SCRAPED_JOBS_FILE = "linkedin_jobs.json"
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "50"))
+BATCH_AI_TOP_K_MAX = int(os.getenv("BATCH_AI_TOP_K_MAX", "5"))
+
 class AnalysisRequest(BaseModel):
     cv_text: str
     job_description: str
@@ -21,7 +48,10 @@ class QuantitativeSkill(BaseModel):
     normalized: str
     source: str
     evidence: str
-    match_type: str
+    match_type: str = Field(..., description="exact, fuzzy, semantic or none")
+    matched_on: Optional[str] = Field(None, description="ESCO label column that matched (preferredLabel/altLabels/hiddenLabels)")
+    match_score: Optional[float] = Field(None, description="1.0 for exact matches, cosine similarity for fuzzy and semantic ones")
+    uri: Optional[str] = Field(None, description="ESCO concept URI")
 
 class MarketDemandSkill(BaseModel):
     skill: str
@@ -86,27 +116,138 @@ class FullAnalysisResponse(BaseModel):
     resume_edits: List[ResumeEdit]
     low_value_skills: List[str]
 
+# --- Streaming (/analyze/stream) events ---
+# One JSON object per stage, each validated against its own model before it
+# is written, in this order: quantitative_summary -> analyzer -> coach -> done
+# (or a single "error" event if a stage fails mid-stream), with "item" events
+# interleaved while the Gemini responses stream in.
+
+class AnalyzerStage(BaseModel):
+    ai_scores: OverallScores
+    cv_skill_profile: List[SkillProfile]
+    job_skill_profile: List[GapItem]
+    low_value_skills: List[str]
+
+class CoachStage(BaseModel):
+    ai_summary: str
+    priority_actions: List[PriorityAction]
+    learning_paths: List[LearningPath]
+    resume_edits: List[ResumeEdit]
+
+class StreamEvent(BaseModel):
+    stage: str
+    elapsed_seconds: float = Field(..., description="Seconds since the request started")
+
+class QuantitativeStageEvent(StreamEvent):
+    stage: Literal["quantitative_summary"] = "quantitative_summary"
+    data: QuantitativeAnalysisResponse
+
+class AnalyzerStageEvent(StreamEvent):
+    stage: Literal["analyzer"] = "analyzer"
+    data: AnalyzerStage
+
+class CoachStageEvent(StreamEvent):
+    stage: Literal["coach"] = "coach"
+    data: CoachStage
+
+# Array elements streamed out of the Gemini responses as soon as each one is
+# complete, validated against the model of the list it belongs to
+STREAMED_ITEM_MODELS = {
+    "cv_profile": SkillProfile,
+    "job_profile": JobRequirement,
+    "priority_actions": PriorityAction,
+    "learning_paths": LearningPath,
+    "resume_edits": ResumeEdit,
+}
+
+class ItemEvent(StreamEvent):
+    stage: Literal["item"] = "item"
+    key: str = Field(..., description="List the item belongs to (cv_profile, job_profile, priority_actions, ...)")
+    item: Union[SkillProfile, JobRequirement, PriorityAction, LearningPath, ResumeEdit]
+
+class RetryEvent(StreamEvent):
+    """The safety filter blocked the request mid-stream and it is being resent."""
+    stage: Literal["retry"] = "retry"
+    attempt: int = Field(..., description="Number of the attempt that starts now")
+    detail: str = "Discard the item events received since the last stage event."
+
+class DoneEvent(StreamEvent):
+    stage: Literal["done"] = "done"
+
+class ErrorEvent(StreamEvent):
+    stage: Literal["error"] = "error"
+    status_code: int
+    detail: str
+
+# --- Batch (/analyze/batch) ---
+
+class BatchJob(BaseModel):
+    """One job posting, same shape as the entries of linkedin_jobs.json."""
+    title: str = "Target Role"
+    company: Optional[str] = None
+    location: Optional[str] = None
+    job_link: Optional[str] = None
+    description: str = ""
+
+class RankedJob(BaseModel):
+    rank: int
+    job_index: int = Field(..., description="Position of the job in the submitted / stored list")
+    title: str
+    company: Optional[str] = None
+    location: Optional[str] = None
+    job_link: Optional[str] = None
+    overall_score: float
+    skills_breakdown: Dict[str, int]
+    matched_skills: List[str]
+    missing_skills_prioritized: List[MarketDemandSkill]
+    analyzer: Optional[AnalyzerStage] = Field(None, description="Gemini analysis, top_k jobs only")
+    coach: Optional[CoachStage] = None
+    ai_error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    cv_skills: List[QuantitativeSkill]
+    jobs: List[RankedJob]
+    skipped_jobs: List[int] = Field(default_factory=list, description="Indexes of jobs without a description or without any extractable skill (e.g. 'N/A')")
+
+# --- Recruiter side (/cvs/rank) ---
+
+class CVRankRequest(BaseModel):
+    job_description: str
+    top_n: int = Field(10, ge=1, le=100)
+
+class RankedCV(BaseModel):
+    cv_id: str = Field(..., description="Opaque id of the indexed CV (stable across requests)")
+    source: str = Field(..., description="analysis (analyzed via /analyze*), structured (/analyze-structured JSON) or upload (interview PDF)")
+    label: str
+    score: float = Field(..., description="Demand-weighted coverage of the job skills, 0-100")
+    matched_skills: List[str]
+    missing_skills: List[str]
+
+class CVRankResponse(BaseModel):
+    job_skills: List[str]
+    indexed_cvs: int
+    newly_indexed_cvs: int
+    query_ms: float = Field(..., description="Time spent in the index lookup itself")
+    results: List[RankedCV]
+
 # --- 2. INTERNAL LOGIC (Unchanged) ---
 
-async def get_quantitative_analysis(cv_text: str, job_text: str) -> QuantitativeAnalysisResponse:
-    raw_cv_skills = extract_skills_from_text(cv_text)
-    raw_job_skills = extract_skills_from_text(job_text)
-    cv_skills = normalize_skills(raw_cv_skills, data_loader)
-    job_skills = normalize_skills(raw_job_skills, data_loader)
+def _build_quantitative_report(cv_skills: List[Dict[str, Any]], job_skills: List[Dict[str, Any]],
+                               data_loader, job_text: str = "") -> QuantitativeAnalysisResponse:
     cv_skill_names = set(s['normalized'].lower() for s in cv_skills)
     job_skill_names = set(s['normalized'].lower() for s in job_skills)
     matched_names = cv_skill_names & job_skill_names
     missing_names = job_skill_names - cv_skill_names
     matched_skills_info = [s for s in cv_skills if s['normalized'].lower() in matched_names]
-    missing_skills_prioritized = []
-    for skill_name in missing_names:
-        demand_info = data_loader.get_market_demand(skill_name)
-        missing_skills_prioritized.append(demand_info)
+    scorer = SkillScorer(data_loader)
+    missing_skills_prioritized = scorer.market_demand(list(missing_names))
     missing_skills_prioritized.sort(key=lambda x: x['total_demand'], reverse=True)
-    if not job_skill_names:
-        reliable_score = 50.0
-    else:
-        reliable_score = (len(matched_names) / len(job_skill_names)) * 100
+    # Demand-weighted coverage: a matched in-demand skill counts more than a niche
+    # one, and skills the job description marks as required count MUST_HAVE_WEIGHT times
+    reliable_score = scorer.score(
+        [s['normalized'] for s in cv_skills], [s['normalized'] for s in job_skills],
+        must_have=must_have_skills(job_text, job_skills)
+    )
     return QuantitativeAnalysisResponse(
         overall_score=round(reliable_score, 2),
         skills_breakdown={
@@ -121,6 +262,88 @@ async def get_quantitative_analysis(cv_text: str, job_text: str) -> Quantitative
         job_skills=job_skills
     )
 
+async def _normalize_skills_async(skill_lists: List[List[Dict[str, Any]]], data_loader) -> List[List[Dict[str, Any]]]:
+    """
+    normalize_skills for several documents in a worker thread: fuzzy
+    (trigram) and semantic (embedding) matching are CPU-bound and must not
+    stall the event loop (other requests, /analyze/stream heartbeats).
+    """
+    return await asyncio.to_thread(lambda: [normalize_skills(skills, data_loader) for skills in skill_lists])
+
+async def get_quantitative_analysis(cv_text: str, job_text: str) -> QuantitativeAnalysisResponse:
+    # CV and job description share a single batched GLiNER pass, run on the
+    # inference pool so the event loop stays free for other requests
+    raw_cv_skills, raw_job_skills = await extract_skills_async([cv_text, job_text])
+    data_loader = get_data_loader()
+    cv_skills, job_skills = await _normalize_skills_async([raw_cv_skills, raw_job_skills], data_loader)
+    return _build_quantitative_report(cv_skills, job_skills, data_loader, job_text)
+
+def _rank_jobs(cv_skills: List[Dict[str, Any]], jobs_skills: List[List[Dict[str, Any]]],
+               data_loader, job_texts: Sequence[str] = ()) -> List[Dict[str, Any]]:
+    """
+    Coverage and gap lists of one CV against many jobs: all skill sets become
+    sparse vectors over one skill space and the scores come out of a single
+    sparse product (same scoring as get_quantitative_analysis). Returns one
+    entry per job, in input order.
+    """
+    space = SkillSpace(data_loader)
+    vectors = space.vectors([[s['normalized'] for s in skills] for skills in [cv_skills] + jobs_skills])
+    cv_vector, jobs = vectors[0], vectors[1:]
+    scorer = SkillScorer(data_loader)
+    must_have = [must_have_skills(text, skills) for text, skills in zip(job_texts, jobs_skills)] if job_texts else None
+    scores = scorer.pair_coverage(cv_vector, scorer.job_weights(space, jobs, must_have))
+
+    matched = jobs.multiply(cv_vector).tocsr()
+    missing = (jobs - matched).tocsr()
+    missing.eliminate_zeros()
+
+    # Market demand for every missing skill of every job, fetched once
+    missing_columns = np.unique(missing.indices).tolist()
+    demand = dict(zip(missing_columns, scorer.market_demand([space.labels[c] for c in missing_columns])))
+
+    cv_count = cv_vector.nnz
+    results = []
+    for row in range(jobs.shape[0]):
+        job_count = int(jobs.indptr[row + 1] - jobs.indptr[row])
+        matched_count = int(matched.indptr[row + 1] - matched.indptr[row])
+        missing_skills = [demand[c] for c in missing.indices[missing.indptr[row]:missing.indptr[row + 1]].tolist()]
+        missing_skills.sort(key=lambda x: x['total_demand'], reverse=True)
+        results.append({
+            'overall_score': round(float(scores[row]), 2),
+            'skills_breakdown': {
+                'cv_skills_count': cv_count,
+                'job_skills_count': job_count,
+                'matched_count': matched_count,
+                'missing_count': job_count - matched_count,
+            },
+            'matched_skills': space.row_labels(matched, row),
+            'missing_skills_prioritized': missing_skills,
+        })
+    return results
+
+def _check_subsystems_ready(names: Optional[List[str]] = None):
+    if skills_gap_warmup.is_ready(names):
+        return
+    if skills_gap_warmup.has_failed(names):
+        raise HTTPException(status_code=503, detail="Skills Gap Analysis failed to initialize. Check /health for details.")
+    raise HTTPException(
+        status_code=503,
+        detail="Skills Gap Analysis is warming up. Please retry shortly.",
+        headers={"Retry-After": str(WARMUP_RETRY_AFTER_SECONDS)},
+    )
+
+def require_skills_gap_ready():
+    """
+    Dependency for endpoints that need the GLiNER model and market data.
+    While the background warmup is still running, answer 503 with a
+    Retry-After hint instead of blocking the request on model loading.
+    """
+    _check_subsystems_ready(ANALYSIS_SUBSYSTEMS)
+
+def require_cv_index_ready():
+    """Same as require_skills_gap_ready, also waiting for the stored CV backfill."""
+    _check_subsystems_ready()
+
 def extract_text_from_pdf(file_stream: io.BytesIO) -> str:
     """Helper function to parse PDF file stream."""
     text = ""
@@ -131,130 +354,461 @@ def extract_text_from_pdf(file_stream: io.BytesIO) -> str:
                 text += page_text + "\n"
     return text
 
-def _sanitize_for_ai(text: str) -> str:
-    """Redact potentially sensitive content."""
-    if not text:
-        return text
-    original_len = len(text)
-    # Remove emails more aggressively
-    text = re.sub(r'[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+\.[A-Za-z0-9.-]+', '[EMAIL_REDACTED]', text)
-    # Remove phone numbers
-    text = re.sub(r'(?:\+?\d[\s.-]?){7,15}', '[PHONE_REDACTED]', text)
-    # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[URL_REDACTED]', text)
-    # Remove addresses
-    cleaned_lines = []
-    for line in text.splitlines():
-        lower = line.lower()
-        # Skip lines with address indicators
-        if any(tok in lower for tok in ["street", "st.", "avenue", "ave", "road", "rd.", "boulevard", "blvd", "apt", "suite", "unit"]):
-            continue
-        # Skip lines with zip codes
-        if re.search(r'\b\d{5}(?:-\d{4})?\b', line):
-            continue
-        cleaned_lines.append(line)
-    text = "\n".join(cleaned_lines)
-    # Remove excessive newlines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    # Remove long number sequences
-    text = re.sub(r'\b\d{9,}\b', '[NUMBER_REDACTED]', text)
-    # Limit length
-    if len(text) > 8000:
-        text = text[:8000]
-    return text
+@router.get("/metrics", tags=["Analysis"])
+async def pipeline_metrics():
+    """Inference pool queue/batch statistics, cache hit/miss counters and LLM time saved."""
+    return {
+        "skill_inference": skill_inference_pool.metrics(),
+        "llm_cache": llm_response_cache.stats(),
+        "redaction": redaction_metrics.stats(),
+        "caches": {
+            "skill_extraction": skill_extraction_cache.stats(),
+            "skill_normalization": skill_normalization_cache.stats(),
+        },
+    }
 
-@router.post("/analyze", response_model=FullAnalysisResponse, tags=["Analysis"])
-async def full_ai_analysis(
-    cv_file: UploadFile = File(..., description="The user's CV in PDF format."),
-    job_description: str = Form(..., description="The full text of the job description."),
-    job_title: str = Form("Target Role", description="The job title (e.g., 'Senior Financial Analyst').")
-):
-    """Performs a full, AI-powered analysis from a PDF CV and job description text."""
-    
+async def _read_cv_text(cv_file: UploadFile) -> str:
     try:
         cv_bytes = await cv_file.read()
         cv_text = extract_text_from_pdf(io.BytesIO(cv_bytes))
         if not cv_text:
             raise HTTPException(status_code=400, detail="Could not extract text from PDF. The file might be an image or corrupt.")
+        return cv_text
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to process PDF: {e}")
     finally:
         await cv_file.close()
 
-    sanitized_attempted = False
-    max_attempts = 3
+async def _index_analyzed_cv(current_user, filename: Optional[str], cv_text: str, cv_skills: List[Any]):
+    """
+    Adds a freshly analyzed CV to the recruiter-side index (keyed by its
+    text). Only CVs of signed-in users are indexed; anonymous uploads are
+    analyzed and forgotten. The SQLite write runs off the event loop.
+    """
+    if current_user is None:
+        return
     try:
-        quant_report = await get_quantitative_analysis(cv_text, job_description)
-        
-        attempt = 1
-        while attempt <= max_attempts:
-            try:
-                ai_analyzer_response = await call_gemini_analyzer(
-                    cv_text=cv_text,
-                    job_text=job_description,
-                    cv_skills=quant_report.cv_skills,
-                    job_skills=quant_report.job_skills
+        skills = [s.model_dump() if isinstance(s, BaseModel) else s for s in cv_skills]
+        cv_id = f"{SOURCE_ANALYSIS}:{make_cache_key(cv_text)[:16]}"
+        await asyncio.to_thread(get_cv_index().add_cv, cv_id, SOURCE_ANALYSIS, filename or cv_id, skills)
+    except Exception as e:
+        print(f"⚠️ Could not index analyzed CV: {e}")
+
+async def _call_with_safety_retry(call: Callable[[str, str], Awaitable[Dict[str, Any]]],
+                                  cv_text: str, job_description: str,
+                                  session: RedactionSession,
+                                  on_retry: Optional[Callable[[int], None]] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Runs a Gemini call on already redacted inputs. Should the safety filter
+    still block the content, retries after an aggressive redaction pass.
+    Returns the response and the CV text actually sent.
+    `on_retry` is told the next attempt number before each retry, so
+    streamed items of the blocked attempt can be discarded.
+    """
+    max_attempts = 3
+    attempt = 1
+    while True:
+        try:
+            return await call(cv_text, job_description), cv_text
+        except HTTPException as he:
+            if he.status_code != 400 or 'safety' not in he.detail.lower():
+                raise he
+            if attempt >= max_attempts:
+                # If all attempts failed, return a more helpful error
+                raise HTTPException(
+                    status_code=400,
+                    detail="The AI safety filter has blocked this content. Please ensure your CV and job description don't contain sensitive personal information (addresses, phone numbers, etc.) or potentially harmful content. Try uploading a sanitized version of your CV."
                 )
-                break
-            except HTTPException as he:
-                if he.status_code != 400 or 'safety' not in he.detail.lower():
-                    raise he
-                if attempt >= max_attempts:
-                    # If all attempts failed, return a more helpful error
-                    raise HTTPException(
-                        status_code=400,
-                        detail="The AI safety filter has blocked this content. Please ensure your CV and job description don't contain sensitive personal information (addresses, phone numbers, etc.) or potentially harmful content. Try uploading a sanitized version of your CV."
-                    )
-                # Try sanitizing more aggressively
-                cv_text = _sanitize_for_ai(cv_text)
-                job_description = _sanitize_for_ai(job_description)
-                sanitized_attempted = True
-                attempt += 1
-                print(f"⚠️ Safety filter triggered, retrying with sanitization (attempt {attempt}/{max_attempts})")
-                continue
-
-        cv_profile_map = {p['skill'].lower(): p for p in ai_analyzer_response['cv_profile']}
-        job_gap_profile = []
+            # Try sanitizing more aggressively
+            redaction_metrics.record_safety_retry()
+            cv_text = redact(session, cv_text, aggressive=True)
+            job_description = redact(session, job_description, aggressive=True)
+            attempt += 1
+            print(f"⚠️ Safety filter triggered, retrying with sanitization (attempt {attempt}/{max_attempts})")
+            if on_retry is not None:
+                on_retry(attempt)
+
+async def _run_analyzer(cv_text: str, job_description: str, cv_skills: List[QuantitativeSkill],
+                        job_skills: List[QuantitativeSkill], session: RedactionSession,
+                        on_item: Optional[ItemCallback] = None,
+                        on_retry: Optional[Callable[[int], None]] = None) -> Tuple[Dict[str, Any], str]:
+    return await _call_with_safety_retry(
+        lambda cv, job: call_gemini_analyzer(
+            cv_text=cv,
+            job_text=job,
+            cv_skills=cv_skills,
+            job_skills=job_skills,
+            on_item=on_item
+        ),
+        cv_text, job_description, session, on_retry
+    )
+
+def _redact_skills(session: RedactionSession, skills: List[QuantitativeSkill]) -> List[QuantitativeSkill]:
+    """Evidence windows are cut from the raw text and may hold PII too."""
+    if not PII_REDACTION_ENABLED:
+        return skills
+    return [s.model_copy(update={"evidence": session.redact(s.evidence).text}) for s in skills]
+
+def _rehydrating(session: RedactionSession, on_item: Optional[ItemCallback]) -> Optional[ItemCallback]:
+    if on_item is None:
+        return None
+    return lambda key, value: on_item(key, session.rehydrate_value(value))
+
+def _build_gap_profile(ai_analyzer_response: Dict[str, Any]) -> List[GapItem]:
+    cv_profile_map = {p['skill'].lower(): p for p in ai_analyzer_response['cv_profile']}
+    job_gap_profile = []
+    job_market_data = get_data_loader().get_market_demand_batch([r['skill'] for r in ai_analyzer_response['job_profile']])
+    
+    for job_req, market_data in zip(ai_analyzer_response['job_profile'], job_market_data):
+        req_skill_lower = job_req['skill'].lower()
+        cv_match = cv_profile_map.get(req_skill_lower)
         
-        for job_req in ai_analyzer_response['job_profile']:
-            req_skill_lower = job_req['skill'].lower()
-            cv_match = cv_profile_map.get(req_skill_lower)
-            
-            proficiency_you = cv_match['proficiency_you'] if cv_match else 0
-            proficiency_req = job_req['proficiency_req']
-            
-            market_data = data_loader.get_market_demand(job_req['skill'])
-            
-            job_gap_profile.append(GapItem(
-                skill=job_req['skill'],
-                proficiency_req=proficiency_req,
-                proficiency_you=proficiency_you,
-                gap=(proficiency_req - proficiency_you),
-                is_must_have=job_req.get('is_must_have', False),
-                market_demand=market_data
-            ))
+        proficiency_you = cv_match['proficiency_you'] if cv_match else 0
+        proficiency_req = job_req['proficiency_req']
         
-        job_gap_profile.sort(key=lambda x: (not x.is_must_have, -x.gap, -x.market_demand.total_demand))
+        job_gap_profile.append(GapItem(
+            skill=job_req['skill'],
+            proficiency_req=proficiency_req,
+            proficiency_you=proficiency_you,
+            gap=(proficiency_req - proficiency_you),
+            is_must_have=job_req.get('is_must_have', False),
+            market_demand=market_data
+        ))
+    
+    job_gap_profile.sort(key=lambda x: (not x.is_must_have, -x.gap, -x.market_demand.total_demand))
+    return job_gap_profile
 
-        critical_gaps_for_coach = [g.dict() for g in job_gap_profile if g.gap > 0][:10]
+def _analyzer_stage(ai_analyzer_response: Dict[str, Any]) -> AnalyzerStage:
+    return AnalyzerStage(
+        ai_scores=ai_analyzer_response['overall_scores'],
+        cv_skill_profile=ai_analyzer_response['cv_profile'],
+        job_skill_profile=_build_gap_profile(ai_analyzer_response),
+        low_value_skills=ai_analyzer_response.get('low_value_skills', [])
+    )
 
-        ai_coach_response = await call_gemini_coach(
-            job_title=job_title,
-            gap_list=critical_gaps_for_coach,
-            low_value_skills=ai_analyzer_response.get('low_value_skills', []),
-            cv_text=cv_text
+def _coach_stage(ai_coach_response: Dict[str, Any]) -> CoachStage:
+    # Lists may be missing or cut short when the response was truncated
+    return CoachStage(
+        ai_summary=ai_coach_response['summary'],
+        priority_actions=ai_coach_response.get('priority_actions', []),
+        learning_paths=ai_coach_response.get('learning_paths', []),
+        resume_edits=ai_coach_response.get('resume_edits', [])
+    )
+
+async def _run_coach(job_title: str, analyzer: AnalyzerStage, cv_text: str,
+                     on_item: Optional[ItemCallback] = None) -> Dict[str, Any]:
+    critical_gaps_for_coach = [g.model_dump() for g in analyzer.job_skill_profile if g.gap > 0][:10]
+
+    ai_coach_response = await call_gemini_coach(
+        job_title=job_title,
+        gap_list=critical_gaps_for_coach,
+        low_value_skills=analyzer.low_value_skills,
+        cv_text=cv_text,
+        on_item=on_item
+    )
+    return ai_coach_response
+
+def _resolve_analysis_mode(analysis_mode: Optional[str]) -> str:
+    mode = (analysis_mode or GEMINI_ANALYSIS_MODE).lower()
+    if mode not in (ANALYSIS_MODE_TWO_CALL, ANALYSIS_MODE_COMBINED):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis_mode '{mode}'. Use '{ANALYSIS_MODE_TWO_CALL}' or '{ANALYSIS_MODE_COMBINED}'."
+        )
+    return mode
+
+async def _ai_stages(cv_text: str, job_description: str, job_title: str,
+                     quant_report: QuantitativeAnalysisResponse, mode: str,
+                     on_item: Optional[ItemCallback] = None,
+                     on_retry: Optional[Callable[[int], None]] = None) -> AsyncIterator[Union[AnalyzerStage, CoachStage]]:
+    """
+    Yields the analyzer stage, then the coach stage.
+    two-call: analyzer request, then a coach request fed with the local gap profile.
+    combined: one schema-constrained request; gaps and market demand are still
+    computed locally from its analyzer half.
+    `on_item` sees every list element of the Gemini output as it streams in;
+    `on_retry` fires when a safety block restarts the request, after which
+    the items seen since the last stage are stale.
+
+    PII is redacted once, before the first request; tokens the model quotes
+    back (e.g. in resume edit snippets) are re-hydrated locally.
+    """
+    session = RedactionSession()
+    cv_text = redact(session, cv_text)
+    job_description = redact(session, job_description)
+    cv_skills = _redact_skills(session, quant_report.cv_skills)
+    job_skills = _redact_skills(session, quant_report.job_skills)
+    on_item = _rehydrating(session, on_item)
+
+    if mode == ANALYSIS_MODE_COMBINED:
+        response, _ = await _call_with_safety_retry(
+            lambda cv, job: call_gemini_combined(
+                cv, job, job_title, cv_skills, job_skills, on_item=on_item
+            ),
+            cv_text, job_description, session, on_retry
         )
+        response = session.rehydrate_value(response)
+        yield _analyzer_stage(response)
+        yield _coach_stage(response)
+        return
+
+    ai_analyzer_response, sent_cv_text = await _run_analyzer(
+        cv_text, job_description, cv_skills, job_skills, session, on_item, on_retry
+    )
+    analyzer = _analyzer_stage(session.rehydrate_value(ai_analyzer_response))
+    yield analyzer
+    ai_coach_response = await _run_coach(job_title, analyzer, sent_cv_text, on_item)
+    yield _coach_stage(session.rehydrate_value(ai_coach_response))
+
+@router.post("/analyze", response_model=FullAnalysisResponse, tags=["Analysis"], dependencies=[Depends(require_skills_gap_ready)])
+async def full_ai_analysis(
+    cv_file: UploadFile = File(..., description="The user's CV in PDF format."),
+    job_description: str = Form(..., description="The full text of the job description."),
+    job_title: str = Form("Target Role", description="The job title (e.g., 'Senior Financial Analyst')."),
+    analysis_mode: Optional[str] = Form(None, description="'two-call' or 'combined' (defaults to GEMINI_ANALYSIS_MODE)."),
+    current_user = Depends(get_optional_user)
+):
+    """Performs a full, AI-powered analysis from a PDF CV and job description text."""
+    
+    mode = _resolve_analysis_mode(analysis_mode)
+    cv_text = await _read_cv_text(cv_file)
+
+    try:
+        quant_report = await get_quantitative_analysis(cv_text, job_description)
+        await _index_analyzed_cv(current_user, cv_file.filename, cv_text, quant_report.cv_skills)
+        analyzer, coach = [stage async for stage in _ai_stages(cv_text, job_description, job_title, quant_report, mode)]
 
         return FullAnalysisResponse(
             quantitative_summary=quant_report,
-            ai_scores=ai_analyzer_response['overall_scores'],
-            ai_summary=ai_coach_response['summary'],
-            cv_skill_profile=ai_analyzer_response['cv_profile'],
-            job_skill_profile=job_gap_profile,
-            priority_actions=ai_coach_response['priority_actions'],
-            learning_paths=ai_coach_response['learning_paths'],
-            resume_edits=ai_coach_response['resume_edits'],
-            low_value_skills=ai_analyzer_response.get('low_value_skills', [])
+            **analyzer.model_dump(),
+            **coach.model_dump()
+        )
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Internal analysis failure: " + str(e))
+
+def _format_event(event: StreamEvent, sse: bool) -> str:
+    payload = event.model_dump_json()
+    if sse:
+        return f"event: {event.stage}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@router.post("/analyze/stream", tags=["Analysis"], dependencies=[Depends(require_skills_gap_ready)])
+async def stream_ai_analysis(
+    request: Request,
+    cv_file: UploadFile = File(..., description="The user's CV in PDF format."),
+    job_description: str = Form(..., description="The full text of the job description."),
+    job_title: str = Form("Target Role", description="The job title (e.g., 'Senior Financial Analyst')."),
+    analysis_mode: Optional[str] = Form(None, description="'two-call' or 'combined' (defaults to GEMINI_ANALYSIS_MODE)."),
+    current_user = Depends(get_optional_user)
+):
+    """
+    Streaming variant of /analyze. Emits each stage as soon as it is ready:
+    the quantitative summary after local extraction, then the analyzer scores
+    and gap profile, then the coach output. In between, "item" events carry
+    each profile entry / action / learning path / resume edit as soon as
+    Gemini has streamed it; a "retry" event means the safety filter blocked
+    the request and the items since the last stage event will be resent. Newline-delimited JSON by default,
+    Server-Sent Events when the client sends `Accept: text/event-stream`.
+    """
+    started = time.perf_counter()
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    mode = _resolve_analysis_mode(analysis_mode)
+    # PDF problems are still reported as a plain 400 before the stream starts
+    cv_text = await _read_cv_text(cv_file)
+
+    # Stages and streamed list items are produced by one task and written by
+    # the response generator in arrival order
+    queue: "asyncio.Queue[Optional[StreamEvent]]" = asyncio.Queue()
+    elapsed = lambda: round(time.perf_counter() - started, 3)
+
+    def on_item(key: str, value: Any):
+        item_model = STREAMED_ITEM_MODELS.get(key)
+        if item_model is None:
+            return
+        try:
+            queue.put_nowait(ItemEvent(elapsed_seconds=elapsed(), key=key, item=item_model.model_validate(value)))
+        except ValidationError:
+            pass # The stage event carries the validated lists anyway
+
+    def on_retry(attempt: int):
+        queue.put_nowait(RetryEvent(elapsed_seconds=elapsed(), attempt=attempt))
+
+    async def produce():
+        try:
+            quant_report = await get_quantitative_analysis(cv_text, job_description)
+            await _index_analyzed_cv(current_user, cv_file.filename, cv_text, quant_report.cv_skills)
+            queue.put_nowait(QuantitativeStageEvent(elapsed_seconds=elapsed(), data=quant_report))
+
+            async for stage in _ai_stages(cv_text, job_description, job_title, quant_report, mode, on_item, on_retry):
+                event_type = AnalyzerStageEvent if isinstance(stage, AnalyzerStage) else CoachStageEvent
+                queue.put_nowait(event_type(elapsed_seconds=elapsed(), data=stage))
+            queue.put_nowait(DoneEvent(elapsed_seconds=elapsed()))
+        except HTTPException as he:
+            queue.put_nowait(ErrorEvent(elapsed_seconds=elapsed(), status_code=he.status_code, detail=str(he.detail)))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            queue.put_nowait(ErrorEvent(elapsed_seconds=elapsed(), status_code=500, detail="Internal analysis failure: " + str(e)))
+        finally:
+            queue.put_nowait(None)
+
+    async def events() -> AsyncIterator[str]:
+        producer = asyncio.create_task(produce())
+        try:
+            while (event := await queue.get()) is not None:
+                yield _format_event(event, sse)
+        finally:
+            producer.cancel() # Client went away
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _load_batch_jobs(jobs_json: Optional[str]) -> List[BatchJob]:
+    """Jobs from the request, or the last scraped ones when none are given."""
+    try:
+        if jobs_json:
+            raw_jobs = json.loads(jobs_json)
+        else:
+            with open(SCRAPED_JOBS_FILE, "r", encoding="utf-8") as f:
+                raw_jobs = json.load(f)
+        jobs = TypeAdapter(List[BatchJob]).validate_python(raw_jobs)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No jobs given and no scraped jobs found. Run a job search first.")
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid jobs list: {e}")
+    if not jobs:
+        raise HTTPException(status_code=400, detail="The jobs list is empty.")
+    if len(jobs) > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_JOBS} jobs can be analyzed at once.")
+    return jobs
+
+async def _ai_analysis_for_job(ranked: RankedJob, cv_text: str, job: BatchJob,
+                               quant_report: QuantitativeAnalysisResponse, mode: str):
+    """Fills in the Gemini stages of one ranked job; a failure only affects that job."""
+    try:
+        ranked.analyzer, ranked.coach = [
+            stage async for stage in _ai_stages(cv_text, job.description, job.title, quant_report, mode)
+        ]
+    except HTTPException as he:
+        ranked.ai_error = str(he.detail)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        ranked.ai_error = "Internal analysis failure: " + str(e)
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse, tags=["Analysis"], dependencies=[Depends(require_skills_gap_ready)])
+async def batch_ai_analysis(
+    cv_file: UploadFile = File(..., description="The user's CV in PDF format."),
+    jobs: Optional[str] = Form(None, description="JSON list of jobs ({title, company, location, job_link, description}). Defaults to the last scraped jobs."),
+    top_k: int = Form(0, ge=0, description=f"Run the Gemini analysis for the best k jobs (at most {BATCH_AI_TOP_K_MAX})."),
+    analysis_mode: Optional[str] = Form(None, description="'two-call' or 'combined' (defaults to GEMINI_ANALYSIS_MODE)."),
+    current_user = Depends(get_optional_user)
+):
+    """
+    Ranks one CV against many jobs. The CV is parsed and its skills extracted
+    once, all job descriptions go through the same batched extraction, and
+    coverage / gap lists for every job come out of one vectorized pass.
+    Gemini analysis is only run for the top_k jobs, concurrently.
+    """
+    mode = _resolve_analysis_mode(analysis_mode)
+    batch_jobs = _load_batch_jobs(jobs)
+    cv_text = await _read_cv_text(cv_file)
+
+    try:
+        indexes = [i for i, job in enumerate(batch_jobs) if job.description.strip()]
+        skipped = [i for i, job in enumerate(batch_jobs) if not job.description.strip()]
+        raw_skills = await extract_skills_async([cv_text] + [batch_jobs[i].description for i in indexes])
+        data_loader = get_data_loader()
+        cv_skills, *jobs_skills = await _normalize_skills_async(raw_skills, data_loader)
+        await _index_analyzed_cv(current_user, cv_file.filename, cv_text, cv_skills)
+        # Nothing to score a job on without skills (a neutral score would outrank real matches)
+        skipped = sorted(skipped + [indexes[n] for n, skills in enumerate(jobs_skills) if not skills])
+        kept = [n for n, skills in enumerate(jobs_skills) if skills]
+        indexes, jobs_skills = [indexes[n] for n in kept], [jobs_skills[n] for n in kept]
+        job_texts = [batch_jobs[i].description for i in indexes]
+        scores = await asyncio.to_thread(_rank_jobs, cv_skills, jobs_skills, data_loader, job_texts) if indexes else []
+
+        order = sorted(range(len(indexes)),
+                       key=lambda i: (-scores[i]['overall_score'], -scores[i]['skills_breakdown']['matched_count'], i))
+        ranked_jobs = []
+        for rank, i in enumerate(order, start=1):
+            job = batch_jobs[indexes[i]]
+            ranked_jobs.append(RankedJob(
+                rank=rank,
+                job_index=indexes[i],
+                title=job.title,
+                company=job.company,
+                location=job.location,
+                job_link=job.job_link,
+                **scores[i]
+            ))
+
+        top = order[:min(top_k, BATCH_AI_TOP_K_MAX)]
+        await asyncio.gather(*(
+            _ai_analysis_for_job(
+                ranked_jobs[rank], cv_text, batch_jobs[indexes[i]],
+                _build_quantitative_report(cv_skills, jobs_skills[i], data_loader, job_texts[i]), mode
+            )
+            for rank, i in enumerate(top)
+        ))
+
+        return BatchAnalysisResponse(cv_skills=cv_skills, jobs=ranked_jobs, skipped_jobs=skipped)
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="Internal analysis failure: " + str(e))
+
+@router.post("/cvs/rank", response_model=CVRankResponse, tags=["Analysis"],
+             dependencies=[Depends(get_current_user), Depends(require_cv_index_ready)])
+async def rank_stored_cvs(request: CVRankRequest):
+    """
+    Recruiter side: ranks the stored CVs against a job description by
+    demand-weighted coverage of its skills. Only the job description goes
+    through skill extraction; CVs come from the inverted index, which is
+    filled as CVs are analyzed and picks up new stored CV files and
+    structured CV records with dictionary matching (never GLiNER or
+    Gemini). Requires a signed-in user; results carry opaque CV ids, never
+    stored file names.
+    """
+    if not request.job_description.strip():
+        raise HTTPException(status_code=400, detail="job_description is empty.")
+    try:
+        data_loader = get_data_loader()
+        cv_index = await asyncio.to_thread(get_cv_index)
+        newly_indexed = await asyncio.to_thread(cv_index.sync_stored_cvs, data_loader)
+        newly_indexed += await sync_cv_index(cv_index, data_loader)
+
+        (raw_job_skills,) = await extract_skills_async([request.job_description])
+        (job_skills,) = await _normalize_skills_async([raw_job_skills], data_loader)
+        scorer = SkillScorer(data_loader)
+        demand = scorer.skill_demand([s['normalized'] for s in job_skills])
+        must_have = set(must_have_skills(request.job_description, job_skills))
+        weights = {
+            skill_id(s): demand_weight(d) * (scorer.must_have_weight if s['normalized'] in must_have else 1.0)
+            for s, d in zip(job_skills, demand.tolist())
+        }
+
+        start = time.perf_counter()
+        results = cv_index.rank(job_skills, weights, request.top_n)
+        query_ms = (time.perf_counter() - start) * 1000
+
+        return CVRankResponse(
+            job_skills=list(dict.fromkeys(s['normalized'] for s in job_skills)),
+            indexed_cvs=len(cv_index.documents),
+            newly_indexed_cvs=newly_indexed,
+            query_ms=round(query_ms, 3),
+            results=results
         )
 
     except HTTPException as he:
@@ -262,4 +816,4 @@ async def full_ai_analysis(
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail="Internal analysis failure: " + str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal ranking failure: " + str(e))
@@ -15,6 +15,8 @@ from .routes.service import router as service_router
 from .routes.job import router as job_router
 from .middleware.logging import logging_middleware
 from .routes.cv_tools import router as cv_router
+from .services.structured_cv_store import migrate_legacy_files
+from .services.blob_store import prune_blobs
 from .middleware.security import (
     limiter,
     SecurityHeadersMiddleware,
@@ -22,6 +24,7 @@ from .middleware.security import (
     InputSanitizationMiddleware,
 )
 # Import Skills Gap Analysis components
+import asyncio
 import sys
 import os
 from dotenv import load_dotenv
@@ -34,14 +37,14 @@ print(f"🔧 Loading .env from: {env_path}")
 # Add parent directory to path to import from core, api, etc.
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# ⚠️ TEMPORARY: Skills Gap Analysis disabled for faster development
-# TODO: Re-enable for production by setting SKILLS_GAP_ENABLED = True
-SKILLS_GAP_ENABLED = False
+# Skills Gap Analysis is on by default. The GLiNER model and market data are
+# loaded lazily by a background warmup task, so startup stays fast either way;
+# set SKILLS_GAP_ENABLED=false to leave the routes out entirely.
+SKILLS_GAP_ENABLED = os.getenv("SKILLS_GAP_ENABLED", "true").lower() == "true"
 
 if SKILLS_GAP_ENABLED:
     try:
-        from core.skill_extractor import gliner_extractor
-        from core.data_loader import data_loader
+        from core.warmup import skills_gap_warmup
         from api import analysis
         # Check if Gemini is actually initialized
         from core.ai_analyzer import model as gemini_model
@@ -51,14 +54,12 @@ if SKILLS_GAP_ENABLED:
     except ImportError as e:
         print(f"⚠️  Skills Gap Analysis not available: {e}")
         SKILLS_GAP_ENABLED = False
-        gliner_extractor = None
-        data_loader = None
+        skills_gap_warmup = None
         analysis = None
         gemini_model = None
 else:
-    print("⚠️  Skills Gap Analysis DISABLED for development")
-    gliner_extractor = None
-    data_loader = None
+    print("⚠️  Skills Gap Analysis DISABLED (SKILLS_GAP_ENABLED=false)")
+    skills_gap_warmup = None
     analysis = None
     gemini_model = None
 
@@ -96,23 +97,28 @@ async def lifespan(app: FastAPI):
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"⚠️  Database initialization warning: {e}")
+
+    # Structured CVs used to be timestamped JSON files; import any not yet in the database
+    try:
+        await migrate_legacy_files()
+    except Exception as e:
+        print(f"⚠️  Legacy structured CV import skipped: {e}")
+
+    # Drop uploaded CV files past BLOB_TTL_SECONDS or beyond the store limits
+    try:
+        await asyncio.to_thread(prune_blobs)
+    except Exception as e:
+        print(f"⚠️  Blob store pruning skipped: {e}")
     
-    # Initialize Skills Gap Analysis models
+    # Warm up Skills Gap Analysis models in the background; /api/analyze
+    # answers 503 + Retry-After until they are loaded
     if SKILLS_GAP_ENABLED:
-        try:
-            print(f"📊 Loaded {len(data_loader.esco_df)} ESCO skills from market data")
-            print(f"🤖 GLiNER model '{gliner_extractor.model_name}' loaded and ready")
-            
-            # Check Gemini model status
-            if gemini_model is not None:
-                print("✅ Gemini AI model initialized successfully")
-            else:
-                print("❌ Gemini AI model NOT initialized - Skills Gap Analysis will fail")
-                print("   Check your GOOGLE_API_KEY or GEMINI_API_KEY in .env file")
-            
-            print("✅ Skills Gap Analysis ready")
-        except Exception as e:
-            print(f"⚠️  Skills Gap Analysis initialization warning: {e}")
+        if gemini_model is not None:
+            print("✅ Gemini AI model initialized successfully")
+        else:
+            print("❌ Gemini AI model NOT initialized - Skills Gap Analysis will fail")
+            print("   Check your GOOGLE_API_KEY or GEMINI_API_KEY in .env file")
+        skills_gap_warmup.start()
     
     print("=" * 60)
     print("📍 Server: http://localhost:8000")
@@ -124,6 +130,9 @@ async def lifespan(app: FastAPI):
     
     # Cleanup on shutdown
     print("🛑 Server shutting down...")
+    if SKILLS_GAP_ENABLED:
+        from core.inference_pool import skill_inference_pool
+        await skill_inference_pool.shutdown()
 
 app = FastAPI(
     title="Unified Backend Service - Auth, Services & Skills Gap Analysis",
@@ -190,7 +199,11 @@ async def root():
         "services": "✅ Available",
         "jobs": "✅ Available",
         "cv_tools": "✅ Available",
-        "skills_gap_analysis": "✅ Available" if SKILLS_GAP_ENABLED else "❌ Not Available"
+        "skills_gap_analysis": (
+            "❌ Not Available" if not SKILLS_GAP_ENABLED
+            else "✅ Available" if skills_gap_warmup.is_ready()
+            else "⏳ Warming up"
+        )
     }
     return {
         "message": "Welcome to the Unified Backend API",
@@ -220,16 +233,14 @@ async def health():
     
     # Check Skills Gap Analysis
     if SKILLS_GAP_ENABLED:
-        try:
-            skills_available = data_loader is not None and len(data_loader.esco_df) > 0
-            model_loaded = gliner_extractor is not None
-            health_status["services"]["skills_gap"] = {
-                "status": "up" if (skills_available and model_loaded) else "degraded",
-                "esco_skills_loaded": len(data_loader.esco_df) if data_loader else 0,
-                "model_loaded": model_loaded
-            }
-        except Exception as e:
-            health_status["services"]["skills_gap"] = f"error: {str(e)}"
+        skills_gap = skills_gap_warmup.status()
+        skills_gap["gemini_initialized"] = gemini_model is not None
+        if skills_gap["status"] == "ready":
+            from core.data_loader import get_data_loader
+            skills_gap["esco_skills_loaded"] = get_data_loader().esco_count
+        else:
+            health_status["status"] = "degraded"
+        health_status["services"]["skills_gap"] = skills_gap
     else:
         health_status["services"]["skills_gap"] = "not_enabled"
     
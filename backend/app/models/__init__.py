@@ -2,5 +2,6 @@
 Database models module
 """
 from .user import User, Interview
+from .structured_cv import StructuredCV
 
-__all__ = ["User", "Interview"]
+__all__ = ["User", "Interview", "StructuredCV"]
@@ -0,0 +1,22 @@
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, LargeBinary, Index
+from ..database.connection import Base
+
+class StructuredCV(Base):
+    """A structured CV and its analysis; payloads are zlib-compressed JSON."""
+    __tablename__ = "structured_cvs"
+    # "Latest CV of a user" is one descending walk of this index
+    __table_args__ = (Index("ix_structured_cvs_user_created", "user_id", "created_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    # SHA-256 of the uploaded file bytes (or of the raw CV text); same as its blob id
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+    job_description: Mapped[str] = mapped_column(Text, nullable=True)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    analysis: Mapped[bytes] = mapped_column(LargeBinary, nullable=True)
+    # File name of a record imported from the old JSON files (makes the import idempotent)
+    legacy_name: Mapped[str] = mapped_column(String(255), unique=True, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -7,88 +7,49 @@ from google import generativeai as genai
 import json
 import re
 import os
+import hashlib
 import mimetypes
 from datetime import datetime
 
+from core.cache import TieredCache, make_cache_key
+from .gemini_transport import TRANSFER_REUSED, FileProcessingError, gemini_file_transport
 
-def parse_and_analyze_cv(cv_input, job_description: str, api_key: str, links: list = None) -> dict:
-    """
-    Parse CV (from file or text) into structured data AND analyze it in a single API call.
-    Uses HYBRID approach: PDF visual analysis + extracted links metadata.
-    
-    Args:
-        cv_input: Either a file path (str) to PDF file, or raw CV text (str)
-        job_description: The job description to match against (optional)
-        api_key: Gemini API key
-        links: List of URLs/links found in the CV (optional, recommended for PDFs)
-    
-    Returns:
-        dict: Combined result with structured_data and analysis
-    """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    
-    # Determine if input is a file path or text
-    is_file = False
-    cv_text = None
-    uploaded_file = None
-    
-    if isinstance(cv_input, str):
-        if os.path.isfile(cv_input):
-            is_file = True
-            print(f"   📄 Processing PDF file: {cv_input}")
-            
-            # Get file type
-            mime_type, _ = mimetypes.guess_type(cv_input)
-            if mime_type is None:
-                ext = os.path.splitext(cv_input)[1].lower()
-                mime_map = {
-                    '.pdf': 'application/pdf',
-                    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                    '.doc': 'application/msword',
-                    '.txt': 'text/plain'
-                }
-                mime_type = mime_map.get(ext, 'application/octet-stream')
-            
-            print(f"   📎 MIME type: {mime_type}")
-            
-            # Upload file to Gemini for visual analysis
-            try:
-                uploaded_file = genai.upload_file(cv_input, mime_type=mime_type)
-                print(f"   ✅ File uploaded to Gemini: {uploaded_file.name}")
-                print(f"   ⏳ Waiting for file to be processed...")
-                
-                # Wait for file to be processed
-                import time
-                while uploaded_file.state.name == "PROCESSING":
-                    time.sleep(2)
-                    uploaded_file = genai.get_file(uploaded_file.name)
-                
-                if uploaded_file.state.name == "FAILED":
-                    print(f"   ❌ File processing failed: {uploaded_file.state}")
-                    return {
-                        'status': 'error',
-                        'message': 'File processing failed on Gemini API'
-                    }
-                
-                print(f"   ✅ File processing complete: {uploaded_file.state.name}")
-                
-            except Exception as e:
-                print(f"   ❌ Error uploading file to Gemini: {str(e)}")
-                return {
-                    'status': 'error',
-                    'message': f'Failed to upload file to Gemini: {str(e)}'
-                }
-        else:
-            # It's text content
-            cv_text = cv_input
-            print(f"   📝 Processing text content ({len(cv_text)} characters)")
-    else:
-        cv_text = str(cv_input)
-    
-    if links:
-        print(f"   🔗 Including {len(links)} extracted links as metadata")
-    
+GEMINI_CV_MODEL_NAME = "gemini-2.5-flash-lite"
+
+
+def _guess_mime_type(file_path: str) -> str:
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if mime_type is None:
+        ext = os.path.splitext(file_path)[1].lower()
+        mime_map = {
+            '.pdf': 'application/pdf',
+            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            '.doc': 'application/msword',
+            '.txt': 'text/plain'
+        }
+        mime_type = mime_map.get(ext, 'application/octet-stream')
+    return mime_type
+
+
+def _parse_response_json(response_text: str) -> dict:
+    """Strips an optional markdown code fence and decodes the JSON object."""
+    response_text = response_text.strip()
+    json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
+    if json_match:
+        response_text = json_match.group(1).strip()
+    return json.loads(response_text)
+
+
+def _is_keyword_in_text(keyword, text):
+    escaped_keyword = re.escape(keyword.lower())
+    pattern = rf'\b{escaped_keyword}\b'
+    return bool(re.search(pattern, text.lower()))
+
+
+def _build_prompt(is_file: bool, cv_text: str, job_description: str, links: list = None,
+                  current_date: str = None) -> str:
+    """Parsing + analysis prompt; the file-based one lets Gemini see the visual layout."""
+    current_date = current_date or datetime.now().strftime("%B %d, %Y")
     # Build job context
     is_job_desciption = job_description and job_description.strip()
     if is_job_desciption:
@@ -149,9 +110,8 @@ When you see text that appears to be a profile name or icon, check if it corresp
 """
     
     # Build prompt based on input type
-    if is_file and uploaded_file:
+    if is_file:
         # File-based prompt (Gemini can see the visual layout)
-        current_date = datetime.now().strftime("%B %d, %Y")
         prompt = f"""
 **CONTEXT**: Today's date is {current_date}. Use this to calculate experience durations, graduation timelines, and determine if dates are current or past.
 
@@ -427,7 +387,6 @@ REMEMBER:
 """
     else:
         # Text-based prompt (fallback for non-PDF or text input)
-        current_date = datetime.now().strftime("%B %d, %Y")
         prompt = f"""
 **CONTEXT**: Today's date is {current_date}. Use this to calculate experience durations, graduation timelines, and determine if dates are current or past.
 
@@ -650,96 +609,201 @@ REMEMBER:
 - Only exceptional CVs deserve 9-10/10
 - Be specific with exact field locations
 """
+    return prompt
+
+
+def _prompt_version() -> str:
+    """Fingerprint of the prompt templates (every variant, inputs as placeholders) and model."""
+    templates = [
+        _build_prompt(is_file, "{cv_text}", job_description, ["{link}"], current_date="{current_date}")
+        for is_file in (True, False) for job_description in ("", "{job_description}")
+    ]
+    return make_cache_key(GEMINI_CV_MODEL_NAME, templates, STRUCTURED_RESULT_VERSION)[:16]
+
+
+# Bump when _build_result output changes; prompt edits change PROMPT_VERSION by themselves
+STRUCTURED_RESULT_VERSION = 1
+PROMPT_VERSION = _prompt_version()
+
+# Structured analyses keyed by CV content hash + normalized job description +
+# PROMPT_VERSION. Set STRUCTURED_CACHE_DB to an empty string to keep the cache
+# in memory only.
+STRUCTURED_CACHE_ENABLED = os.getenv("STRUCTURED_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+STRUCTURED_CACHE_TTL_SECONDS = float(os.getenv("STRUCTURED_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+STRUCTURED_CACHE_MEMORY_ITEMS = int(os.getenv("STRUCTURED_CACHE_MEMORY_ITEMS", "128"))
+STRUCTURED_CACHE_DISK_ITEMS = int(os.getenv("STRUCTURED_CACHE_DISK_ITEMS", "2000"))
+STRUCTURED_CACHE_DB = os.getenv("STRUCTURED_CACHE_DB", os.path.join("data", "cache", "structured_cv_cache.sqlite3"))
+
+structured_analysis_cache = TieredCache(
+    "structured_analysis",
+    max_memory_items=STRUCTURED_CACHE_MEMORY_ITEMS if STRUCTURED_CACHE_ENABLED else 0,
+    db_path=(STRUCTURED_CACHE_DB or None) if STRUCTURED_CACHE_ENABLED else None,
+    max_disk_items=STRUCTURED_CACHE_DISK_ITEMS,
+    ttl_seconds=STRUCTURED_CACHE_TTL_SECONDS,
+)
+structured_analysis_cache.ensure_version(PROMPT_VERSION)
+
+
+def normalize_job_description(job_description: str) -> str:
+    """Whitespace-insensitive form of a job description, for cache keys."""
+    return " ".join((job_description or "").split())
+
+
+def structured_cache_key(cv_content, job_description: str) -> str:
+    """Cache key of a CV (file bytes or text) analyzed against a job description."""
+    if isinstance(cv_content, str):
+        cv_content = cv_content.encode("utf-8")
+    return make_cache_key(hashlib.sha256(cv_content).hexdigest(), normalize_job_description(job_description), PROMPT_VERSION)
+
+
+def _build_result(parsed: dict, cv_text: str, has_job_description: bool) -> dict:
+    """Final result (structured data + scored analysis) from the decoded Gemini JSON."""
+    # Extract structured CV and analysis
+    structured_cv = parsed.get('structured_cv', {})
+    analysis_raw = parsed.get('analysis', {})
+    
+    # Validate keywords for ATS analysis
+    cv_text_lower = json.dumps(structured_cv).lower()
+    ats_analysis = analysis_raw.get("ats_analysis", {})
+    
+    validated_keyword_matches = []
+    validated_missing_keywords = []
+    
+    for keyword in ats_analysis.get("keyword_matches", []):
+        if _is_keyword_in_text(keyword, cv_text_lower):
+            validated_keyword_matches.append(keyword)
+        else:
+            validated_missing_keywords.append(keyword)
+    
+    for keyword in ats_analysis.get("missing_keywords", []):
+        if not _is_keyword_in_text(keyword, cv_text_lower):
+            validated_missing_keywords.append(keyword)
+        else:
+            validated_keyword_matches.append(keyword)
+    
+    validated_keyword_matches = list(set(validated_keyword_matches))
+    validated_missing_keywords = list(set(validated_missing_keywords))
+    
+    # Build final result
+    result = {
+        "status": "success",
+        "structured_data": structured_cv,
+        "original_text": cv_text if cv_text else "Processed from file",
+        "analysis": {
+            'overall_score': int(analysis_raw["general"]["overall_score"] * 10),
+            'ats_score': ats_analysis.get("relevance_score", int((analysis_raw["content"]["score"] + analysis_raw["formatting"]["score"]) * 5)),
+            'readability_score': 80 + (analysis_raw["formatting"]["score"] - 5) * 4,
+            'summary': analysis_raw["general"]["summary"],
+            'critical_issues': analysis_raw["formatting"]["issues"] + analysis_raw["content"]["weaknesses"],
+            'field_suggestions': analysis_raw.get("field_suggestions", []),
+            'section_analysis': analysis_raw.get("sections", []),
+            'quick_wins': analysis_raw.get("quick_wins", []),
+            'top_priorities': analysis_raw["general"]["top_priorities"],
+            'grammar_and_clarity': {"issues": analysis_raw["formatting"]["issues"]},
+            'job_match_analysis': {
+                "relevance_score": 0 if not has_job_description else ats_analysis.get("relevance_score", analysis_raw["content"]["score"] * 10),
+                "keyword_matches": validated_keyword_matches,
+                "missing_keywords": validated_missing_keywords,
+                "recommendations": ats_analysis.get("recommendations", [])
+            },
+            'global_analysis': {
+                "formatting_score": analysis_raw["formatting"]["score"],
+                "content_score": analysis_raw["content"]["score"]
+            }
+        }
+    }
+    return result
+
+
+async def parse_and_analyze_cv(cv_input, job_description: str, api_key: str, links: list = None) -> dict:
+    """
+    Parse CV (from file or text) into structured data AND analyze it in a single API call.
+    Uses HYBRID approach: PDF visual analysis + extracted links metadata.
+    
+    Args:
+        cv_input: Either a file path (str) to PDF file, or raw CV text (str)
+        job_description: The job description to match against (optional)
+        api_key: Gemini API key
+        links: List of URLs/links found in the CV (optional, recommended for PDFs)
+    
+    Returns:
+        dict: Combined result with structured_data and analysis
+    """
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(GEMINI_CV_MODEL_NAME)
+    
+    # Determine if input is a file path or text
+    is_file = False
+    cv_text = None
+    document_part = None
+    transfer = None
+    
+    if isinstance(cv_input, str):
+        if os.path.isfile(cv_input):
+            is_file = True
+            print(f"   📄 Processing PDF file: {cv_input}")
+            
+            # Get file type
+            mime_type = _guess_mime_type(cv_input)
+            print(f"   📎 MIME type: {mime_type}")
+            
+            # Inline bytes for small files, otherwise an uploaded (or reused) file handle
+            try:
+                document_part, transfer = await gemini_file_transport.document_part(cv_input, mime_type)
+                print(f"   ✅ Document ready for Gemini ({transfer.mode}, {transfer.size_bytes} bytes)")
+                
+            except FileProcessingError as e:
+                print(f"   ❌ File processing failed: {str(e)}")
+                return {
+                    'status': 'error',
+                    'message': 'File processing failed on Gemini API'
+                }
+            except Exception as e:
+                print(f"   ❌ Error uploading file to Gemini: {str(e)}")
+                return {
+                    'status': 'error',
+                    'message': f'Failed to upload file to Gemini: {str(e)}'
+                }
+        else:
+            # It's text content
+            cv_text = cv_input
+            print(f"   📝 Processing text content ({len(cv_text)} characters)")
+    else:
+        cv_text = str(cv_input)
+    
+    if links:
+        print(f"   🔗 Including {len(links)} extracted links as metadata")
+    
+    prompt = _build_prompt(is_file, cv_text, job_description, links)
+    has_job_description = bool(job_description and job_description.strip())
+    response_text = ""
     
     try:
         print("   📤 Sending request to Gemini API (parsing + analysis in one call)...")
         
         # Send request based on input type
-        if is_file and uploaded_file:
+        if is_file:
             # Send file + prompt for visual analysis
-            response = model.generate_content([uploaded_file, prompt])
+            try:
+                response = await model.generate_content_async([document_part, prompt])
+            except Exception as e:
+                if transfer.mode != TRANSFER_REUSED:
+                    raise
+                # The cached handle may have expired early on Gemini's side: upload again once
+                print(f"   ⚠️  Reused file handle rejected ({str(e)}), uploading again")
+                gemini_file_transport.invalidate(transfer.content_hash)
+                document_part, transfer = await gemini_file_transport.document_part(cv_input, mime_type)
+                response = await model.generate_content_async([document_part, prompt])
         else:
             # Send text-only prompt
-            response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Remove any markdown code blocks
-        json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
-        if json_match:
-            response_text = json_match.group(1).strip()
-        
-        parsed = json.loads(response_text)
+            response = await model.generate_content_async(prompt)
+        response_text = response.text
         
-        # Extract structured CV and analysis
-        structured_cv = parsed.get('structured_cv', {})
-        analysis_raw = parsed.get('analysis', {})
-        
-        # Validate keywords for ATS analysis
-        cv_text_lower = json.dumps(structured_cv).lower()
-        ats_analysis = analysis_raw.get("ats_analysis", {})
-        
-        def is_keyword_in_text(keyword, text):
-            escaped_keyword = re.escape(keyword.lower())
-            pattern = rf'\b{escaped_keyword}\b'
-            return bool(re.search(pattern, text.lower()))
-        
-        validated_keyword_matches = []
-        validated_missing_keywords = []
-        
-        for keyword in ats_analysis.get("keyword_matches", []):
-            if is_keyword_in_text(keyword, cv_text_lower):
-                validated_keyword_matches.append(keyword)
-            else:
-                validated_missing_keywords.append(keyword)
-        
-        for keyword in ats_analysis.get("missing_keywords", []):
-            if not is_keyword_in_text(keyword, cv_text_lower):
-                validated_missing_keywords.append(keyword)
-            else:
-                validated_keyword_matches.append(keyword)
-        
-        validated_keyword_matches = list(set(validated_keyword_matches))
-        validated_missing_keywords = list(set(validated_missing_keywords))
-        
-        # Build final result
-        # Determine if job description was provided
-        has_job_description = is_job_desciption
-        
-        result = {
-            "status": "success",
-            "structured_data": structured_cv,
-            "original_text": cv_text if cv_text else "Processed from file",
-            "analysis": {
-                'overall_score': int(analysis_raw["general"]["overall_score"] * 10),
-                'ats_score': ats_analysis.get("relevance_score", int((analysis_raw["content"]["score"] + analysis_raw["formatting"]["score"]) * 5)),
-                'readability_score': 80 + (analysis_raw["formatting"]["score"] - 5) * 4,
-                'summary': analysis_raw["general"]["summary"],
-                'critical_issues': analysis_raw["formatting"]["issues"] + analysis_raw["content"]["weaknesses"],
-                'field_suggestions': analysis_raw.get("field_suggestions", []),
-                'section_analysis': analysis_raw.get("sections", []),
-                'quick_wins': analysis_raw.get("quick_wins", []),
-                'top_priorities': analysis_raw["general"]["top_priorities"],
-                'grammar_and_clarity': {"issues": analysis_raw["formatting"]["issues"]},
-                'job_match_analysis': {
-                    "relevance_score": 0 if not has_job_description else ats_analysis.get("relevance_score", analysis_raw["content"]["score"] * 10),
-                    "keyword_matches": validated_keyword_matches,
-                    "missing_keywords": validated_missing_keywords,
-                    "recommendations": ats_analysis.get("recommendations", [])
-                },
-                'global_analysis': {
-                    "formatting_score": analysis_raw["formatting"]["score"],
-                    "content_score": analysis_raw["content"]["score"]
-                }
-            }
-        }
-        
-        # Clean up uploaded file if exists
-        if uploaded_file:
-            try:
-                genai.delete_file(uploaded_file.name)
-                print(f"   🗑️  Cleaned up uploaded file: {uploaded_file.name}")
-            except Exception as e:
-                print(f"   ⚠️  Could not delete uploaded file: {str(e)}")
+        parsed = _parse_response_json(response_text)
+        result = _build_result(parsed, cv_text, has_job_description)
+        if transfer:
+            result["transport"] = transfer.as_dict()
+        structured_cv = result["structured_data"]
         
         print(f"✅ Successfully parsed and analyzed CV in one API call")
         print(f"   - Experience entries: {len(structured_cv.get('experience', []))}")
@@ -770,6 +834,7 @@ REMEMBER:
 
 
 
+
 def apply_suggestion_to_structured_cv(structured_cv: dict, suggestion: dict) -> dict:
     """
     Apply a suggestion to the structured CV data.
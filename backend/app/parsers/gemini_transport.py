@@ -0,0 +1,258 @@
+"""
+Gemini Document Transport
+Gets CV documents in front of Gemini with as few round trips as possible:
+small files go inline as bytes parts, larger ones are uploaded once and the
+remote file handle is reused (keyed by content hash) until it expires.
+"""
+
+from google import generativeai as genai
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# The Gemini file API (upload / status / delete) has no async variant; those
+# calls run on this bounded pool so they never block the event loop.
+GEMINI_FILE_API_WORKERS = int(os.getenv("GEMINI_FILE_API_WORKERS", "8"))
+# Polling of an uploaded file until Gemini has processed it: starts fast,
+# backs off geometrically, gives up after the timeout.
+FILE_POLL_INITIAL_SECONDS = float(os.getenv("FILE_POLL_INITIAL_SECONDS", "0.5"))
+FILE_POLL_MAX_SECONDS = float(os.getenv("FILE_POLL_MAX_SECONDS", "4"))
+FILE_PROCESSING_TIMEOUT_SECONDS = float(os.getenv("FILE_PROCESSING_TIMEOUT_SECONDS", "120"))
+# Documents up to this size are sent inline with the prompt (no upload at all)
+GEMINI_INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_BYTES", str(4 * 1024 * 1024)))
+# Uploaded files expire on Gemini's side after 48h; reuse handles for less than that
+GEMINI_FILE_REUSE_SECONDS = float(os.getenv("GEMINI_FILE_REUSE_SECONDS", str(46 * 3600)))
+GEMINI_FILE_HANDLE_CACHE_ITEMS = int(os.getenv("GEMINI_FILE_HANDLE_CACHE_ITEMS", "256"))
+
+# Stop reusing a handle this long before Gemini's own expiration time
+_EXPIRY_MARGIN_SECONDS = 600
+
+TRANSFER_INLINE = "inline"
+TRANSFER_UPLOADED = "uploaded"
+TRANSFER_REUSED = "reused"
+
+_file_api_executor = ThreadPoolExecutor(max_workers=GEMINI_FILE_API_WORKERS, thread_name_prefix="gemini-file-api")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking Gemini file API call on its bounded pool (local disk I/O uses asyncio.to_thread)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_file_api_executor, functools.partial(func, *args, **kwargs))
+
+
+def _read_and_hash(file_path: str) -> Tuple[bytes, str]:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class DocumentTransfer:
+    """How one document reached Gemini, and what it cost this request."""
+    mode: str
+    content_hash: str
+    size_bytes: int
+    upload_ms: float = 0.0
+    poll_ms: float = 0.0
+    polls: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class FileProcessingError(Exception):
+    """Gemini could not process an uploaded file (FAILED state or timeout)."""
+
+
+class GeminiFileTransport:
+    """
+    Turns a local document into a Gemini content part.
+
+    - Up to `inline_max_bytes`: an inline bytes part, zero extra round trips.
+    - Larger: uploaded once, polled until ACTIVE, and the handle kept in an
+      LRU keyed by the SHA-256 of the content until it nears expiry, so the
+      same CV analyzed again (another job description, a retry) costs no
+      upload. Concurrent requests for the same content share one upload.
+
+    Handles are not deleted after each request; evicted and invalidated ones
+    are deleted in the background. Thread-safe bookkeeping; the in-flight
+    upload sharing is bound to the running event loop.
+    """
+
+    def __init__(self, inline_max_bytes: int = GEMINI_INLINE_MAX_BYTES,
+                 reuse_seconds: float = GEMINI_FILE_REUSE_SECONDS,
+                 max_handles: int = GEMINI_FILE_HANDLE_CACHE_ITEMS):
+        self.inline_max_bytes = inline_max_bytes
+        self.reuse_seconds = reuse_seconds
+        self.max_handles = max(0, max_handles)
+        self._handles: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict() # hash -> (file, expires_at)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.transfers = {TRANSFER_INLINE: 0, TRANSFER_UPLOADED: 0, TRANSFER_REUSED: 0}
+        self.bytes_inline = 0
+        self.bytes_uploaded = 0
+        self.upload_seconds = 0.0
+        self.poll_seconds = 0.0
+        self.polls = 0
+        self.invalidations = 0
+        self.failures = 0
+
+    async def document_part(self, file_path: str, mime_type: str) -> Tuple[Any, DocumentTransfer]:
+        """Content part for `file_path` (inline blob or file handle) and its transfer record."""
+        data, content_hash = await asyncio.to_thread(_read_and_hash, file_path)
+
+        if len(data) <= self.inline_max_bytes:
+            transfer = DocumentTransfer(TRANSFER_INLINE, content_hash, len(data))
+            self._record(transfer)
+            return {"mime_type": mime_type, "data": data}, transfer
+
+        uploaded_file = self._cached_handle(content_hash)
+        if uploaded_file is not None:
+            transfer = DocumentTransfer(TRANSFER_REUSED, content_hash, len(data))
+            self._record(transfer)
+            return uploaded_file, transfer
+
+        inflight = self._inflight.get(content_hash)
+        if inflight is not None:
+            # Same document already uploading for another request: wait for it
+            uploaded_file = await asyncio.shield(inflight)
+            transfer = DocumentTransfer(TRANSFER_REUSED, content_hash, len(data))
+            self._record(transfer)
+            return uploaded_file, transfer
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[content_hash] = future
+        try:
+            uploaded_file, transfer = await self._upload_and_wait(file_path, mime_type, content_hash, len(data))
+            self._remember(content_hash, uploaded_file)
+            future.set_result(uploaded_file)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception() # Retrieved here so waiter-less failures aren't logged as unhandled
+            raise
+        finally:
+            self._inflight.pop(content_hash, None)
+        self._record(transfer)
+        return uploaded_file, transfer
+
+    async def _upload_and_wait(self, file_path: str, mime_type: str, content_hash: str,
+                               size_bytes: int) -> Tuple[Any, DocumentTransfer]:
+        """Uploads and polls (adaptive backoff, non-blocking) until the file leaves PROCESSING."""
+        transfer = DocumentTransfer(TRANSFER_UPLOADED, content_hash, size_bytes)
+        start = time.perf_counter()
+        uploaded_file = await run_blocking(genai.upload_file, file_path, mime_type=mime_type)
+        uploaded_at = time.perf_counter()
+        transfer.upload_ms = round((uploaded_at - start) * 1000, 1)
+        print(f"   ✅ File uploaded to Gemini: {uploaded_file.name} ({transfer.upload_ms:.0f} ms)")
+
+        delay = FILE_POLL_INITIAL_SECONDS
+        try:
+            while uploaded_file.state.name == "PROCESSING":
+                if time.perf_counter() - uploaded_at >= FILE_PROCESSING_TIMEOUT_SECONDS:
+                    raise FileProcessingError(f"file still processing after {FILE_PROCESSING_TIMEOUT_SECONDS:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 1.5, FILE_POLL_MAX_SECONDS)
+                uploaded_file = await run_blocking(genai.get_file, uploaded_file.name)
+                transfer.polls += 1
+            if uploaded_file.state.name == "FAILED":
+                raise FileProcessingError("file processing failed on Gemini API")
+        except BaseException:
+            with self._lock:
+                self.failures += 1
+            self._delete_in_background(uploaded_file)
+            raise
+        finally:
+            transfer.poll_ms = round((time.perf_counter() - uploaded_at) * 1000, 1)
+        print(f"   ✅ File processing complete after {transfer.polls} polls ({transfer.poll_ms:.0f} ms)")
+        return uploaded_file, transfer
+
+    def _cached_handle(self, content_hash: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._handles.get(content_hash)
+            if entry is None:
+                return None
+            uploaded_file, expires_at = entry
+            if time.time() >= expires_at:
+                del self._handles[content_hash]
+                return None
+            self._handles.move_to_end(content_hash)
+            return uploaded_file
+
+    def _remember(self, content_hash: str, uploaded_file: Any):
+        if not self.max_handles:
+            self._delete_in_background(uploaded_file)
+            return
+        expires_at = time.time() + self.reuse_seconds
+        expiration_time = getattr(uploaded_file, "expiration_time", None)
+        if expiration_time is not None and hasattr(expiration_time, "timestamp"):
+            expires_at = min(expires_at, expiration_time.timestamp() - _EXPIRY_MARGIN_SECONDS)
+        evicted = []
+        with self._lock:
+            self._handles[content_hash] = (uploaded_file, expires_at)
+            self._handles.move_to_end(content_hash)
+            while len(self._handles) > self.max_handles:
+                evicted.append(self._handles.popitem(last=False)[1][0])
+        for old_file in evicted:
+            self._delete_in_background(old_file)
+
+    def invalidate(self, content_hash: str):
+        """Forgets (and deletes) a handle Gemini no longer accepts, e.g. expired early."""
+        with self._lock:
+            entry = self._handles.pop(content_hash, None)
+            self.invalidations += 1
+        if entry is not None:
+            self._delete_in_background(entry[0])
+
+    def _delete_in_background(self, uploaded_file: Any):
+        def delete():
+            try:
+                genai.delete_file(uploaded_file.name)
+                print(f"   🗑️  Deleted uploaded file: {uploaded_file.name}")
+            except Exception as e:
+                print(f"   ⚠️  Could not delete uploaded file: {str(e)}")
+        _file_api_executor.submit(delete)
+
+    def _record(self, transfer: DocumentTransfer):
+        with self._lock:
+            self.transfers[transfer.mode] += 1
+            if transfer.mode == TRANSFER_INLINE:
+                self.bytes_inline += transfer.size_bytes
+            elif transfer.mode == TRANSFER_UPLOADED:
+                self.bytes_uploaded += transfer.size_bytes
+                self.upload_seconds += transfer.upload_ms / 1000
+                self.poll_seconds += transfer.poll_ms / 1000
+                self.polls += transfer.polls
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uploads = self.transfers[TRANSFER_UPLOADED]
+            avg_upload_s = (self.upload_seconds + self.poll_seconds) / uploads if uploads else 0.0
+            return {
+                "inline_max_bytes": self.inline_max_bytes,
+                "transfers": dict(self.transfers),
+                "bytes_inline": self.bytes_inline,
+                "bytes_uploaded": self.bytes_uploaded,
+                "cached_handles": len(self._handles),
+                "avg_upload_ms": round(self.upload_seconds / uploads * 1000, 1) if uploads else None,
+                "avg_poll_ms": round(self.poll_seconds / uploads * 1000, 1) if uploads else None,
+                "avg_polls": round(self.polls / uploads, 2) if uploads else None,
+                # Reused handles skipped a full upload + poll cycle
+                "estimated_seconds_saved_by_reuse": round(self.transfers[TRANSFER_REUSED] * avg_upload_s, 2),
+                "invalidations": self.invalidations,
+                "failures": self.failures,
+            }
+
+
+gemini_file_transport = GeminiFileTransport()
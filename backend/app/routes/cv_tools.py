@@ -1,14 +1,21 @@
-from fastapi import FastAPI, UploadFile, File, Form, Body ,APIRouter
+from fastapi import FastAPI, UploadFile, File, Form, Body ,APIRouter, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from ..parsers.cv_parser import parse_document_with_metadata
-from ..parsers.cv_structure_parser import parse_and_analyze_cv, apply_suggestion_to_structured_cv
+from ..parsers.cv_structure_parser import (
+    parse_and_analyze_cv,
+    apply_suggestion_to_structured_cv,
+    structured_analysis_cache,
+    structured_cache_key,
+)
+from ..parsers.gemini_transport import gemini_file_transport
 from ..parsers.latex_generator import generate_latex_cv, compile_latex_to_pdf
+from ..services.structured_cv_store import save_structured_cv, latest_structured_cv
+from ..services.blob_store import BLOB_CACHE_MAX_AGE_SECONDS, blob_id_for, get_blob, put_blob
+from ..utils.security_utils import get_current_user, get_optional_user
+import asyncio
 import tempfile
 import os
-import json
-import base64
-from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,15 +26,9 @@ router = APIRouter(tags=["CvTools"])
 os.environ['GRPC_VERBOSITY'] = 'ERROR'
 os.environ['GLOG_minloglevel'] = '2'
 
-# File storage directories (store JSON files under backend/data/...)
+# Exported PDFs are written under backend/app/routes/data/pdfs (structured CVs live in the database)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
-CV_DATA_DIR = os.path.join(DATA_DIR, 'cv_data')
-ANALYSIS_DIR = os.path.join(DATA_DIR, 'analysis')
-
-# Ensure directories exist
-os.makedirs(CV_DATA_DIR, exist_ok=True)
-os.makedirs(ANALYSIS_DIR, exist_ok=True)
 
 # ⚠️ IMPORTANT: Set your Gemini API key here or use environment variable
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -39,14 +40,19 @@ Removed legacy /analyze endpoint. Use POST /analyze-structured instead.
 
 @router.post("/api/analyze-structured")
 async def analyze_structured(
+    background_tasks: BackgroundTasks,
     cv_file: UploadFile = File(None),
     cv_text: str = Form(None),
     job_description: str = Form(""),
-    use_gemini: bool = Form(True)
+    use_gemini: bool = Form(True),
+    bypass_cache: bool = Form(False),
+    current_user = Depends(get_optional_user)
 ):
     """
     Analyze CV and return structured data with field-targeted suggestions.
     This is the enhanced version that uses structured CV data.
+    Results are cached by CV content + job description; bypass_cache=true forces a fresh analysis.
+    The structured CV is stored for the signed-in user (anonymous without a token).
     """
     
     print("\n" + "="*50)
@@ -59,45 +65,44 @@ async def analyze_structured(
     file_info = {}
     original_file_data = None
     temp_file_path = None
+    cached_result = None
     
     if cv_file:
         print(f"📄 File uploaded: {cv_file.filename}")
         try:
             _, ext = os.path.splitext(cv_file.filename)
             content = await cv_file.read()
+            content_hash = blob_id_for(content)
             
-            # Store original file for response
-            file_base64 = base64.b64encode(content).decode('utf-8')
-            original_file_data = {
+            file_info = {
                 "filename": cv_file.filename,
-                "content_type": cv_file.content_type,
-                "data": file_base64,
-                "size": len(content)
+                "file_size_bytes": len(content),
+                "links_found": 0,
+                "processing_method": "PDF visual analysis + extracted links"
             }
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                tmp.write(content)
-                temp_file_path = tmp.name
+            # Same file + job description analyzed before: skip Gemini entirely
+            cache_key = structured_cache_key(content, job_description)
+            cached_result = None if bypass_cache else await asyncio.to_thread(structured_analysis_cache.get, cache_key)
             
-            # Extract links from the PDF (but don't parse text - let Gemini see the visual layout)
-            print("� Extracting links from PDF...")
-            if ext.lower() == '.pdf':
-                parse_result = parse_document_with_metadata(temp_file_path)
-                if parse_result:
-                    cv_links = parse_result.get('links', [])
-                    print(f"✅ Found {len(cv_links)} links: {cv_links}")
+            if cached_result is None:
+                # Save to temporary file
+                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+                    tmp.write(content)
+                    temp_file_path = tmp.name
+                
+                # Extract links from the PDF (but don't parse text - let Gemini see the visual layout)
+                print("� Extracting links from PDF...")
+                if ext.lower() == '.pdf':
+                    parse_result = await asyncio.to_thread(parse_document_with_metadata, temp_file_path)
+                    if parse_result:
+                        cv_links = parse_result.get('links', [])
+                        print(f"✅ Found {len(cv_links)} links: {cv_links}")
+                file_info["links_found"] = len(cv_links)
             
             # Use file path as input (Gemini will process the visual document)
             cv_input = temp_file_path
             
-            file_info = {
-                "filename": cv_file.filename,
-                "file_size_bytes": len(content),
-                "links_found": len(cv_links),
-                "processing_method": "PDF visual analysis + extracted links"
-            }
-            
         except Exception as e:
             print(f"❌ Error processing file: {str(e)}")
             import traceback
@@ -115,24 +120,50 @@ async def analyze_structured(
         # Use text input
         cv_input = cv_text
         print(f"📝 Processing text content ({len(cv_text)} characters)")
+        content_hash = blob_id_for(cv_text.encode("utf-8"))
+        cache_key = structured_cache_key(cv_text, job_description)
+        cached_result = None if bypass_cache else await asyncio.to_thread(structured_analysis_cache.get, cache_key)
     else:
         return {"error": "No CV text or file provided"}
     
-    # Parse CV and analyze it in ONE API call (hybrid: PDF visual + links metadata)
-    print("🔄 Analyzing CV with hybrid approach (PDF visual + extracted links)...")
-    combined_result = parse_and_analyze_cv(cv_input, job_description, GEMINI_API_KEY, cv_links)
+    if cached_result is not None:
+        print(f"⚡ Structured analysis served from cache ({cache_key[:12]})")
+        combined_result = {"status": "success", **cached_result}
+        if cv_file:
+            file_info["links_found"] = cached_result.get('links_found', 0)
+    else:
+        # Parse CV and analyze it in ONE API call (hybrid: PDF visual + links metadata)
+        print("🔄 Analyzing CV with hybrid approach (PDF visual + extracted links)...")
+        combined_result = await parse_and_analyze_cv(cv_input, job_description, GEMINI_API_KEY, cv_links)
+        
+        # Clean up temp file
+        if temp_file_path and os.path.exists(temp_file_path):
+            try:
+                os.unlink(temp_file_path)
+                print(f"🗑️  Cleaned up temporary file: {temp_file_path}")
+            except Exception as e:
+                print(f"⚠️  Could not delete temp file: {str(e)}")
+        
+        if combined_result['status'] != 'success':
+            print(f"❌ Failed to parse and analyze CV: {combined_result}")
+            return {"error": "Failed to parse and analyze CV. Please try again or use a different format."}
+        
+        await asyncio.to_thread(structured_analysis_cache.set, cache_key, {
+            "structured_data": combined_result['structured_data'],
+            "analysis": combined_result['analysis'],
+            "original_text": combined_result.get('original_text', ''),
+            "links_found": len(cv_links),
+        })
     
-    # Clean up temp file
-    if temp_file_path and os.path.exists(temp_file_path):
-        try:
-            os.unlink(temp_file_path)
-            print(f"🗑️  Cleaned up temporary file: {temp_file_path}")
-        except Exception as e:
-            print(f"⚠️  Could not delete temp file: {str(e)}")
+    if cv_file:
+        # Store the original file once under its content hash (only for analyzed CVs); the response only references it
+        original_file_data = await asyncio.to_thread(put_blob, content, cv_file.filename, cv_file.content_type)
+        original_file_data["url"] = f"/api/blobs/{original_file_data['id']}"
     
-    if combined_result['status'] != 'success':
-        print(f"❌ Failed to parse and analyze CV: {combined_result}")
-        return {"error": "Failed to parse and analyze CV. Please try again or use a different format."}
+    if cv_file and combined_result.get('transport'):
+        # How the document reached Gemini (inline / uploaded / reused handle) and upload + poll time
+        file_info["gemini_transport"] = combined_result['transport']
+    cache_status = "bypass" if bypass_cache else ("hit" if cached_result is not None else "miss")
     
     structured_cv = combined_result['structured_data']
     gemini_analysis = {
@@ -140,32 +171,17 @@ async def analyze_structured(
         'analysis': combined_result['analysis']
     } if use_gemini else None
     
-    # Save structured CV data
-    cv_data = {
-        "timestamp": datetime.now().isoformat(),
-        "structured_cv": structured_cv,
-        "original_text": combined_result.get('original_text', ''),
-        "job_description": job_description,
-        "file_info": file_info if cv_file else {"source": "raw_text"}
-    }
-    
-    output_basename = f"structured_cv_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    output_filename = os.path.join(CV_DATA_DIR, output_basename)
-    
-    try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(cv_data, f, indent=2, ensure_ascii=False)
-        print(f"💾 Saved structured CV to: {output_filename}")
-    except Exception as e:
-        print(f"❌ Error saving structured CV: {str(e)}")
-    
-    # Save analysis
-    if gemini_analysis and 'error' not in gemini_analysis:
-        analysis_basename = f"structured_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        analysis_filename = os.path.join(ANALYSIS_DIR, analysis_basename)
-        with open(analysis_filename, 'w', encoding='utf-8') as f:
-            json.dump(gemini_analysis, f, indent=2, ensure_ascii=False)
-        print(f"💾 Saved structured analysis to: {analysis_filename}")
+    # Save structured CV data + analysis after the response has been sent
+    background_tasks.add_task(
+        save_structured_cv,
+        current_user.id if current_user else None,
+        structured_cv,
+        combined_result.get('original_text', ''),
+        job_description,
+        file_info if cv_file else {"source": "raw_text"},
+        gemini_analysis,
+        content_hash,
+    )
     
     # Return response
     response = {
@@ -173,7 +189,8 @@ async def analyze_structured(
         "status": "success",
         "structured_cv": structured_cv,
         "original_file": original_file_data,
-        "file_info": file_info if cv_file else {"source": "raw_text"}
+        "file_info": file_info if cv_file else {"source": "raw_text"},
+        "cache": cache_status
     }
     
     if gemini_analysis:
@@ -182,23 +199,55 @@ async def analyze_structured(
     return response
 
 
+@router.get("/api/analyze-structured/metrics")
+async def analyze_structured_metrics():
+    """Gemini document transport counters (inline vs uploaded vs reused, upload and poll time) and result cache stats."""
+    return {
+        "gemini_transport": gemini_file_transport.stats(),
+        "result_cache": structured_analysis_cache.stats(),
+    }
+
+
+@router.get("/api/blobs/{blob_id}")
+async def download_blob(blob_id: str, request: Request):
+    """
+    Streams a stored original file. Blobs are immutable under their id, so the
+    id doubles as a strong ETag (If-None-Match answers 304) and clients may
+    cache them for long; Range requests get 206 partial content.
+    """
+    blob = await asyncio.to_thread(get_blob, blob_id)
+    if blob is None:
+        return JSONResponse(status_code=404, content={"error": "File not found"})
+    
+    headers = {
+        "ETag": f'"{blob_id}"',
+        "Cache-Control": f"private, max-age={BLOB_CACHE_MAX_AGE_SECONDS}, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or headers["ETag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(
+        blob["path"],
+        media_type=blob["content_type"],
+        filename=blob["filename"],
+        content_disposition_type="inline",
+        headers=headers,
+    )
+
+
 @router.get("/api/latest-structured-cv")
-async def get_latest_structured_cv():
-    """Get the most recently saved structured CV data"""
+async def get_latest_structured_cv(current_user = Depends(get_current_user)):
+    """Get the most recently saved structured CV data of the signed-in user"""
     try:
-        json_files = [f for f in os.listdir(CV_DATA_DIR) if f.startswith('structured_cv_') and f.endswith('.json')]
-        
-        if not json_files:
-            return {"error": "No structured CV data files found"}
-        
-        latest_basename = sorted(json_files)[-1]
-        latest_path = os.path.join(CV_DATA_DIR, latest_basename)
+        data = await latest_structured_cv(current_user.id)
         
-        with open(latest_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if data is None:
+            return {"error": "No structured CV data found"}
         
         return {
-            "filename": latest_basename,
+            "id": data["id"],
+            "filename": f"structured_cv_{data['id']}",
             "data": data
         }
     
@@ -0,0 +1,154 @@
+"""
+Blob Store
+Content-addressed storage of uploaded CV files: each file is written once
+under the SHA-256 of its bytes and served by GET /api/blobs/{blob_id},
+instead of being echoed back base64-encoded in analysis responses.
+
+Like the disk tier of TieredCache, the store is bounded: blobs not uploaded
+again within BLOB_TTL_SECONDS are deleted, then the least recently uploaded
+ones until BLOB_STORE_MAX_ITEMS / BLOB_STORE_MAX_BYTES hold.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join("data", "blobs"))
+# Blobs never change under their id, so clients may keep them this long
+BLOB_CACHE_MAX_AGE_SECONDS = int(os.getenv("BLOB_CACHE_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+
+BLOB_TTL_SECONDS = float(os.getenv("BLOB_TTL_SECONDS", str(30 * 24 * 3600)))
+BLOB_STORE_MAX_ITEMS = int(os.getenv("BLOB_STORE_MAX_ITEMS", "2000"))
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+_PRUNE_EVERY = 64
+# Serializes writes and pruning, so a blob is never deleted right after an upload refreshed it
+_lock = threading.Lock()
+_puts_since_prune = 0
+
+_BLOB_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_id_for(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _blob_path(blob_id: str) -> Optional[str]:
+    """On-disk path of a blob id (sharded by its first two hex digits); None for malformed ids."""
+    if not _BLOB_ID_PATTERN.match(blob_id or ""):
+        return None
+    return os.path.join(BLOB_STORE_DIR, blob_id[:2], blob_id)
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def put_blob(data: bytes, filename: str, content_type: Optional[str]) -> Dict[str, Any]:
+    """
+    Stores `data` (only refreshing its age when the same bytes are already
+    stored) and returns its reference: id, filename, content type and size.
+    Blocking; call it off the event loop.
+    """
+    global _puts_since_prune
+    blob_id = blob_id_for(data)
+    path = _blob_path(blob_id)
+    meta = {
+        "id": blob_id,
+        "filename": filename,
+        "content_type": content_type or "application/octet-stream",
+        "size": len(data),
+    }
+    with _lock:
+        if os.path.isfile(path):
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, data)
+            # Metadata of the first upload; later uploads of the same bytes share it
+            _write_atomic(f"{path}.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+            print(f"💾 Stored blob {blob_id[:12]} ({len(data)} bytes)")
+        _puts_since_prune += 1
+        if _puts_since_prune >= _PRUNE_EVERY:
+            _prune()
+    return meta
+
+
+def get_blob(blob_id: str) -> Optional[Dict[str, Any]]:
+    """Metadata of a stored blob plus its `path` and `mtime`, or None if unknown."""
+    path = _blob_path(blob_id)
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {"id": blob_id, "filename": blob_id, "content_type": "application/octet-stream"}
+    stat = os.stat(path)
+    meta.update({"size": stat.st_size, "path": path, "mtime": stat.st_mtime})
+    return meta
+
+
+
+def prune_blobs() -> int:
+    """
+    Deletes expired blobs, then the oldest ones beyond the item / byte
+    limits. Returns the number removed. Blocking; call it off the event loop.
+    """
+    with _lock:
+        return _prune()
+
+
+def _prune() -> int:
+    global _puts_since_prune
+    _puts_since_prune = 0
+    if not os.path.isdir(BLOB_STORE_DIR):
+        return 0
+    blobs = []
+    for shard in os.scandir(BLOB_STORE_DIR):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if not _BLOB_ID_PATTERN.match(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, entry.path))
+
+    # Newest first: keep blobs while they fit, drop the rest
+    blobs.sort(reverse=True)
+    cutoff = time.time() - BLOB_TTL_SECONDS
+    kept_items = kept_bytes = removed = 0
+    for mtime, size, path in blobs:
+        if mtime >= cutoff and kept_items < BLOB_STORE_MAX_ITEMS and kept_bytes + size <= BLOB_STORE_MAX_BYTES:
+            kept_items += 1
+            kept_bytes += size
+            continue
+        for stale in (path, f"{path}.json"):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Could not delete blob {os.path.basename(stale)[:12]}: {e}")
+        removed += 1
+    if removed:
+        print(f"🧹 Pruned {removed} blob(s); {kept_items} kept ({kept_bytes} bytes)")
+    return removed
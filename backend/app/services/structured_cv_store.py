@@ -0,0 +1,235 @@
+"""
+Structured CV Store
+Per-user storage of structured CVs and their analyses in the application
+database (table structured_cvs), replacing the timestamped JSON files.
+"""
+
+import asyncio
+import json
+import os
+import re
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from ..database.connection import AsyncSessionLocal, Base, engine
+from ..models.structured_cv import StructuredCV
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Where cv_tools used to write structured_cv_*.json / structured_analysis_*.json (old and newer location)
+LEGACY_DATA_DIRS = [
+    os.path.join(_APP_DIR, "data"),
+    os.path.join(_APP_DIR, "routes", "data"),
+]
+_LEGACY_NAME_PATTERN = re.compile(r"^structured_cv_(\d{8}_\d{6})\.json$")
+
+PAYLOAD_COMPRESSION_LEVEL = 6
+# Records decoded per query when backfilling the CV index
+INDEX_SYNC_BATCH = 200
+
+
+def encode_payload(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), PAYLOAD_COMPRESSION_LEVEL)
+
+
+def decode_payload(blob: Optional[bytes]) -> Any:
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _record_dict(record: StructuredCV) -> Dict[str, Any]:
+    """Same shape as the old structured_cv_*.json files, plus the record id."""
+    payload = decode_payload(record.payload)
+    return {
+        "id": record.id,
+        "timestamp": record.created_at.isoformat() if record.created_at else None,
+        "structured_cv": payload.get("structured_cv"),
+        "original_text": payload.get("original_text", ""),
+        "job_description": record.job_description or "",
+        "file_info": payload.get("file_info", {}),
+        "analysis": decode_payload(record.analysis),
+    }
+
+
+async def save_structured_cv(user_id: Optional[int], structured_cv: dict, original_text: str,
+                             job_description: str, file_info: dict, analysis: Optional[dict] = None,
+                             content_hash: Optional[str] = None) -> Optional[int]:
+    """Stores one analyzed CV (compression runs off the event loop); returns its id, or None on failure."""
+    try:
+        payload, analysis_blob = await asyncio.to_thread(
+            lambda: (
+                encode_payload({"structured_cv": structured_cv, "original_text": original_text, "file_info": file_info}),
+                encode_payload(analysis) if analysis is not None else None,
+            )
+        )
+        async with AsyncSessionLocal() as session:
+            record = StructuredCV(
+                user_id=user_id,
+                content_hash=content_hash,
+                job_description=job_description,
+                payload=payload,
+                analysis=analysis_blob,
+            )
+            session.add(record)
+            await session.commit()
+            print(f"💾 Saved structured CV #{record.id} ({len(payload)} bytes compressed)")
+            record_id = record.id
+    except Exception as e:
+        print(f"❌ Error saving structured CV: {str(e)}")
+        return None
+    await _index_for_matching(record_id, structured_cv)
+    return record_id
+
+
+def index_cv_id(record_id: int) -> str:
+    from core.cv_index import SOURCE_STRUCTURED
+    return f"{SOURCE_STRUCTURED}:db-{record_id}"
+
+
+async def _index_for_matching(record_id: int, structured_cv: dict):
+    """
+    Best effort: makes the CV visible to skills-gap CV ranking right away.
+    Records saved before the index is loaded are picked up by sync_cv_index.
+    """
+    from core.warmup import skills_gap_warmup
+    if not isinstance(structured_cv, dict) or not skills_gap_warmup.is_ready(["market_data", "cv_index"]):
+        return
+    from core.cv_index import get_cv_index
+    from core.data_loader import get_data_loader
+    try:
+        await asyncio.to_thread(
+            get_cv_index().add_structured_cv, index_cv_id(record_id), structured_cv,
+            get_data_loader(), f"structured_cv_{record_id}",
+        )
+    except Exception as e:
+        print(f"⚠️ Could not index structured CV #{record_id}: {e}")
+
+
+async def latest_structured_cv(user_id: int) -> Optional[Dict[str, Any]]:
+    """Most recent structured CV of a user. Anonymous records are never served back."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(StructuredCV).where(StructuredCV.user_id == user_id)
+            .order_by(StructuredCV.created_at.desc(), StructuredCV.id.desc())
+            .limit(1)
+        )
+        record = result.scalar_one_or_none()
+    if record is None:
+        return None
+    return await asyncio.to_thread(_record_dict, record)
+
+
+def _index_records(cv_index, data_loader, records: Sequence[StructuredCV]) -> int:
+    from core.cv_index import SOURCE_STRUCTURED
+    added = 0
+    for record in records:
+        try:
+            structured_cv = decode_payload(record.payload).get("structured_cv")
+        except (zlib.error, ValueError, AttributeError) as e:
+            print(f"⚠️ Skipping structured CV #{record.id}: {e}")
+            structured_cv = None
+        if not isinstance(structured_cv, dict):
+            cv_index.add_cv(index_cv_id(record.id), SOURCE_STRUCTURED, f"structured_cv_{record.id}", []) # Don't retry on every sync
+            continue
+        cv_index.add_structured_cv(index_cv_id(record.id), structured_cv, data_loader, f"structured_cv_{record.id}")
+        added += 1
+    return added
+
+
+async def sync_cv_index(cv_index, data_loader) -> int:
+    """
+    Indexes the structured CVs of the table not in the CV index yet (e.g.
+    saved while the index was still loading); returns the number added.
+    Records imported from the legacy files are skipped: the index reads
+    those files directly (CVSkillIndex.sync_stored_cvs).
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(StructuredCV.id).where(StructuredCV.legacy_name.is_(None)))
+        missing = [record_id for record_id in result.scalars().all() if index_cv_id(record_id) not in cv_index]
+    added = 0
+    for start in range(0, len(missing), INDEX_SYNC_BATCH):
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(StructuredCV).where(StructuredCV.id.in_(missing[start:start + INDEX_SYNC_BATCH]))
+            )
+            records = result.scalars().all()
+        added += await asyncio.to_thread(_index_records, cv_index, data_loader, records)
+    if added:
+        print(f"📇 Indexed {added} structured CVs from the database ({len(cv_index.documents)} total).")
+    return added
+
+
+def _read_legacy_files(known: set) -> List[Dict[str, Any]]:
+    """Legacy JSON files not imported yet, each paired with the analysis written in the same second."""
+    pending = []
+    for data_dir in LEGACY_DATA_DIRS:
+        cv_dir = os.path.join(data_dir, "cv_data")
+        if not os.path.isdir(cv_dir):
+            continue
+        for name in sorted(os.listdir(cv_dir)):
+            match = _LEGACY_NAME_PATTERN.match(name)
+            if not match or name in known:
+                continue
+            try:
+                with open(os.path.join(cv_dir, name), "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                analysis = None
+                analysis_path = os.path.join(data_dir, "analysis", f"structured_analysis_{match.group(1)}.json")
+                if os.path.isfile(analysis_path):
+                    with open(analysis_path, "r", encoding="utf-8") as f:
+                        analysis = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping legacy structured CV {name}: {e}")
+                continue
+            try:
+                created_at = datetime.fromisoformat(stored["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                created_at = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+            if created_at.tzinfo is None:
+                created_at = created_at.astimezone(timezone.utc) # Files were stamped in server local time
+            pending.append({
+                "legacy_name": name,
+                "created_at": created_at,
+                "job_description": stored.get("job_description", ""),
+                "payload": encode_payload({
+                    "structured_cv": stored.get("structured_cv", {}),
+                    "original_text": stored.get("original_text", ""),
+                    "file_info": stored.get("file_info", {}),
+                }),
+                "analysis": encode_payload(analysis) if analysis is not None else None,
+            })
+    return pending
+
+
+async def migrate_legacy_files() -> int:
+    """
+    Imports the old structured_cv_*.json files (with their analyses) as
+    anonymous records. Idempotent: files already imported are recognised by
+    name, so running it again only picks up files that appeared since.
+    The files themselves are left in place.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(StructuredCV.legacy_name).where(StructuredCV.legacy_name.is_not(None)))
+        known = set(result.scalars().all())
+        pending = await asyncio.to_thread(_read_legacy_files, known)
+        if not pending:
+            return 0
+        session.add_all(StructuredCV(user_id=None, **row) for row in pending)
+        await session.commit()
+    print(f"📦 Imported {len(pending)} legacy structured CV files into the database")
+    return len(pending)
+
+
+async def _main():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await migrate_legacy_files()
+
+
+if __name__ == "__main__":
+    # One-shot run outside the server (the server also runs it at startup):
+    #   python -m app.services.structured_cv_store
+    asyncio.run(_main())
@@ -55,3 +55,12 @@ async def get_current_user(creds: HTTPAuthorizationCredentials | None = Depends(
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
+
+async def get_optional_user(creds: HTTPAuthorizationCredentials | None = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User | None:
+    """Same as get_current_user, but None for anonymous callers instead of a 401."""
+    if creds is None:
+        return None
+    try:
+        return await get_current_user(creds, db)
+    except HTTPException:
+        return None
@@ -0,0 +1,184 @@
+"""
+Latency and output quality of the two-call Gemini flow (analyzer, then coach)
+versus the single schema-constrained combined call.
+
+Every CV x job pair of the fixture corpus goes through both modes (LLM
+response cache disabled, modes alternated per repeat). Quality is reported
+as agreement between the modes plus two mode-local checks: resume "before"
+snippets that really quote the CV, and priority actions that address an
+actual gap.
+
+Usage (from the backend/ directory, needs GOOGLE_API_KEY):
+    python -m benchmarks.analyzer_modes_bench [--repeats 2] [--output bench_modes.json]
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from core.ai_analyzer import ANALYSIS_MODE_COMBINED, ANALYSIS_MODE_TWO_CALL, model
+from core.llm_cache import llm_response_cache
+
+CORPUS_PATH = "core/fixtures/skill_parity_corpus.json"
+MODES = (ANALYSIS_MODE_TWO_CALL, ANALYSIS_MODE_COMBINED)
+
+
+def _squash(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(statistics.fmean(values), 3) if values else None
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def _mode_quality(cv_text: str, analyzer, coach) -> Dict[str, Any]:
+    cv = _squash(cv_text)
+    edits = coach.resume_edits
+    grounded = sum(1 for e in edits if _squash(e.before).strip('."\'') in cv)
+    gap_skills = [g.skill.lower() for g in analyzer.job_skill_profile if g.gap > 0]
+    on_gap = sum(
+        1 for a in coach.priority_actions
+        if any(skill in f"{a.action} {a.why}".lower() for skill in gap_skills)
+    )
+    return {
+        "resume_edits": len(edits),
+        "grounded_resume_edit_rate": round(grounded / len(edits), 3) if edits else None,
+        "priority_actions": len(coach.priority_actions),
+        "priority_actions_on_gaps_rate": round(on_gap / len(coach.priority_actions), 3) if coach.priority_actions else None,
+        "learning_paths": len(coach.learning_paths),
+    }
+
+
+def _agreement(a, b) -> Dict[str, Any]:
+    """Agreement between the analyzer halves of two modes."""
+    job_a = {g.skill.lower(): g.proficiency_req for g in a.job_skill_profile}
+    job_b = {g.skill.lower(): g.proficiency_req for g in b.job_skill_profile}
+    cv_a = {p.skill.lower(): p.proficiency_you for p in a.cv_skill_profile}
+    cv_b = {p.skill.lower(): p.proficiency_you for p in b.cv_skill_profile}
+    shared_job = job_a.keys() & job_b.keys()
+    shared_cv = cv_a.keys() & cv_b.keys()
+    return {
+        "job_skill_jaccard": round(_jaccard(set(job_a), set(job_b)), 3),
+        "cv_skill_jaccard": round(_jaccard(set(cv_a), set(cv_b)), 3),
+        "job_proficiency_mae": _mean([abs(job_a[s] - job_b[s]) for s in shared_job]),
+        "cv_proficiency_mae": _mean([abs(cv_a[s] - cv_b[s]) for s in shared_cv]),
+        "score_abs_delta": {
+            k: abs(getattr(a.ai_scores, k) - getattr(b.ai_scores, k)) for k in ("coverage", "depth", "recency")
+        },
+    }
+
+
+async def _run_pair(cv: Dict[str, str], job: Dict[str, str], repeats: int) -> Dict[str, Any]:
+    from api.analysis import _ai_stages, get_quantitative_analysis
+
+    quant_report = await get_quantitative_analysis(cv["text"], job["text"])
+    latencies: Dict[str, List[float]] = {mode: [] for mode in MODES}
+    errors: Dict[str, List[str]] = {mode: [] for mode in MODES}
+    outputs: Dict[str, Any] = {}
+
+    for repeat in range(repeats):
+        order = MODES if repeat % 2 == 0 else tuple(reversed(MODES))
+        for mode in order:
+            start = time.perf_counter()
+            try:
+                stages = [s async for s in _ai_stages(cv["text"], job["text"], job["id"], quant_report, mode)]
+            except Exception as e:
+                errors[mode].append(str(e)[:200])
+                continue
+            latencies[mode].append(time.perf_counter() - start)
+            outputs[mode] = stages
+
+    result: Dict[str, Any] = {"pair": f"{cv['id']} x {job['id']}", "modes": {}}
+    for mode in MODES:
+        result["modes"][mode] = {
+            "latency_seconds": [round(v, 3) for v in latencies[mode]],
+            "errors": errors[mode],
+            "quality": _mode_quality(cv["text"], *outputs[mode]) if mode in outputs else None,
+        }
+    if all(mode in outputs for mode in MODES):
+        result["agreement"] = _agreement(outputs[MODES[0]][0], outputs[MODES[1]][0])
+    return result
+
+
+def _summarize(pairs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for mode in MODES:
+        latencies = [v for p in pairs for v in p["modes"][mode]["latency_seconds"]]
+        qualities = [p["modes"][mode]["quality"] for p in pairs if p["modes"][mode]["quality"]]
+        summary[mode] = {
+            "runs": len(latencies),
+            "errors": sum(len(p["modes"][mode]["errors"]) for p in pairs),
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "latency_mean": _mean(latencies),
+            "grounded_resume_edit_rate": _mean(
+                [q["grounded_resume_edit_rate"] for q in qualities if q["grounded_resume_edit_rate"] is not None]),
+            "priority_actions_on_gaps_rate": _mean(
+                [q["priority_actions_on_gaps_rate"] for q in qualities if q["priority_actions_on_gaps_rate"] is not None]),
+        }
+    agreements = [p["agreement"] for p in pairs if "agreement" in p]
+    summary["agreement"] = {
+        "job_skill_jaccard": _mean([a["job_skill_jaccard"] for a in agreements]),
+        "cv_skill_jaccard": _mean([a["cv_skill_jaccard"] for a in agreements]),
+        "job_proficiency_mae": _mean([a["job_proficiency_mae"] for a in agreements if a["job_proficiency_mae"] is not None]),
+        "coverage_abs_delta": _mean([a["score_abs_delta"]["coverage"] for a in agreements]),
+    }
+    two_call, combined = summary[MODES[0]]["latency_p50"], summary[MODES[1]]["latency_p50"]
+    if two_call and combined:
+        summary["combined_speedup_p50"] = round(two_call / combined, 2)
+    return summary
+
+
+async def run(corpus_path: str, repeats: int, max_pairs: Optional[int]) -> Dict[str, Any]:
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    cvs = [d for d in corpus if d["id"].startswith("cv_")]
+    jobs = [d for d in corpus if d["id"].startswith("job_")]
+    pairs = [(cv, job) for cv in cvs for job in jobs][:max_pairs]
+
+    llm_response_cache.enabled = False # Every run must hit the API
+    results = []
+    for cv, job in pairs:
+        print(f"⏱️  {cv['id']} x {job['id']}...", file=sys.stderr)
+        results.append(await _run_pair(cv, job, repeats))
+    return {"repeats": repeats, "pairs": results, "summary": _summarize(results)}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Two-call vs combined Gemini analysis benchmark")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--max-pairs", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if model is None:
+        print("❌ Gemini model is not initialized (set GOOGLE_API_KEY).", file=sys.stderr)
+        return 2
+
+    report = asyncio.run(run(args.corpus, args.repeats, args.max_pairs))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
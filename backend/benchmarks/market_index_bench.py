@@ -0,0 +1,169 @@
+"""
+Memory footprint and lookup throughput of MarketDemandIndex versus the
+previous dict-of-lists representation of skill demand / top roles.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.market_index_bench [--usa-jobs data/usa_job_posting_dataset.csv]
+    python -m benchmarks.market_index_bench --synthetic 300000 --output bench_market.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from core.market_index import MarketDemandIndex
+from core.market_snapshot import USA_JOBS_PATH, _build_demand_arrays, get_key_index, get_strings
+
+
+def _synthetic_jobs_csv(rows: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    keywords = [f"skill {i}" for i in range(max(1, rows // 20))]
+    titles = [f"Job Title {i}" for i in range(max(1, rows // 50))]
+    df = pd.DataFrame({
+        'Job Posting Title': [rng.choice(titles) for _ in range(rows)],
+        'Skill Keyword': [rng.choice(keywords).title() for _ in range(rows)],
+        'Count': [rng.randint(1, 400) for _ in range(rows)],
+    })
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    df.to_csv(path, index=False)
+    return path
+
+
+def _build_legacy(usa_jobs_path: str):
+    """The original DataLoader pre-computation (dicts of lists of dicts)."""
+    usa_jobs_df = pd.read_csv(usa_jobs_path)
+    usa_jobs_df['Skill_Keyword_lower'] = usa_jobs_df['Skill Keyword'].str.lower()
+    skill_demand = usa_jobs_df.groupby('Skill_Keyword_lower')['Count'].sum().to_dict()
+    top_roles_for_skill = usa_jobs_df.groupby('Skill_Keyword_lower', group_keys=False).apply(
+        lambda g: g.nlargest(5, 'Count')[['Job Posting Title', 'Count']].to_dict('records'),
+        include_groups=False
+    ).to_dict()
+    return skill_demand, top_roles_for_skill
+
+
+def _legacy_get_market_demand(skill_demand, top_roles_for_skill, skill: str) -> Dict[str, Any]:
+    skill_lower = skill.lower()
+    total_demand = skill_demand.get(skill_lower, 0)
+    if total_demand > 5000:
+        priority = 'Critical'
+    elif total_demand > 2000:
+        priority = 'High'
+    elif total_demand > 500:
+        priority = 'Medium'
+    else:
+        priority = 'Low'
+    return {
+        'skill': skill,
+        'total_demand': int(total_demand),
+        'top_roles': top_roles_for_skill.get(skill_lower, []),
+        'priority': priority
+    }
+
+
+def _deep_sizeof(obj, seen=None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def _throughput(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    lookups = 0
+    for _ in range(repeats):
+        lookups += fn()
+    return lookups / (time.perf_counter() - start)
+
+
+def run(usa_jobs_path: str, queries: int, repeats: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    skill_demand, top_roles_for_skill = _build_legacy(usa_jobs_path)
+    legacy_build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    arrays: Dict[str, np.ndarray] = {}
+    _build_demand_arrays(usa_jobs_path, arrays)
+    index = MarketDemandIndex(
+        get_key_index(arrays, "demand_key"), arrays["demand_total"], arrays["role_offsets"],
+        arrays["role_title_ids"], arrays["role_counts"], get_strings(arrays, "role_title"),
+    )
+    index_build_s = time.perf_counter() - start
+
+    # Mix of known keywords (in varying case) and misses
+    rng = random.Random(11)
+    known = list(skill_demand.keys())
+    skills: List[str] = [
+        rng.choice(known).title() if rng.random() < 0.8 else f"unknown skill {i}"
+        for i in range(queries)
+    ]
+
+    legacy_results = [_legacy_get_market_demand(skill_demand, top_roles_for_skill, s) for s in skills]
+    index_results = index.get_market_demand_batch(skills)
+    mismatches = sum(1 for a, b in zip(legacy_results, index_results) if a != b)
+
+    return {
+        "usa_jobs_path": usa_jobs_path,
+        "keywords": len(index),
+        "queries": queries,
+        "result_mismatches": mismatches,
+        "build_seconds": {"legacy_dicts": round(legacy_build_s, 3), "market_index": round(index_build_s, 3)},
+        "memory_mb": {
+            "legacy_dicts": round((_deep_sizeof(skill_demand) + _deep_sizeof(top_roles_for_skill)) / 1e6, 2),
+            "market_index": round(index.nbytes() / 1e6, 2),
+        },
+        "lookups_per_second": {
+            "legacy_single": round(_throughput(
+                lambda: len([_legacy_get_market_demand(skill_demand, top_roles_for_skill, s) for s in skills]), repeats)),
+            "index_single": round(_throughput(
+                lambda: len([index.get_market_demand(s) for s in skills]), repeats)),
+            "index_batch": round(_throughput(
+                lambda: len(index.get_market_demand_batch(skills)), repeats)),
+            "index_demand_vector": round(_throughput(
+                lambda: len(index.demand(skills)), repeats)),
+        },
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="MarketDemandIndex vs dict benchmark")
+    parser.add_argument("--usa-jobs", default=USA_JOBS_PATH)
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic job rows instead")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    usa_jobs_path = args.usa_jobs
+    synthetic_path = None
+    if args.synthetic or not os.path.isfile(usa_jobs_path):
+        synthetic_path = usa_jobs_path = _synthetic_jobs_csv(args.synthetic or 100000)
+    try:
+        report = run(usa_jobs_path, args.queries, args.repeats)
+    finally:
+        if synthetic_path:
+            os.unlink(synthetic_path)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["result_mismatches"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
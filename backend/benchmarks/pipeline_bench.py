@@ -0,0 +1,316 @@
+"""
+Stage-level latency and throughput of the /api/analyze pipeline, offline.
+
+CV PDFs are rendered from the fixture corpus (plus any PDFs found in
+--pdf-dir) and paired with the corpus job descriptions. Gemini is replaced
+by a stub of `core.ai_analyzer.model` that streams canned JSON after a
+configurable latency, so only local work is measured: PDF text extraction,
+skill extraction (GLiNER, or the dictionary engine), normalize_skills, the
+quantitative report (get_market_demand_batch + scoring), streamed JSON
+parsing and response model construction.
+
+Each concurrency level runs the same request mix with that many requests in
+flight; p50/p95 are reported per stage and level. Skill caches are off
+unless SKILL_CACHE_ENABLED is set, and the LLM response cache is bypassed.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.pipeline_bench [--requests 32] [--concurrency 1 4 16]
+    python -m benchmarks.pipeline_bench --llm-latency-ms 0 --pdf-dir cv_uploads --output bench_pipeline.json
+"""
+
+import os
+
+os.environ.setdefault("SKILL_CACHE_ENABLED", "false") # Read at import time by core.skill_extractor
+
+import argparse
+import asyncio
+import contextvars
+import io
+import json
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import core.ai_analyzer as ai_analyzer
+from core.ai_analyzer import FinishReason, call_gemini_analyzer
+from core.json_stream import IncrementalJSONParser
+from core.llm_cache import llm_response_cache
+from core.skill_extractor import SKILL_EXTRACTOR_ENGINE, normalize_skills
+
+CORPUS_PATH = "core/fixtures/skill_parity_corpus.json"
+STAGES = ("pdf_text", "skill_extraction", "normalize_skills", "market_demand",
+          "llm_stub", "json_parse", "response_model", "total")
+
+CANNED_ANALYZER = {
+    "cv_profile": [
+        {"skill": "Python", "proficiency_you": 4, "evidence": "5 years of Python development"},
+        {"skill": "SQL", "proficiency_you": 3, "evidence": "Wrote reporting queries in SQL"},
+        {"skill": "Excel", "proficiency_you": 3, "evidence": "Built Excel models"},
+    ],
+    "job_profile": [
+        {"skill": "Python", "proficiency_req": 4, "is_must_have": True},
+        {"skill": "Kubernetes", "proficiency_req": 3, "is_must_have": True},
+        {"skill": "Terraform", "proficiency_req": 3, "is_must_have": False},
+        {"skill": "SQL", "proficiency_req": 2, "is_must_have": False},
+    ],
+    "overall_scores": {"coverage": 60, "depth": 55, "recency": 70},
+    "low_value_skills": ["Excel"],
+}
+CANNED_COACH = {
+    "summary": "Solid programming base. Infrastructure tooling is the main gap.",
+    "priority_actions": [
+        {"action": "Learn Kubernetes", "difficulty": "medium", "time_estimate": "4 weeks", "why": "Must-have for the role."},
+        {"action": "Learn Terraform", "difficulty": "medium", "time_estimate": "3 weeks", "why": "Used for all infrastructure."},
+    ],
+    "learning_paths": [
+        {"skill": "Kubernetes", "path_title": "Kubernetes Basics", "platform": "Official documentation"},
+    ],
+    "resume_edits": [
+        {"before": "Wrote reporting queries in SQL", "after": "Automated reporting pipelines in SQL and Python"},
+    ],
+}
+
+# Per-request stage timings, so parsing time inside _stream_json lands on the right request
+_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("pipeline_timings", default=None)
+
+
+class _TimedJSONParser(IncrementalJSONParser):
+    def feed(self, chunk: str):
+        start = time.perf_counter()
+        try:
+            return super().feed(chunk)
+        finally:
+            timings = _timings.get()
+            if timings is not None:
+                timings["json_parse"] += time.perf_counter() - start
+
+
+class StubModel:
+    """Stands in for the Gemini model: canned JSON, streamed in chunks after `latency_s`."""
+
+    def __init__(self, latency_s: float, chunk_chars: int = 64):
+        self.latency_s = latency_s
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False):
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        text = json.dumps(CANNED_ANALYZER if "Skills Gap Analyzer" in prompt else CANNED_COACH)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+
+        async def stream_chunks():
+            for n, chunk in enumerate(chunks):
+                finish = FinishReason.STOP if n == len(chunks) - 1 else None
+                part = SimpleNamespace(text=chunk)
+                yield SimpleNamespace(candidates=[
+                    SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason=finish)
+                ])
+
+        return stream_chunks()
+
+
+def _pdf_escape(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def render_pdf(text: str, lines_per_page: int = 50) -> bytes:
+    """Minimal text-only PDF (Helvetica, one line per text row) for pdfplumber."""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        words, current = paragraph.split(), ""
+        for word in words:
+            if current and len(current) + len(word) > 90:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}".strip()
+        lines.append(current)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        rows = "".join(f"({_pdf_escape(line)}) Tj T* " for line in page_lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 800 Td {rows}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def load_inputs(corpus_path: str, pdf_dir: Optional[str]) -> Dict[str, Any]:
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    cvs = [(d["id"], render_pdf(d["text"])) for d in corpus if d["id"].startswith("cv_")]
+    jobs = [d for d in corpus if d["id"].startswith("job_")]
+    if pdf_dir and os.path.isdir(pdf_dir):
+        for name in sorted(os.listdir(pdf_dir)):
+            if name.lower().endswith(".pdf"):
+                with open(os.path.join(pdf_dir, name), "rb") as f:
+                    cvs.append((name, f.read()))
+    return {"cvs": cvs, "jobs": jobs}
+
+
+async def analyze_once(cv_pdf: bytes, job: Dict[str, str]) -> Dict[str, float]:
+    """One /api/analyze request, stage by stage (same calls, same order as full_ai_analysis)."""
+    from api.analysis import (FullAnalysisResponse, _analyzer_stage, _build_quantitative_report,
+                              _coach_stage, _run_coach, extract_text_from_pdf)
+    from core.data_loader import get_data_loader
+    from core.inference_pool import extract_skills_async
+
+    timings = {stage: 0.0 for stage in STAGES}
+    _timings.set(timings)
+    clock = time.perf_counter
+
+    def lap(stage: str, since: float) -> float:
+        now = clock()
+        timings[stage] += now - since
+        return now
+
+    start = t = clock()
+    cv_text = extract_text_from_pdf(io.BytesIO(cv_pdf))
+    t = lap("pdf_text", t)
+    raw_cv_skills, raw_job_skills = await extract_skills_async([cv_text, job["text"]])
+    t = lap("skill_extraction", t)
+    data_loader = get_data_loader()
+    cv_skills = normalize_skills(raw_cv_skills, data_loader)
+    job_skills = normalize_skills(raw_job_skills, data_loader)
+    t = lap("normalize_skills", t)
+    quant_report = _build_quantitative_report(cv_skills, job_skills, data_loader, job["text"])
+    t = lap("market_demand", t)
+
+    analyzer_raw = await call_gemini_analyzer(cv_text, job["text"], quant_report.cv_skills, quant_report.job_skills)
+    t = lap("llm_stub", t)
+    analyzer = _analyzer_stage(analyzer_raw)
+    t = lap("response_model", t)
+    coach_raw = await _run_coach(job["id"], analyzer, cv_text)
+    t = lap("llm_stub", t)
+    FullAnalysisResponse(
+        quantitative_summary=quant_report,
+        **analyzer.model_dump(),
+        **_coach_stage(coach_raw).model_dump()
+    )
+    lap("response_model", t)
+
+    timings["llm_stub"] -= timings["json_parse"] # Parsing happens inside the streamed calls
+    timings["total"] = clock() - start
+    return {stage: value * 1000 for stage, value in timings.items()}
+
+
+async def run_level(inputs: Dict[str, Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    pairs = [(cv, job) for cv in inputs["cvs"] for job in inputs["jobs"]]
+    slots = asyncio.Semaphore(concurrency)
+    samples: List[Dict[str, float]] = []
+    errors: List[str] = []
+
+    async def one(n: int):
+        (_, cv_pdf), job = pairs[n % len(pairs)]
+        async with slots:
+            try:
+                samples.append(await analyze_once(cv_pdf, job))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {str(e)[:200]}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    stages = {}
+    for stage in STAGES:
+        values = [s[stage] for s in samples]
+        stages[stage] = {
+            "p50_ms": _percentile(values, 0.5),
+            "p95_ms": _percentile(values, 0.95),
+            "mean_ms": round(statistics.fmean(values), 3) if values else None,
+        }
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "stages": stages,
+    }
+
+
+async def run(inputs: Dict[str, Any], requests: int, levels: List[int], warmup: int) -> List[Dict[str, Any]]:
+    from core.inference_pool import skill_inference_pool
+
+    try:
+        if warmup:
+            await run_level(inputs, warmup, 1) # Model load, automaton build, first-call overheads
+        results = []
+        for concurrency in levels:
+            print(f"⏱️  {requests} requests at concurrency {concurrency}...", file=sys.stderr)
+            results.append(await run_level(inputs, requests, concurrency))
+        return results
+    finally:
+        await skill_inference_pool.shutdown()
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stage-level /api/analyze pipeline benchmark (stubbed Gemini)")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--pdf-dir", default=None, help="Also use every PDF in this directory as a CV")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Stubbed Gemini latency per call")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    inputs = load_inputs(args.corpus, args.pdf_dir)
+    if not inputs["cvs"] or not inputs["jobs"]:
+        print("❌ No CVs or job descriptions found in the corpus.", file=sys.stderr)
+        return 2
+
+    stub = StubModel(args.llm_latency_ms / 1000)
+    ai_analyzer.model = stub
+    ai_analyzer.IncrementalJSONParser = _TimedJSONParser
+    llm_response_cache.enabled = False # Every request must go through the stub
+
+    levels = asyncio.run(run(inputs, args.requests, args.concurrency, args.warmup))
+    report = {
+        "skill_extractor_engine": SKILL_EXTRACTOR_ENGINE,
+        "skill_cache_enabled": os.environ.get("SKILL_CACHE_ENABLED"),
+        "llm_latency_ms": args.llm_latency_ms,
+        "cvs": [name for name, _ in inputs["cvs"]],
+        "jobs": [job["id"] for job in inputs["jobs"]],
+        "stub_llm_calls": stub.calls,
+        "levels": levels,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(level["errors"] == 0 for level in levels) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,38 @@
 import google.generativeai as genai
 import os
 import json
-import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from fastapi import HTTPException
 from dotenv import load_dotenv
 from enum import IntEnum
+from core.llm_cache import llm_response_cache
+from core.json_stream import IncrementalJSONParser
 
 load_dotenv()
 
+GEMINI_MODEL_NAME = "models/gemini-2.5-flash-lite"
+
+# two-call -> analyzer, then coach fed with the locally computed gaps (default)
+# combined -> one schema-constrained request returning both halves
+ANALYSIS_MODE_TWO_CALL = "two-call"
+ANALYSIS_MODE_COMBINED = "combined"
+GEMINI_ANALYSIS_MODE = os.getenv("GEMINI_ANALYSIS_MODE", ANALYSIS_MODE_TWO_CALL).lower()
+
+generation_config = {
+    "temperature": 0.2, 
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+}
+
+safety_settings = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
 try:
     API_KEY = os.getenv("GOOGLE_API_KEY")
     if not API_KEY:
@@ -16,23 +40,8 @@ try:
     
     genai.configure(api_key=API_KEY)
     
-    generation_config = {
-        "temperature": 0.2, 
-        "top_p": 1,
-        "top_k": 1,
-        "max_output_tokens": 8192,
-        "response_mime_type": "application/json",
-    }
-    
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-    ]
-    
     model = genai.GenerativeModel(
-        model_name="models/gemini-2.5-flash-lite",
+        model_name=GEMINI_MODEL_NAME,
         generation_config=generation_config,
         safety_settings=safety_settings
     )
@@ -40,43 +49,6 @@ try:
 except Exception as e:
     model = None
 
-def clean_json_response(text: str) -> Dict[str, Any]:
-    match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    json_str = ""
-    
-    if match:
-        json_str = match.group(1)
-    else:
-        start_idx = text.find('{')
-        if start_idx == -1:
-            raise ValueError(f"No JSON object found in response: {text[:200]}")
-        
-        brace_count = 0
-        end_idx = start_idx
-        
-        for i in range(start_idx, len(text)):
-            if text[i] == '{':
-                brace_count += 1
-            elif text[i] == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    end_idx = i + 1
-                    break
-        
-        if brace_count != 0:
-            raise ValueError(f"Incomplete JSON object (unbalanced braces). Response may have been truncated.")
-        
-        json_str = text[start_idx:end_idx]
-    
-    try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        json_str_fixed = re.sub(r',\s*([\]\}])', r'\1', json_str)
-        try:
-            return json.loads(json_str_fixed)
-        except json.JSONDecodeError:
-            raise ValueError(f"Failed to parse JSON. Original error: {e}. The response might be incomplete or invalid.")
-
 class FinishReason(IntEnum):
     STOP = 0
     MAX_TOKENS = 1
@@ -102,45 +74,100 @@ def _extract_candidate_text(candidate) -> str:
     return "\n".join(texts).strip()
 
 
-def check_response_safety(response):
-    """Validate Gemini response and handle safety blocks."""
-    try:
-        candidates = getattr(response, "candidates", None) or []
-    except Exception:
-        raise HTTPException(status_code=500, detail="AI Error: Missing candidates in response.")
-
-    if not candidates:
-        block_reason = getattr(getattr(response, "prompt_feedback", None), "block_reason", None)
-        if block_reason:
-            raise HTTPException(status_code=400, detail=f"AI request blocked for safety: {block_reason}")
-        raise HTTPException(status_code=502, detail="AI Error: Empty response (no candidates).")
-
-    collected_texts = []
-    blocked_reasons = []
-    finish_reasons = []
-
-    for cand in candidates:
-        fr = getattr(cand, "finish_reason", None)
-        finish_reasons.append(fr)
-        if fr in {FinishReason.SAFETY, FinishReason.BLOCKLIST, FinishReason.PROHIBITED_CONTENT, FinishReason.SPII}:
-            blocked_reasons.append(fr)
+# Called with (top-level key, value) for every completed array element (e.g.
+# each cv_profile entry) and every other completed top-level member
+ItemCallback = Callable[[str, Any], None]
+
+_BLOCKED_FINISH_REASONS = {FinishReason.SAFETY, FinishReason.BLOCKLIST, FinishReason.PROHIBITED_CONTENT, FinishReason.SPII}
+
+class TruncatedResponseError(Exception):
+    """The streamed JSON object never closed (e.g. max tokens reached)."""
+    def __init__(self, partial: Dict[str, Any]):
+        super().__init__("AI response truncated before the JSON object was complete.")
+        self.partial = partial
+
+async def _stream_json(prompt: str, config: Dict[str, Any], on_item: Optional[ItemCallback]) -> Dict[str, Any]:
+    """
+    Streams a Gemini response through the incremental JSON parser, reporting
+    each completed element through `on_item` as soon as it arrives.
+    A safety finish reason fails the call even after part of the object has
+    parsed, so the caller's safety retry runs instead of keeping the partial.
+    """
+    parser = IncrementalJSONParser()
+    blocked = False
+    received_text = False
+
+    response = await model.generate_content_async(prompt, generation_config=config, stream=True)
+    async for chunk in response:
+        candidates = getattr(chunk, "candidates", None) or []
+        if not candidates:
+            block_reason = getattr(getattr(chunk, "prompt_feedback", None), "block_reason", None)
+            if block_reason:
+                raise HTTPException(status_code=400, detail=f"AI request blocked for safety: {block_reason}")
+            continue
+
+        candidate = candidates[0] # Single candidate: parts of several would interleave
+        if getattr(candidate, "finish_reason", None) in _BLOCKED_FINISH_REASONS:
+            blocked = True
             continue
-        text_segment = _extract_candidate_text(cand)
+        text_segment = _extract_candidate_text(candidate)
         if text_segment:
-            collected_texts.append(text_segment)
+            received_text = True
+            for key, value in parser.feed(text_segment):
+                if on_item:
+                    on_item(key, value)
 
-    if blocked_reasons and not collected_texts:
+    if blocked:
         raise HTTPException(status_code=400, detail="AI request blocked for safety. Please review the CV / job description content.")
-
-    if not collected_texts:
-        if FinishReason.MAX_TOKENS in finish_reasons:
-            raise HTTPException(status_code=502, detail="AI response truncated (max tokens reached) and contained no usable text. Try reducing input size.")
+    if not received_text:
         raise HTTPException(status_code=502, detail="AI returned no textual content. Try again or simplify input.")
+    if not parser.complete:
+        raise TruncatedResponseError(parser.result)
+    return parser.result
+
+def _replay_items(result: Dict[str, Any], on_item: ItemCallback):
+    for key, value in result.items():
+        for item in (value if isinstance(value, list) else [value]):
+            on_item(key, item)
+
+async def _generate_json(call_name: str, prompt: str, config: Dict[str, Any] = None,
+                         required: Tuple[str, ...] = (), on_item: Optional[ItemCallback] = None) -> Dict[str, Any]:
+    """
+    Runs a rendered prompt through Gemini with streaming output, serving
+    repeated prompts (same text, model and generation config) from the LLM
+    response cache. `config` overrides the model's default generation config.
 
-    full_text = "\n".join(collected_texts).strip()
-    if not full_text:
-        raise HTTPException(status_code=502, detail="AI produced empty text after extraction.")
-    return full_text
+    A truncated response is not cached; its completed members are returned if
+    every `required` key made it, otherwise it is reported as a 502.
+    """
+    config = config or generation_config
+    streamed = False
+
+    async def generate() -> Dict[str, Any]:
+        nonlocal streamed
+        streamed = True
+        return await _stream_json(prompt, config, on_item)
+
+    key = llm_response_cache.key(prompt, GEMINI_MODEL_NAME, config, safety_settings)
+    try:
+        result = await llm_response_cache.get_or_generate(call_name, key, generate)
+    except TruncatedResponseError as e:
+        missing = [k for k in required if k not in e.partial]
+        if missing:
+            raise HTTPException(
+                status_code=502,
+                detail=f"AI response truncated (max tokens reached) before {', '.join(missing)}. Try reducing input size."
+            )
+        print(f"⚠️  {call_name}: AI response truncated, keeping {len(e.partial)} completed fields")
+        result = e.partial
+    # Cache hits and shared in-flight calls didn't stream to this caller
+    if on_item and not streamed:
+        _replay_items(result, on_item)
+    return result
+
+# Fields without which a truncated response is unusable (lists may be cut short)
+ANALYZER_REQUIRED_KEYS = ("cv_profile", "job_profile", "overall_scores")
+COACH_REQUIRED_KEYS = ("summary",)
 
 ANALYZER_PROMPT_TEMPLATE = """
 You are a 'Skills Gap Analyzer' AI. I have extracted text from a CV and a Job Description. 
@@ -168,7 +195,8 @@ CV_SKILLS_EXTRACTED: {cv_skills_list}
 ---
 JOB_SKILLS_EXTRACTED: {job_skills_list}
 """
-async def call_gemini_analyzer(cv_text: str, job_text: str, cv_skills: List[Any], job_skills: List[Any]) -> Dict[str, Any]:
+async def call_gemini_analyzer(cv_text: str, job_text: str, cv_skills: List[Any], job_skills: List[Any],
+                               on_item: Optional[ItemCallback] = None) -> Dict[str, Any]:
     if not model: raise HTTPException(status_code=500, detail="Gemini AI model is not initialized.")
     cv_skills_simple = [{"skill": s.normalized, "evidence": s.evidence} for s in cv_skills]
     job_skills_simple = [s.normalized for s in job_skills]
@@ -178,9 +206,7 @@ async def call_gemini_analyzer(cv_text: str, job_text: str, cv_skills: List[Any]
         job_skills_list=json.dumps(job_skills_simple, indent=2)
     )
     try:
-        response = await model.generate_content_async(prompt)
-        response_text = check_response_safety(response)
-        return clean_json_response(response_text)
+        return await _generate_json("analyzer", prompt, required=ANALYZER_REQUIRED_KEYS, on_item=on_item)
     except Exception as e:
         raise e
 
@@ -225,7 +251,8 @@ USER_CV_TEXT:
 {cv_text}
 """
 
-async def call_gemini_coach(job_title: str, gap_list: List[Dict], low_value_skills: List[str], cv_text: str) -> Dict[str, Any]:
+async def call_gemini_coach(job_title: str, gap_list: List[Dict], low_value_skills: List[str], cv_text: str,
+                            on_item: Optional[ItemCallback] = None) -> Dict[str, Any]:
     if not model:
         raise HTTPException(status_code=500, detail="Gemini AI model is not initialized.")
 
@@ -240,8 +267,101 @@ async def call_gemini_coach(job_title: str, gap_list: List[Dict], low_value_skil
     )
     
     try:
-        response = await model.generate_content_async(prompt)
-        response_text = check_response_safety(response)
-        return clean_json_response(response_text)
+        return await _generate_json("coach", prompt, required=COACH_REQUIRED_KEYS, on_item=on_item)
     except Exception as e:
-        raise e
\ No newline at end of file
+        raise e
+
+# --- Combined (single-call) analyzer + coach ---
+
+def _object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+def _array_schema(items: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "array", "items": items}
+
+_STRING = {"type": "string"}
+_PROFICIENCY = {"type": "integer", "description": "Proficiency 1-5"}
+_PERCENT = {"type": "integer", "description": "0-100"}
+
+# Mirrors SkillProfile, JobRequirement, OverallScores, PriorityAction,
+# LearningPath and ResumeEdit in api/analysis.py
+COMBINED_RESPONSE_SCHEMA = _object_schema({
+    "cv_profile": _array_schema(_object_schema({
+        "skill": _STRING, "proficiency_you": _PROFICIENCY, "evidence": _STRING,
+    })),
+    "job_profile": _array_schema(_object_schema({
+        "skill": _STRING, "proficiency_req": _PROFICIENCY, "is_must_have": {"type": "boolean"},
+    })),
+    "overall_scores": _object_schema({"coverage": _PERCENT, "depth": _PERCENT, "recency": _PERCENT}),
+    "low_value_skills": _array_schema(_STRING),
+    "summary": _STRING,
+    "priority_actions": _array_schema(_object_schema({
+        "action": _STRING, "difficulty": _STRING, "time_estimate": _STRING, "why": _STRING,
+    })),
+    "learning_paths": _array_schema(_object_schema({
+        "skill": _STRING, "path_title": _STRING, "platform": _STRING,
+    })),
+    "resume_edits": _array_schema(_object_schema({"before": _STRING, "after": _STRING})),
+})
+
+combined_generation_config = {**generation_config, "response_schema": COMBINED_RESPONSE_SCHEMA}
+
+COMBINED_PROMPT_TEMPLATE = """
+You are 'UtopiaHire', a Skills Gap Analyzer and AI Career Coach. I have extracted text from a CV and a Job Description.
+Do both steps below in one pass and return a single JSON object following the response schema.
+
+STEP 1 - ANALYSIS. Infer proficiency levels from 1 (basic) to 5 (expert).
+- Look for words like 'expert', 'advanced', 'proficient' (3-4), or 'basic', 'familiar' (1-2) in the CV.
+- Look for years of experience (e.g., 6 years = 5, 3-5 years = 4, 1-2 years = 3).
+- For the job, look for 'must-have', 'expert' (4-5), 'required' (3-4), 'plus', 'nice-to-have' (2).
+- If no info, estimate: 3 for CV skills, 3 for job skills.
+- Fill `cv_profile`, `job_profile`, `overall_scores` (coverage, depth, recency as 0-100) and
+  `low_value_skills` (CV skills irrelevant for this job).
+
+STEP 2 - COACHING for the TARGET_ROLE, based on your own STEP 1 result. A gap is a job skill whose
+proficiency_req is higher than the CV proficiency (0 if the skill is absent from the CV); must-have gaps first.
+- Be encouraging and professional. `summary` is a brief, 2-sentence summary of the user's position.
+- For `priority_actions`, focus on the top 3-4 gaps. Give a brief 'why'. difficulty is low/medium/high.
+- For `learning_paths`, find 1-2 REAL courses from platforms like Coursera, Udacity, freeCodeCamp, or official documentation.
+- For `resume_edits`:
+  - You MUST find an ACTUAL sentence or bullet point from the CV_TEXT to use as the "before" snippet.
+  - The "before" snippet MUST be a real quote. DO NOT invent it.
+  - Then, provide an "after" snippet that re-frames that exact sentence to be more aligned with the target role.
+
+---
+HERE IS THE DATA:
+---
+TARGET_ROLE: {job_title}
+---
+CV_TEXT: {cv_text}
+---
+JOB_DESCRIPTION_TEXT: {job_description}
+---
+CV_SKILLS_EXTRACTED: {cv_skills_list}
+---
+JOB_SKILLS_EXTRACTED: {job_skills_list}
+"""
+
+async def call_gemini_combined(cv_text: str, job_text: str, job_title: str,
+                               cv_skills: List[Any], job_skills: List[Any],
+                               on_item: Optional[ItemCallback] = None) -> Dict[str, Any]:
+    """
+    Analyzer and coach in a single structured-output request. Returns the
+    analyzer keys (cv_profile, job_profile, overall_scores, low_value_skills)
+    plus the coach keys (summary, priority_actions, learning_paths, resume_edits).
+    """
+    if not model:
+        raise HTTPException(status_code=500, detail="Gemini AI model is not initialized.")
+
+    cv_skills_simple = [{"skill": s.normalized, "evidence": s.evidence} for s in cv_skills]
+    job_skills_simple = [s.normalized for s in job_skills]
+    prompt = COMBINED_PROMPT_TEMPLATE.format(
+        job_title=job_title or "Target Role",
+        cv_text=cv_text[:4000], job_description=job_text[:4000],
+        cv_skills_list=json.dumps(cv_skills_simple, indent=2),
+        job_skills_list=json.dumps(job_skills_simple, indent=2)
+    )
+    return await _generate_json(
+        "combined", prompt, combined_generation_config,
+        required=ANALYZER_REQUIRED_KEYS + COACH_REQUIRED_KEYS, on_item=on_item
+    )
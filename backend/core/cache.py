@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Content-addressed key: SHA-256 of the JSON encoding of all parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache for JSON-serializable values.
+
+    - Memory tier: bounded LRU (OrderedDict) of serialized values.
+    - Disk tier (optional): SQLite table that survives restarts, pruned to
+      `max_disk_items` by least-recent access.
+
+    `ensure_version` wipes both tiers when the version string changes (e.g. a
+    model, label set or reference-data fingerprint), so stale entries are
+    invalidated automatically. Thread-safe; callable from executor threads.
+    """
+
+    _PRUNE_EVERY = 256
+
+    def __init__(self, name: str, max_memory_items: int = 1024, db_path: Optional[str] = None,
+                 max_disk_items: int = 50000, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.max_memory_items = max(0, max_memory_items)
+        self.max_disk_items = max(0, max_disk_items)
+        self.ttl_seconds = ttl_seconds
+        self.version: Optional[str] = None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_prune = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" ('
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._db.execute(f'CREATE INDEX IF NOT EXISTS "{name}_accessed_at" ON "{name}" (accessed_at)')
+                self._db.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, version TEXT)")
+            except sqlite3.Error as e:
+                print(f"⚠️  {name}: disk cache unavailable ({e}), using memory tier only")
+                self._db = None
+
+    def ensure_version(self, version: str):
+        """Drops every entry if the cache was populated under another version."""
+        with self._lock:
+            if self.version == version:
+                return
+            self._memory.clear()
+            if self._db is not None:
+                row = self._db.execute("SELECT version FROM cache_meta WHERE name = ?", (self.name,)).fetchone()
+                if row is None or row[0] != version:
+                    self._db.execute(f'DELETE FROM "{self.name}"')
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cache_meta (name, version) VALUES (?, ?)", (self.name, version)
+                    )
+            self.version = version
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f'SELECT value, created_at FROM "{self.name}" WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute(f'UPDATE "{self.name}" SET accessed_at = ? WHERE key = ?', (now, key))
+                        self._remember(key, value, created_at)
+                        self.disk_hits += 1
+                        return json.loads(value)
+                    self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        serialized = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, serialized, now)
+            self.writes += 1
+            if self._db is not None:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, serialized, now, now),
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= self._PRUNE_EVERY:
+                    self._prune_disk()
+
+    def _remember(self, key: str, serialized: str, created_at: float):
+        if self.max_memory_items == 0:
+            return
+        self._memory[key] = (serialized, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self):
+        self._writes_since_prune = 0
+        if self.ttl_seconds is not None:
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            f'DELETE FROM "{self.name}" WHERE key IN ('
+            f'SELECT key FROM "{self.name}" ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_items,),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}"')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            disk_items = (
+                self._db.execute(f'SELECT COUNT(*) FROM "{self.name}"').fetchone()[0]
+                if self._db is not None else 0
+            )
+            return {
+                "name": self.name,
+                "version": self.version,
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,102 @@
+import hashlib
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+class StringTable:
+    """
+    Immutable list of strings stored as one UTF-8 byte blob plus an offsets
+    array (offsets[i]:offsets[i+1] is string i). Both arrays can be memory
+    mapped straight from a snapshot file.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> "StringTable":
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def to_list(self) -> List[str]:
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    def nbytes(self) -> int:
+        return self.blob.nbytes + self.offsets.nbytes
+
+
+def key_hash(key: str) -> int:
+    """Stable 64-bit hash of a key (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class KeyIndex:
+    """
+    Exact string -> position lookup backed by arrays instead of a dict.
+
+    `hashes` holds the sorted 64-bit hashes of the keys and `positions` the
+    matching row in `keys`; a batch of queries is resolved with one vectorized
+    searchsorted, then verified against the stored string.
+    """
+
+    def __init__(self, keys: StringTable, hashes: np.ndarray, positions: np.ndarray):
+        self.keys = keys
+        self.hashes = hashes
+        self.positions = positions
+
+    @classmethod
+    def build(cls, keys: StringTable) -> "KeyIndex":
+        hashes = np.fromiter((key_hash(k) for k in keys.to_list()), dtype=np.uint64, count=len(keys))
+        order = np.argsort(hashes, kind="stable")
+        return cls(keys, hashes[order], order.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, queries: Sequence[str]) -> np.ndarray:
+        """Row of each query in `keys`, or -1 when absent."""
+        result = np.full(len(queries), -1, dtype=np.int64)
+        if not len(queries) or not len(self.hashes):
+            return result
+        query_hashes = np.fromiter((key_hash(q) for q in queries), dtype=np.uint64, count=len(queries))
+        slots = np.searchsorted(self.hashes, query_hashes)
+        clipped = np.minimum(slots, len(self.hashes) - 1)
+        candidates = self.positions[clipped]
+        hits = np.flatnonzero(self.hashes[clipped] == query_hashes)
+
+        offsets, blob = self.keys.offsets, self.keys.blob
+        for i, position in zip(hits.tolist(), candidates[hits].tolist()):
+            query = queries[i]
+            if blob[offsets[position]:offsets[position + 1]].tobytes() == query.encode("utf-8"):
+                result[i] = position
+                continue
+            # 64-bit collision: walk the run of equal hashes
+            slot = int(slots[i]) + 1
+            while slot < len(self.hashes) and self.hashes[slot] == query_hashes[i]:
+                position = int(self.positions[slot])
+                if self.keys[position] == query:
+                    result[i] = position
+                    break
+                slot += 1
+        return result
+
+    def get(self, query: str) -> Optional[int]:
+        position = int(self.lookup([query])[0])
+        return None if position < 0 else position
+
+    def nbytes(self) -> int:
+        return self.keys.nbytes() + self.hashes.nbytes + self.positions.nbytes
@@ -0,0 +1,272 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from core.data_loader import DataLoader
+from core.skill_extractor import extract_skills_without_model, normalize_skills
+
+# Inverted index ESCO skill id -> CV ids, persisted in SQLite so stored CVs
+# are never re-extracted. Set CV_INDEX_DB to an empty string to keep it in
+# memory only.
+CV_INDEX_DB = os.getenv("CV_INDEX_DB", os.path.join("data", "cache", "cv_index.sqlite3"))
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Structured CVs that /api/analyze-structured used to save as JSON files (new
+# ones live in the database and are indexed on save, see structured_cv_store)
+STRUCTURED_CV_DIRS = [
+    os.path.join(_BACKEND_DIR, "app", "data", "cv_data"),
+    os.path.join(_BACKEND_DIR, "app", "routes", "data", "cv_data"),
+]
+# PDFs uploaded for interviews (app/routes/service.py)
+CV_UPLOAD_DIR = os.path.join(_BACKEND_DIR, "cv_uploads")
+
+SOURCE_ANALYSIS = "analysis"
+SOURCE_STRUCTURED = "structured"
+SOURCE_UPLOAD = "upload"
+
+_FILE_NAME_PATTERN = re.compile(r"\.(?:pdf|json|docx?|txt)$", re.IGNORECASE)
+
+# Structured CV sections that never hold skills
+_SKIPPED_SECTIONS = {"contact", "id", "startDate", "endDate", "gpa", "location"}
+
+
+def skill_id(skill: Dict[str, Any]) -> str:
+    """ESCO URI of a normalized skill, or its lowercased label for skills outside ESCO."""
+    return skill.get("uri") or skill["normalized"].lower()
+
+
+def public_cv_id(cv_id: str) -> str:
+    """Opaque id of an indexed CV: internal ids embed stored file names."""
+    return hashlib.sha256(cv_id.encode("utf-8")).hexdigest()[:16]
+
+
+def _public_label(cv_id: str, document: Dict[str, Any]) -> str:
+    """The candidate name when one was found; file-name fallbacks are not shown."""
+    label = document["label"]
+    if label == cv_id or _FILE_NAME_PATTERN.search(label) or document["source"] == SOURCE_UPLOAD:
+        return f"{document['source'].capitalize()} CV {public_cv_id(cv_id)[:8]}"
+    return label
+
+
+def structured_cv_text(structured_cv: Any) -> str:
+    """All free text of a structured CV (contact details and dates left out)."""
+    parts: List[str] = []
+
+    def walk(value: Any):
+        if isinstance(value, str):
+            if value and value != "Not provided":
+                parts.append(value)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in _SKIPPED_SECTIONS:
+                    walk(item)
+
+    walk(structured_cv)
+    return "\n".join(parts)
+
+
+def _pdf_text(path: str) -> str:
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+
+class CVSkillIndex:
+    """
+    Inverted index from normalized skill ids to the stored CVs that have them.
+
+    CVs are added one at a time as they are analyzed (add_cv replaces any
+    previous entry for the same id), and stored CV files are picked up
+    incrementally by sync_stored_cvs using dictionary matching only. Ranking a
+    job touches only the posting lists of the job's skills, so it costs
+    O(sum of posting lengths), independent of how the CVs were extracted.
+    Thread-safe.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock() # One directory scan at a time
+        self.postings: Dict[str, Set[str]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self._db: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cv_documents ("
+                    "cv_id TEXT PRIMARY KEY, source TEXT NOT NULL, label TEXT NOT NULL, "
+                    "skills TEXT NOT NULL, indexed_at REAL NOT NULL)"
+                )
+                self._load()
+            except sqlite3.Error as e:
+                print(f"⚠️ CV index disk store disabled ({e}); index kept in memory only.")
+                self._db = None
+
+    def _load(self):
+        rows = self._db.execute("SELECT cv_id, source, label, skills, indexed_at FROM cv_documents").fetchall()
+        for cv_id, source, label, skills, indexed_at in rows:
+            self._index(cv_id, source, label, json.loads(skills), indexed_at)
+        print(f"✅ CV index loaded: {len(self.documents)} CVs, {len(self.postings)} skills.")
+
+    def _index(self, cv_id: str, source: str, label: str, skills: Dict[str, str], indexed_at: float):
+        self.documents[cv_id] = {"source": source, "label": label, "skills": skills, "indexed_at": indexed_at}
+        for sid in skills:
+            self.postings.setdefault(sid, set()).add(cv_id)
+
+    def _unindex(self, cv_id: str):
+        document = self.documents.pop(cv_id, None)
+        if document is None:
+            return
+        for sid in document["skills"]:
+            posting = self.postings.get(sid)
+            if posting is not None:
+                posting.discard(cv_id)
+                if not posting:
+                    del self.postings[sid]
+
+    def add_cv(self, cv_id: str, source: str, label: str, skills: Sequence[Dict[str, Any]]):
+        """Indexes (or re-indexes) one CV from its normalized skills."""
+        skill_labels = {skill_id(s): s["normalized"] for s in skills}
+        indexed_at = time.time()
+        with self._lock:
+            self._unindex(cv_id)
+            self._index(cv_id, source, label, skill_labels, indexed_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cv_documents (cv_id, source, label, skills, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                        (cv_id, source, label, json.dumps(skill_labels, ensure_ascii=False), indexed_at),
+                    )
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not persist CV {cv_id} in the index: {e}")
+
+    def __contains__(self, cv_id: str) -> bool:
+        return cv_id in self.documents
+
+    def add_structured_cv(self, cv_id: str, structured_cv: Dict[str, Any], data_loader: DataLoader,
+                          fallback_label: str = "") -> int:
+        """Indexes one structured CV (dictionary + regex extraction); returns its number of skills."""
+        text = structured_cv_text(structured_cv)
+        label = (structured_cv.get("contact") or {}).get("name") or fallback_label or cv_id
+        skills = normalize_skills(extract_skills_without_model(text, data_loader), data_loader)
+        self.add_cv(cv_id, SOURCE_STRUCTURED, label, skills)
+        return len(skills)
+
+    def _stored_files(self) -> List[Tuple[str, str, str]]:
+        """(cv_id, source, path) of every stored CV file."""
+        files = []
+        for directory in STRUCTURED_CV_DIRS:
+            if os.path.isdir(directory):
+                files.extend(
+                    (f"{SOURCE_STRUCTURED}:{name}", SOURCE_STRUCTURED, os.path.join(directory, name))
+                    for name in os.listdir(directory) if name.endswith(".json")
+                )
+        if os.path.isdir(CV_UPLOAD_DIR):
+            files.extend(
+                (f"{SOURCE_UPLOAD}:{name}", SOURCE_UPLOAD, os.path.join(CV_UPLOAD_DIR, name))
+                for name in os.listdir(CV_UPLOAD_DIR) if name.lower().endswith(".pdf")
+            )
+        return files
+
+    def sync_stored_cvs(self, data_loader: DataLoader) -> int:
+        """
+        Indexes stored CV files not seen yet (dictionary + regex extraction,
+        no GLiNER or Gemini). Cheap when nothing is new; returns the number
+        of CVs added.
+        """
+        with self._sync_lock:
+            added = 0
+            for cv_id, source, path in self._stored_files():
+                if cv_id in self:
+                    continue
+                try:
+                    if source == SOURCE_STRUCTURED:
+                        with open(path, "r", encoding="utf-8") as f:
+                            stored = json.load(f)
+                        structured_cv = stored.get("structured_cv", stored)
+                    else:
+                        text = _pdf_text(path)
+                except Exception as e:
+                    print(f"⚠️ Skipping stored CV {path}: {e}")
+                    self.add_cv(cv_id, source, os.path.basename(path), []) # Don't retry on every sync
+                    continue
+                if source == SOURCE_STRUCTURED:
+                    self.add_structured_cv(cv_id, structured_cv, data_loader, os.path.basename(path))
+                else:
+                    skills = normalize_skills(extract_skills_without_model(text, data_loader), data_loader)
+                    self.add_cv(cv_id, source, os.path.basename(path), skills)
+                added += 1
+        if added:
+            print(f"📇 Indexed {added} stored CVs ({len(self.documents)} total).")
+        return added
+
+    def rank(self, job_skills: Sequence[Dict[str, Any]], weights: Dict[str, float],
+             top_n: int = 10) -> List[Dict[str, Any]]:
+        """
+        Top-N CVs by demand-weighted coverage of the job skills:
+        100 * sum(weight of matched skills) / sum(weight of all job skills).
+        """
+        job_labels = {skill_id(s): s["normalized"] for s in job_skills}
+        total_weight = sum(weights.get(sid, 1.0) for sid in job_labels)
+        if not total_weight:
+            return []
+
+        with self._lock:
+            scores: Dict[str, float] = {}
+            for sid in job_labels:
+                weight = weights.get(sid, 1.0)
+                for cv_id in self.postings.get(sid, ()):
+                    scores[cv_id] = scores.get(cv_id, 0.0) + weight
+            best = heapq.nlargest(top_n, scores.items(), key=lambda item: (item[1], item[0]))
+            documents = {cv_id: self.documents[cv_id] for cv_id, _ in best}
+
+        results = []
+        for cv_id, score in best:
+            document = documents[cv_id]
+            results.append({
+                "cv_id": public_cv_id(cv_id),
+                "source": document["source"],
+                "label": _public_label(cv_id, document),
+                "score": round(100 * score / total_weight, 2),
+                "matched_skills": [label for sid, label in job_labels.items() if sid in document["skills"]],
+                "missing_skills": [label for sid, label in job_labels.items() if sid not in document["skills"]],
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sources: Dict[str, int] = {}
+            for document in self.documents.values():
+                sources[document["source"]] = sources.get(document["source"], 0) + 1
+            return {
+                "cvs": len(self.documents),
+                "skills": len(self.postings),
+                "postings": sum(len(p) for p in self.postings.values()),
+                "by_source": sources,
+                "persistent": self._db is not None,
+            }
+
+
+_cv_index = None
+_cv_index_lock = threading.Lock()
+
+def get_cv_index() -> CVSkillIndex:
+    global _cv_index
+    if _cv_index is None:
+        with _cv_index_lock:
+            if _cv_index is None:
+                _cv_index = CVSkillIndex(CV_INDEX_DB or None)
+    return _cv_index
@@ -1,90 +1,183 @@
-import pandas as pd
-import os
+import threading
 import time
 from typing import Dict, Any, List, Optional
+import numpy as np
+from scipy import sparse
+from core.columnar import KeyIndex
+from core.dictionary_matcher import DictionaryAutomaton
+from core.fuzzy_matcher import CharNgramMatcher
+from core.market_index import MarketDemandIndex
+from core.semantic_matcher import get_semantic_matcher
+from core.market_snapshot import (
+    ESCO_LABEL_COLUMNS,
+    ESCO_SKILLS_PATH,
+    MARKET_SNAPSHOT_DIR,
+    USA_JOBS_PATH,
+    get_automaton,
+    get_key_index,
+    get_strings,
+    load_or_build,
+)
 
 class DataLoader:
-    def __init__(self, usa_jobs_path: str, esco_skills_path: str):
+    def __init__(self, usa_jobs_path: str, esco_skills_path: str, snapshot_dir: str = MARKET_SNAPSHOT_DIR):
         print("Data loader initializing...")
-        
-        # Load ESCO skills
-        print(f"Loading ESCO skills from {esco_skills_path}...")
-        self.esco_df = pd.read_csv(esco_skills_path)
-        # Pre-process for fast lookups
-        self.esco_df['preferredLabel_lower'] = self.esco_df['preferredLabel'].str.lower()
-        print(f"✅ Loaded {len(self.esco_df):,} ESCO skills.")
-
-        # Load USA jobs data
-        print(f"Loading USA jobs data from {usa_jobs_path}...")
-        usa_jobs_df = pd.read_csv(usa_jobs_path)
-        print(f"✅ Loaded {len(usa_jobs_df):,} job records.")
+        start_time = time.time()
 
         # --- OPTIMIZATION ---
-        # Pre-compute market demand and top roles
-        # This moves the 3-second 'groupby' from runtime to startup
-        print("Pre-computing market demand statistics...")
-        start_time = time.time()
-        
-        # 1. Calculate total demand per skill
-        usa_jobs_df['Skill_Keyword_lower'] = usa_jobs_df['Skill Keyword'].str.lower()
-        self.skill_demand = usa_jobs_df.groupby('Skill_Keyword_lower')['Count'].sum().to_dict()
-
-        # 2. Calculate top roles per skill (fixed to avoid FutureWarning)
-        self.top_roles_for_skill = usa_jobs_df.groupby('Skill_Keyword_lower', group_keys=False).apply(
-            lambda g: g.nlargest(5, 'Count')[['Job Posting Title', 'Count']].to_dict('records'),
-            include_groups=False
-        ).to_dict()
-        
-        end_time = time.time()
-        print(f"✅ Pre-computation finished in {end_time - start_time:.2f} seconds.")
-        # We no longer need the full 300k+ row dataframe
-        del usa_jobs_df
+        # All market data comes from a prebuilt, memory-mapped snapshot
+        # (core/market_snapshot.py). It is rebuilt from the CSVs only when they
+        # change, so startup is a few mmaps and workers share the pages.
+        arrays, self.snapshot_manifest = load_or_build(usa_jobs_path, esco_skills_path, snapshot_dir)
+        # Content hash of the ESCO snapshot, used to invalidate cached normalizations
+        self.esco_fingerprint = self.snapshot_manifest['sources']['esco_skills']['sha256']
+
+        # ESCO concepts and the label -> concept index (preferred/alt/hidden labels)
+        self.esco_preferred = get_strings(arrays, "esco_preferred")
+        self.esco_uris = get_strings(arrays, "esco_uri")
+        self.esco_types = get_strings(arrays, "esco_type")
+        self.esco_label_index: KeyIndex = get_key_index(arrays, "esco_label")
+        self._esco_label_record = arrays["esco_label_record"]
+        self._esco_label_column = arrays["esco_label_column"]
+        print(f"✅ Loaded {self.esco_count:,} ESCO skills ({len(self.esco_label_index):,} indexed labels).")
+
+        # Character-trigram TF-IDF over the same labels, for approximate matches
+        fuzzy_shape = tuple(int(d) for d in arrays["fuzzy_shape"])
+        self.fuzzy_matcher = CharNgramMatcher.from_arrays(
+            get_strings(arrays, "fuzzy_vocab").to_list(),
+            arrays["fuzzy_idf"],
+            sparse.csr_matrix((arrays["fuzzy_data"], arrays["fuzzy_indices"], arrays["fuzzy_indptr"]), shape=fuzzy_shape),
+        )
+
+        # Aho-Corasick automaton over the ESCO labels, for dictionary extraction
+        self.esco_dictionary: DictionaryAutomaton = get_automaton(arrays, "esco_dict")
+
+        # Market demand per skill keyword and its top roles (columnar, CSR roles)
+        self.market_index = MarketDemandIndex(
+            get_key_index(arrays, "demand_key"),
+            arrays["demand_total"],
+            arrays["role_offsets"],
+            arrays["role_title_ids"],
+            arrays["role_counts"],
+            get_strings(arrays, "role_title"),
+        )
+        print(f"✅ Market data ready ({len(self.market_index):,} skill keywords) in {time.time() - start_time:.2f} seconds.")
+
+    @property
+    def esco_count(self) -> int:
+        return len(self.esco_preferred)
 
     def get_market_demand(self, skill: str) -> Dict[str, Any]:
         """
         Gets pre-computed market demand for a skill (case-insensitive).
-        This is now a lightning-fast dictionary lookup.
         """
-        skill_lower = skill.lower()
-        total_demand = self.skill_demand.get(skill_lower, 0)
-        
-        if total_demand > 5000:
-            priority = 'Critical'
-        elif total_demand > 2000:
-            priority = 'High'
-        elif total_demand > 500:
-            priority = 'Medium'
-        else:
-            priority = 'Low'
+        return self.market_index.get_market_demand(skill)
+
+    def get_market_demand_batch(self, skills: List[str]) -> List[Dict[str, Any]]:
+        """
+        Market demand for a list of skills in one vectorized pass
+        (same dict shape as get_market_demand, in input order).
+        """
+        return self.market_index.get_market_demand_batch(skills)
+
+    def skill_demand(self, skills: List[str]) -> np.ndarray:
+        """Total market demand per skill as an int64 vector (0 for unknown skills)."""
+        return self.market_index.demand(skills)
+
+    def get_esco_ids(self, skills: List[str]) -> np.ndarray:
+        """Interned ESCO concept id (row of esco_preferred) per skill label, -1 when not in ESCO."""
+        label_rows = self.esco_label_index.lookup([skill.strip().lower() for skill in skills])
+        if not len(self._esco_label_record):
+            return label_rows
+        return np.where(label_rows >= 0, self._esco_label_record[np.maximum(label_rows, 0)], -1).astype(np.int64)
 
+    def _esco_result(self, label_row: int) -> Dict[str, Any]:
+        record_id = int(self._esco_label_record[label_row])
         return {
-            'skill': skill,
-            'total_demand': int(total_demand),
-            'top_roles': self.top_roles_for_skill.get(skill_lower, []),
-            'priority': priority
+            'normalized': self.esco_preferred[record_id],
+            'uri': self.esco_uris[record_id],
+            'skill_type': self.esco_types[record_id],
+            'matched_on': ESCO_LABEL_COLUMNS[int(self._esco_label_column[label_row])]
         }
 
     def get_esco_match(self, skill: str) -> Optional[Dict[str, Any]]:
         """
         Gets the standardized ESCO skill name (case-insensitive).
+        Matches preferred, alternative and hidden labels via the hash index.
         """
-        matches = self.esco_df[self.esco_df['preferredLabel_lower'] == skill.lower()]
-        if not matches.empty:
-            match_row = matches.iloc[0]
-            return {
-                'normalized': match_row['preferredLabel'],
-                'uri': match_row['conceptUri'],
-                'skill_type': match_row.get('skillType', 'unknown')
-            }
-        return None
+        return self.get_esco_matches([skill])[0]
+
+    def get_esco_matches(self, skills: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Batch version of get_esco_match, one result (or None) per skill."""
+        label_rows = self.esco_label_index.lookup([skill.strip().lower() for skill in skills])
+        return [self._esco_result(row) if row >= 0 else None for row in label_rows.tolist()]
+
+    def get_esco_fuzzy_matches(self, skills: List[str], cutoff: float) -> List[Optional[Dict[str, Any]]]:
+        """
+        Approximate ESCO matches for a batch of skills ("PowerBI", "Postgres"),
+        scored with one sparse matrix product over the trigram index.
+        Each hit carries the cosine similarity as 'score'.
+        """
+        results = []
+        for hit in self.fuzzy_matcher.match(skills, cutoff):
+            if hit is None:
+                results.append(None)
+                continue
+            label_row, score = hit
+            match = self._esco_result(label_row)
+            match['score'] = round(score, 4)
+            results.append(match)
+        return results
+
+    def get_esco_semantic_matches(self, skills: List[str], cutoff: float) -> List[Optional[Dict[str, Any]]]:
+        """
+        Embedding-based ESCO matches ("ML" -> "machine learning") for a batch
+        of skills, one top-k matrix multiply against the precomputed label
+        embeddings. Each hit carries the cosine similarity as 'score'. All
+        None when semantic matching is disabled or not built.
+        """
+        matcher = get_semantic_matcher(self)
+        if matcher is None or not skills:
+            return [None] * len(skills)
+        results = []
+        for hits in matcher.match(skills, cutoff):
+            if not hits:
+                results.append(None)
+                continue
+            label_row, score = hits[0]
+            match = self._esco_result(label_row)
+            match['score'] = round(score, 4)
+            results.append(match)
+        return results
+
+    def find_esco_skills(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Every ESCO label mentioned in `text`, found in one pass of the
+        dictionary automaton (word-bounded, longest match wins). Each hit has
+        the ESCO match fields plus 'label', 'start' and 'end' of the span.
+        """
+        results = []
+        for label_row, start, end in self.esco_dictionary.find(text):
+            match = self._esco_result(label_row)
+            match['label'] = self.esco_label_index.keys[label_row]
+            match['start'] = start
+            match['end'] = end
+            results.append(match)
+        return results
+
 
 # --- SINGLETON PATTERN ---
-# Define the paths
-USA_JOBS_PATH = os.path.join("data", "usa_job_posting_dataset.csv")
-ESCO_SKILLS_PATH = os.path.join("data", "skills_en.csv")
-
-# Create a single, shared instance of the DataLoader
-# This code runs ONE time when the server starts.
-print("Creating shared data_loader instance...")
-data_loader = DataLoader(usa_jobs_path=USA_JOBS_PATH, esco_skills_path=ESCO_SKILLS_PATH)
-print("✅ Shared data_loader instance is ready.")
+# Single, shared instance of the DataLoader, created on first use (normally
+# by the background warmup started from the app lifespan).
+_data_loader = None
+_data_loader_lock = threading.Lock()
+
+def get_data_loader() -> DataLoader:
+    global _data_loader
+    if _data_loader is None:
+        with _data_loader_lock:
+            if _data_loader is None:
+                print("Creating shared data_loader instance...")
+                _data_loader = DataLoader(usa_jobs_path=USA_JOBS_PATH, esco_skills_path=ESCO_SKILLS_PATH)
+                print("✅ Shared data_loader instance is ready.")
+    return _data_loader
@@ -0,0 +1,186 @@
+import re
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from core.columnar import KeyIndex, StringTable
+
+# Word tokens: alphanumerics plus the +/# suffixes of "c++"/"c#", and dotted
+# names such as "node.js" or "asp.net". Hyphens, slashes and spaces separate
+# tokens, so "problem-solving" and "problem solving" match the same label.
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9][a-z0-9+#]*)*", re.IGNORECASE)
+
+# Single-token labels shorter than this are too ambiguous to match on their
+# own ("r", "go", "it"), unless they carry a +/# ("c++", "c#")
+MIN_SINGLE_TOKEN_LENGTH = 3
+
+# Generic single words that exist as ESCO labels but are almost never a skill
+# mention in running text
+STOP_LABELS = frozenset({
+    'manage', 'perform', 'ensure', 'coordinate', 'creation', 'work', 'lead',
+    'support', 'plan', 'use', 'help', 'make', 'sell', 'write', 'read', 'teach',
+})
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Lowercased word tokens of `text` with their character offsets."""
+    return [(m.group(0).lower(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+
+
+def _is_matchable(tokens: List[str]) -> bool:
+    if not tokens:
+        return False
+    if len(tokens) == 1:
+        token = tokens[0]
+        if token in STOP_LABELS or token.isdigit():
+            return False
+        if len(token) < MIN_SINGLE_TOKEN_LENGTH and '+' not in token and '#' not in token:
+            return False
+    return True
+
+
+class DictionaryAutomaton:
+    """
+    Token-level Aho-Corasick automaton over a label dictionary.
+
+    Labels are tokenized the same way as the text, so matches always start and
+    end on word boundaries. The trie is stored as flat arrays (node 0 is the
+    root) that fit in the market snapshot:
+
+    - tokens: interned vocabulary (KeyIndex row = token id)
+    - edge_keys / edge_targets: goto function, sorted by node * V + token id
+    - fail: failure link of each node
+    - output: label row ending at the node, -1 if none
+    - output_link: next node on the failure chain that has an output, -1 if none
+    - depth: number of tokens from the root
+    """
+
+    def __init__(self, tokens: KeyIndex, edge_keys: np.ndarray, edge_targets: np.ndarray,
+                 fail: np.ndarray, output: np.ndarray, output_link: np.ndarray, depth: np.ndarray):
+        self.tokens = tokens
+        self.edge_keys = edge_keys
+        self.edge_targets = edge_targets
+        self.fail = fail
+        self.output = output
+        self.output_link = output_link
+        self.depth = depth
+        self.vocab_size = len(tokens)
+
+    @classmethod
+    def build(cls, labels: Sequence[str]) -> "DictionaryAutomaton":
+        """Compiles the automaton; the pattern id of a label is its index in `labels`."""
+        vocabulary: Dict[str, int] = {}
+        children: List[Dict[int, int]] = [{}]
+        output: List[int] = [-1]
+        depth: List[int] = [0]
+
+        for row, label in enumerate(labels):
+            label_tokens = [token for token, _, _ in tokenize(label)]
+            if not _is_matchable(label_tokens):
+                continue
+            node = 0
+            for token in label_tokens:
+                token_id = vocabulary.setdefault(token, len(vocabulary))
+                child = children[node].get(token_id)
+                if child is None:
+                    child = len(children)
+                    children[node][token_id] = child
+                    children.append({})
+                    output.append(-1)
+                    depth.append(depth[node] + 1)
+                node = child
+            if output[node] < 0:
+                output[node] = row
+
+        # Failure and dictionary-suffix links, breadth first
+        n_nodes = len(children)
+        fail = [0] * n_nodes
+        output_link = [-1] * n_nodes
+        queue = deque(children[0].values())
+        while queue:
+            node = queue.popleft()
+            for token_id, child in children[node].items():
+                f = fail[node]
+                while f and token_id not in children[f]:
+                    f = fail[f]
+                target = children[f].get(token_id, 0)
+                fail[child] = target if target != child else 0
+                output_link[child] = fail[child] if output[fail[child]] >= 0 else output_link[fail[child]]
+                queue.append(child)
+
+        vocab_size = max(1, len(vocabulary))
+        edges = sorted(
+            (node * vocab_size + token_id, child)
+            for node, node_children in enumerate(children)
+            for token_id, child in node_children.items()
+        )
+        tokens = KeyIndex.build(StringTable.from_strings(sorted(vocabulary, key=vocabulary.get)))
+        return cls(
+            tokens,
+            np.fromiter((k for k, _ in edges), dtype=np.int64, count=len(edges)),
+            np.fromiter((c for _, c in edges), dtype=np.int32, count=len(edges)),
+            np.asarray(fail, dtype=np.int32),
+            np.asarray(output, dtype=np.int32),
+            np.asarray(output_link, dtype=np.int32),
+            np.asarray(depth, dtype=np.int16),
+        )
+
+    def __len__(self) -> int:
+        return len(self.output)
+
+    def _goto(self, node: int, token_id: int) -> int:
+        key = node * self.vocab_size + token_id
+        slot = int(np.searchsorted(self.edge_keys, key))
+        if slot < len(self.edge_keys) and int(self.edge_keys[slot]) == key:
+            return int(self.edge_targets[slot])
+        return -1
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Every dictionary occurrence in one left-to-right pass over the tokens,
+        as (label row, start char, end char), overlaps included.
+        """
+        tokens = tokenize(text)
+        if not tokens or not len(self.edge_keys):
+            return []
+        token_ids = self.tokens.lookup([token for token, _, _ in tokens]).tolist()
+        fail, output, output_link, depth = self.fail, self.output, self.output_link, self.depth
+
+        matches = []
+        node = 0
+        for i, token_id in enumerate(token_ids):
+            if token_id < 0: # Token not in any label: nothing can span it
+                node = 0
+                continue
+            nxt = self._goto(node, token_id)
+            while nxt < 0 and node:
+                node = int(fail[node])
+                nxt = self._goto(node, token_id)
+            node = max(nxt, 0)
+
+            hit = node if output[node] >= 0 else int(output_link[node])
+            while hit >= 0:
+                first = i - int(depth[hit]) + 1
+                matches.append((int(output[hit]), tokens[first][1], tokens[i][2]))
+                hit = int(output_link[hit])
+        return matches
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Non-overlapping matches with longest-match resolution: longer spans
+        win, ties go to the leftmost. Result is in document order.
+        """
+        kept: List[Tuple[int, int, int]] = []
+        taken = bytearray(len(text))
+        for match in sorted(self.find_all(text), key=lambda m: (m[1] - m[2], m[1])):
+            _, start, end = match
+            if not any(taken[start:end]):
+                taken[start:end] = b"\x01" * (end - start)
+                kept.append(match)
+        kept.sort(key=lambda m: m[1])
+        return kept
+
+    def nbytes(self) -> int:
+        return self.tokens.nbytes() + sum(a.nbytes for a in (
+            self.edge_keys, self.edge_targets, self.fail, self.output, self.output_link, self.depth))
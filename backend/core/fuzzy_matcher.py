@@ -0,0 +1,117 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+_NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9+#]+')
+
+
+def fuzzy_key(label: str) -> str:
+    """
+    Canonical form used for n-gram matching: lowercase, punctuation and
+    spaces removed, so "PowerBI", "Power BI" and "power-bi" share n-grams.
+    """
+    return _NON_ALNUM_PATTERN.sub('', label.lower())
+
+
+def char_ngrams(key: str, n: int = 3) -> List[str]:
+    padded = f"^{key}$"
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+class CharNgramMatcher:
+    """
+    Approximate label matcher over a character n-gram TF-IDF space.
+
+    Labels are vectorized once into an L2-normalized sparse matrix; a batch of
+    queries is vectorized the same way and scored against every label with a
+    single sparse matrix product (cosine similarity). Each query keeps its
+    best label if the similarity reaches the cutoff.
+    """
+
+    def __init__(self, labels: Sequence[str], n: int = 3, min_query_length: int = 4):
+        self.n = n
+        self.min_query_length = min_query_length
+        self.vocabulary: Dict[str, int] = {}
+
+        rows, cols, counts = [], [], []
+        for row, label in enumerate(labels):
+            grams: Dict[int, int] = {}
+            for gram in char_ngrams(fuzzy_key(label), n):
+                col = self.vocabulary.setdefault(gram, len(self.vocabulary))
+                grams[col] = grams.get(col, 0) + 1
+            rows.extend([row] * len(grams))
+            cols.extend(grams.keys())
+            counts.extend(grams.values())
+
+        n_labels, n_grams = len(labels), max(1, len(self.vocabulary))
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(n_labels, n_grams),
+        )
+        document_frequency = np.bincount(tf.indices, minlength=n_grams)
+        self.idf = (np.log((1 + n_labels) / (1 + document_frequency)) + 1).astype(np.float32)
+        label_matrix = self._l2_normalize(tf.multiply(self.idf).tocsr())
+        # Stored transposed (n-grams x labels) so queries @ matrix is a CSR x CSR product
+        self.label_matrix_t = label_matrix.T.tocsr()
+
+    @classmethod
+    def from_arrays(cls, vocabulary: List[str], idf: np.ndarray, label_matrix_t: sparse.csr_matrix,
+                    n: int = 3, min_query_length: int = 4) -> "CharNgramMatcher":
+        """Rebuilds a matcher from previously computed arrays (no re-fitting)."""
+        matcher = cls.__new__(cls)
+        matcher.n = n
+        matcher.min_query_length = min_query_length
+        matcher.vocabulary = {gram: i for i, gram in enumerate(vocabulary)}
+        matcher.idf = idf
+        matcher.label_matrix_t = label_matrix_t
+        return matcher
+
+    @staticmethod
+    def _l2_normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+    def _vectorize(self, queries: Sequence[str]) -> sparse.csr_matrix:
+        rows, cols, counts = [], [], []
+        for row, query in enumerate(queries):
+            key = fuzzy_key(query)
+            if len(key) < self.min_query_length:
+                continue
+            grams: Dict[int, int] = {}
+            for gram in char_ngrams(key, self.n):
+                col = self.vocabulary.get(gram)
+                if col is not None:
+                    grams[col] = grams.get(col, 0) + 1
+            rows.extend([row] * len(grams))
+            cols.extend(grams.keys())
+            counts.extend(grams.values())
+
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+            shape=(len(queries), len(self.idf)),
+        )
+        return self._l2_normalize(tf.multiply(self.idf).tocsr())
+
+    def match(self, queries: Sequence[str], cutoff: float) -> List[Optional[Tuple[int, float]]]:
+        """
+        Returns, per query, (label row, cosine similarity) of the best label
+        when the similarity is >= cutoff, else None.
+        """
+        if not queries:
+            return []
+        similarities = self._vectorize(queries).dot(self.label_matrix_t).tocsr()
+        best_rows = np.asarray(similarities.argmax(axis=1)).ravel()
+        best_scores = similarities.max(axis=1).toarray().ravel()
+        return [
+            (int(row), float(score)) if score >= cutoff and score > 0 else None
+            for row, score in zip(best_rows, best_scores)
+        ]
+
+    def memory_bytes(self) -> int:
+        m = self.label_matrix_t
+        return m.data.nbytes + m.indices.nbytes + m.indptr.nbytes + self.idf.nbytes
@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from core.skill_extractor import extract_skills_from_texts
+
+# --- CONFIGURATION ---
+# Max documents coalesced into one GLiNER call, and how long the dispatcher
+# waits for more requests before running a partial batch.
+SKILL_INFERENCE_WORKERS = int(os.getenv("SKILL_INFERENCE_WORKERS", "1"))
+SKILL_INFERENCE_MAX_BATCH = int(os.getenv("SKILL_INFERENCE_MAX_BATCH", "8"))
+SKILL_INFERENCE_MAX_WAIT_MS = float(os.getenv("SKILL_INFERENCE_MAX_WAIT_MS", "10"))
+
+
+class MicroBatcher:
+    """
+    Runs a synchronous batch function (List[item] -> List[result]) on a
+    dedicated thread pool, off the event loop.
+
+    Concurrent `submit` calls are queued and coalesced into micro-batches of
+    at most `max_batch_size` items; a batch is dispatched as soon as it is full
+    or `max_wait_ms` after its first item arrived. While every worker is busy
+    the queue keeps filling, so batches grow under load.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], name: str,
+                 max_batch_size: int, max_wait_ms: float, workers: int):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{name}-worker")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        # Strong references: the loop only keeps weak ones, and a collected
+        # batch task would leave its callers' futures unresolved
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        # Metrics
+        self._batches_total = 0
+        self._items_total = 0
+        self._errors_total = 0
+        self._max_batch_seen = 0
+        self._inflight_batches = 0
+        self._batch_size_histogram: Dict[int, int] = {}
+        self._queue_wait_seconds = 0.0
+        self._inference_seconds = 0.0
+
+    def _ensure_started(self):
+        # The queue and dispatcher are bound to the running loop, so they are
+        # created on first use rather than at import time. A dispatcher
+        # restarted on the same loop keeps the queue (and what is waiting in it).
+        if self._dispatcher is not None and not self._dispatcher.done():
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._fail_queued(RuntimeError(f"{self.name} restarted on another event loop"))
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = loop.create_task(self._dispatch_loop(), name=f"{self.name}-dispatcher")
+
+    @staticmethod
+    def _fail(entries, error: Exception):
+        for _, future, _ in entries:
+            if not future.done():
+                try:
+                    future.set_exception(error)
+                except RuntimeError: # Its loop is already closed
+                    pass
+
+    def _fail_queued(self, error: Exception):
+        """Fails every request still waiting in the queue."""
+        if self._queue is None:
+            return
+        entries = []
+        while not self._queue.empty():
+            entries.append(self._queue.get_nowait())
+        self._fail(entries, error)
+
+    async def submit(self, items: List[Any]) -> List[Any]:
+        """Queues items for batched execution and awaits their results."""
+        if not items:
+            return []
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            self._queue.put_nowait((item, future, time.perf_counter()))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopped while collecting: the items already taken off the queue would be lost
+                self._slots.release()
+                self._fail(batch, RuntimeError(f"{self.name} was shut down"))
+                raise
+
+            # Drop requests whose caller went away (e.g. client disconnected)
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        dispatched_at = time.perf_counter()
+        self._inflight_batches += 1
+        try:
+            items = [item for item, _, _ in batch]
+            results = await loop.run_in_executor(self._executor, self.batch_fn, items)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            self._errors_total += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._inflight_batches -= 1
+            self._slots.release()
+            self._record_batch(batch, dispatched_at)
+
+    def _record_batch(self, batch, dispatched_at: float):
+        size = len(batch)
+        self._batches_total += 1
+        self._items_total += size
+        self._max_batch_seen = max(self._max_batch_seen, size)
+        self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+        self._queue_wait_seconds += sum(dispatched_at - enqueued_at for _, _, enqueued_at in batch)
+        self._inference_seconds += time.perf_counter() - dispatched_at
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and batching statistics, used to size workers."""
+        batches = self._batches_total or 1
+        items = self._items_total or 1
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "inflight_batches": self._inflight_batches,
+            "batches_total": self._batches_total,
+            "items_total": self._items_total,
+            "errors_total": self._errors_total,
+            "avg_batch_size": round(self._items_total / batches, 2),
+            "max_batch_size_seen": self._max_batch_seen,
+            "batch_size_histogram": dict(sorted(self._batch_size_histogram.items())),
+            "avg_queue_wait_ms": round(self._queue_wait_seconds / items * 1000, 2),
+            "avg_batch_inference_ms": round(self._inference_seconds / batches * 1000, 2),
+        }
+
+    async def shutdown(self):
+        """Stops dispatching, lets in-flight batches finish and fails what is still queued."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        self._fail_queued(RuntimeError(f"{self.name} was shut down"))
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- SINGLETON ---
+skill_inference_pool = MicroBatcher(
+    extract_skills_from_texts,
+    name="skill-inference",
+    max_batch_size=SKILL_INFERENCE_MAX_BATCH,
+    max_wait_ms=SKILL_INFERENCE_MAX_WAIT_MS,
+    workers=SKILL_INFERENCE_WORKERS,
+)
+
+
+async def extract_skills_async(texts: List[str]) -> List[List[Dict[str, Any]]]:
+    """Async, micro-batched equivalent of extract_skills_from_texts."""
+    return await skill_inference_pool.submit(texts)
@@ -0,0 +1,167 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+_TRAILING_COMMA_PATTERN = re.compile(r',\s*([\]\}])')
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass parser for one top-level JSON object that arrives in chunks
+    (streamed LLM output).
+
+    Text before the first '{' (e.g. a ```json fence) and after the closing
+    '}' is ignored. Each completed top-level member is decoded as soon as its
+    last character arrives; members holding an array are decoded element by
+    element, so feed() returns (key, element) for every finished element of
+    e.g. "cv_profile" while the rest of the array is still streaming, and
+    (key, value) for every finished non-array member.
+
+    `result` always holds everything decoded so far, so a truncated response
+    still yields its completed members and array elements (`complete` is
+    False). Trailing commas are tolerated since elements are decoded one at
+    a time.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.result: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._key: Optional[str] = None
+        self._expect_key = True
+        self._string_start = -1
+        self._value_start = -1 # Start of the member value / array element being read
+        self._scalar = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consumes a chunk; returns the members/array elements it completed."""
+        if self.complete or not chunk:
+            return []
+        self.buffer += chunk
+        events: List[Tuple[str, Any]] = []
+        buffer = self.buffer
+        i = self._pos
+
+        if not self._started:
+            i = buffer.find('{', i)
+            if i < 0:
+                self._pos = len(buffer)
+                return events
+            self._started = True
+            self._stack.append('{')
+            i += 1
+
+        n = len(buffer)
+        while i < n and not self.complete:
+            char = buffer[i]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1 and self._expect_key:
+                        self._key = json.loads(buffer[self._string_start:i + 1])
+                    elif self._is_tracked(depth) and self._value_start == self._string_start:
+                        self._emit(events, i + 1)
+                i += 1
+                continue
+
+            if self._scalar:
+                if char in _WHITESPACE or char in ',]}':
+                    self._scalar = False
+                    self._emit(events, i)
+                    continue # Re-read the terminator with the scalar closed
+                i += 1
+                continue
+
+            if char in _WHITESPACE:
+                i += 1
+                continue
+
+            if depth == 1 and self._expect_key:
+                if char == '"':
+                    self._in_string, self._string_start = True, i
+                elif char == ':':
+                    self._expect_key = False
+                elif char == '}':
+                    self._stack.pop()
+                    self.complete = True
+                i += 1
+                continue
+
+            if char == ',' and depth <= 2:
+                if depth == 1:
+                    self._expect_key = True
+                i += 1
+                continue
+
+            tracked = self._is_tracked(depth)
+            if tracked and self._value_start < 0 and char not in ']}':
+                if depth == 1 and char == '[':
+                    # Array member: decode element by element instead
+                    self.result.setdefault(self._key, [])
+                    self._stack.append('[')
+                    i += 1
+                    continue
+                self._value_start = i
+
+            if char == '"':
+                self._in_string, self._string_start = True, i
+            elif char in '{[':
+                self._stack.append(char)
+            elif char in '}]':
+                self._stack.pop()
+                if self._is_tracked(len(self._stack)) and self._value_start >= 0:
+                    self._emit(events, i + 1)
+                elif len(self._stack) == 1: # End of an array member
+                    self._expect_key = True
+                elif not self._stack:
+                    self.complete = True
+            elif tracked and self._value_start == i:
+                self._scalar = True # Number, true, false or null
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _is_tracked(self, depth: int) -> bool:
+        """Values read at this depth are top-level members or top-level array elements."""
+        return depth == 1 or (depth == 2 and self._stack[-1] == '[')
+
+    def _emit(self, events: List[Tuple[str, Any]], end: int):
+        raw = self.buffer[self._value_start:end]
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            # Only this one value is repaired (nested trailing commas), never the full text
+            try:
+                value = json.loads(_TRAILING_COMMA_PATTERN.sub(r'\1', raw))
+            except json.JSONDecodeError:
+                value = None
+        in_array = len(self._stack) == 2
+        self._value_start = -1
+        if value is None and in_array:
+            return # Skip an undecodable (or null) element, keep the rest
+        if in_array:
+            self.result[self._key].append(value)
+        else:
+            self.result[self._key] = value
+            self._expect_key = True
+        events.append((self._key, value))
+
+
+def parse_json_object(text: str) -> Tuple[Dict[str, Any], bool]:
+    """One-shot helper: (decoded members, whether the object was complete)."""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.result, parser.complete
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core.cache import TieredCache, make_cache_key
+
+# Gemini responses keyed by the fully rendered prompt + model + generation
+# config. Entries expire after LLM_CACHE_TTL_SECONDS; set LLM_CACHE_DB to an
+# empty string to keep the cache in memory only.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+LLM_CACHE_DISK_ITEMS = int(os.getenv("LLM_CACHE_DISK_ITEMS", "5000"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", os.path.join("data", "cache", "llm_cache.sqlite3"))
+
+# Bump to drop every cached response (e.g. after changing response post-processing)
+LLM_CACHE_VERSION = "2"
+
+
+class LLMResponseCache:
+    """
+    Cache in front of an async LLM call. Only successful, fully decoded
+    responses are stored, together with the latency of the original call
+    so hits can be reported as LLM time saved. Concurrent requests for the
+    same key share a single in-flight call.
+    """
+
+    def __init__(self, cache: TieredCache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+        self.cache.ensure_version(LLM_CACHE_VERSION)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.calls: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def key(prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]],
+            safety_settings: Any = None) -> str:
+        return make_cache_key(prompt, model_name, generation_config or {}, safety_settings or [])
+
+    def _call_stats(self, call_name: str) -> Dict[str, Any]:
+        return self.calls.setdefault(call_name, {
+            "hits": 0, "misses": 0, "shared_in_flight": 0, "llm_seconds": 0.0, "seconds_saved": 0.0,
+        })
+
+    async def get_or_generate(self, call_name: str, key: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached response for `key`, or awaits `generate()` and caches it (JSON-serializable)."""
+        stats = self._call_stats(call_name)
+        if not self.enabled:
+            return await generate()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            stats["hits"] += 1
+            stats["seconds_saved"] += cached["latency_seconds"]
+            return cached["value"]
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            stats["shared_in_flight"] += 1
+            value, latency = await asyncio.shield(pending)
+            stats["seconds_saved"] += latency
+            return value
+
+        stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            start = time.perf_counter()
+            value = await generate()
+            latency = time.perf_counter() - start
+            stats["llm_seconds"] += latency
+            self.cache.set(key, {"value": value, "latency_seconds": round(latency, 3)})
+            future.set_result((value, latency))
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved: waiters may not exist
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.cache.ttl_seconds,
+            "calls": {
+                name: {**values, "llm_seconds": round(values["llm_seconds"], 3),
+                       "seconds_saved": round(values["seconds_saved"], 3)}
+                for name, values in self.calls.items()
+            },
+            "cache": self.cache.stats(),
+        }
+
+
+llm_response_cache = LLMResponseCache(
+    TieredCache(
+        "llm_responses",
+        max_memory_items=LLM_CACHE_MEMORY_ITEMS if LLM_CACHE_ENABLED else 0,
+        db_path=(LLM_CACHE_DB or None) if LLM_CACHE_ENABLED else None,
+        max_disk_items=LLM_CACHE_DISK_ITEMS,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    ),
+    enabled=LLM_CACHE_ENABLED,
+)
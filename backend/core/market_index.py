@@ -0,0 +1,91 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from core.columnar import KeyIndex, StringTable
+
+# Demand strictly above each threshold moves a skill one bucket up:
+# <=500 Low, <=2000 Medium, <=5000 High, >5000 Critical
+PRIORITY_THRESHOLDS = np.array([500, 2000, 5000], dtype=np.int64)
+PRIORITY_LABELS = ('Low', 'Medium', 'High', 'Critical')
+
+
+class MarketDemandIndex:
+    """
+    Columnar market demand data.
+
+    - keywords: interned skill keywords (KeyIndex row = keyword id)
+    - totals[id]: total demand of the keyword
+    - role_offsets / role_title_ids / role_counts: CSR layout of the top roles,
+      roles of keyword id are role_offsets[id]:role_offsets[id+1]
+    - role_titles: interned job titles referenced by role_title_ids
+
+    All arrays can be memory-mapped from the market snapshot.
+    """
+
+    def __init__(self, keywords: KeyIndex, totals: np.ndarray, role_offsets: np.ndarray,
+                 role_title_ids: np.ndarray, role_counts: np.ndarray, role_titles: StringTable):
+        self.keywords = keywords
+        self.totals = totals
+        self.role_offsets = role_offsets
+        self.role_title_ids = role_title_ids
+        self.role_counts = role_counts
+        self.role_titles = role_titles
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def keyword_ids(self, skills: Sequence[str]) -> np.ndarray:
+        """Interned id of each (lowercased) skill, -1 when unknown."""
+        return self.keywords.lookup([skill.lower() for skill in skills])
+
+    def _totals_for(self, ids: np.ndarray) -> np.ndarray:
+        if not len(self.totals):
+            return np.zeros(len(ids), dtype=np.int64)
+        return np.where(ids >= 0, self.totals[np.maximum(ids, 0)], 0).astype(np.int64)
+
+    def demand(self, skills: Sequence[str]) -> np.ndarray:
+        """Total demand per skill as an int64 vector (0 for unknown skills)."""
+        return self._totals_for(self.keyword_ids(skills))
+
+    @staticmethod
+    def priorities(totals: np.ndarray) -> List[str]:
+        """Vectorized priority bucketing of demand totals."""
+        buckets = np.searchsorted(PRIORITY_THRESHOLDS, totals, side='left')
+        return [PRIORITY_LABELS[b] for b in buckets.tolist()]
+
+    def top_roles(self, keyword_id: int) -> List[Dict[str, Any]]:
+        if keyword_id < 0:
+            return []
+        start, end = int(self.role_offsets[keyword_id]), int(self.role_offsets[keyword_id + 1])
+        return [
+            {'Job Posting Title': self.role_titles[title_id], 'Count': count}
+            for title_id, count in zip(self.role_title_ids[start:end].tolist(), self.role_counts[start:end].tolist())
+        ]
+
+    def get_market_demand_batch(self, skills: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Market demand for many skills at once: one vectorized id lookup, one
+        gather of the totals and one bucketing pass.
+        """
+        if not skills:
+            return []
+        ids = self.keyword_ids(skills)
+        totals = self._totals_for(ids)
+        priorities = self.priorities(totals)
+        return [
+            {
+                'skill': skill,
+                'total_demand': total,
+                'top_roles': self.top_roles(keyword_id),
+                'priority': priority
+            }
+            for skill, keyword_id, total, priority in zip(skills, ids.tolist(), totals.tolist(), priorities)
+        ]
+
+    def get_market_demand(self, skill: str) -> Dict[str, Any]:
+        return self.get_market_demand_batch([skill])[0]
+
+    def nbytes(self) -> int:
+        return (self.keywords.nbytes() + self.totals.nbytes + self.role_offsets.nbytes
+                + self.role_title_ids.nbytes + self.role_counts.nbytes + self.role_titles.nbytes())
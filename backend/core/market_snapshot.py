@@ -0,0 +1,354 @@
+"""
+Prebuilt binary snapshot of the DataLoader market data.
+
+The snapshot is a directory of .npy arrays plus a manifest.json holding a
+SHA-256 per array and a fingerprint (size, mtime, SHA-256) of each source CSV.
+Arrays are opened with mmap_mode='r', so startup costs a few page faults and
+every worker process on the host shares the same page cache.
+
+Usage (from the backend/ directory):
+    python -m core.market_snapshot build [--force]
+    python -m core.market_snapshot verify
+    python -m core.market_snapshot info
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+from core.columnar import KeyIndex, StringTable
+from core.dictionary_matcher import DictionaryAutomaton
+from core.fuzzy_matcher import CharNgramMatcher
+
+# Source CSVs (relative to the backend/ working directory)
+USA_JOBS_PATH = os.path.join("data", "usa_job_posting_dataset.csv")
+ESCO_SKILLS_PATH = os.path.join("data", "skills_en.csv")
+
+SNAPSHOT_FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+MARKET_SNAPSHOT_DIR = os.getenv("MARKET_SNAPSHOT_DIR", os.path.join("data", "snapshot"))
+MARKET_SNAPSHOT_VERIFY = os.getenv("MARKET_SNAPSHOT_VERIFY", "false").lower() in ("1", "true", "yes")
+
+# ESCO label columns indexed for lookup, in priority order: a preferred label
+# always wins over an alternative/hidden label of another concept.
+ESCO_LABEL_COLUMNS = ('preferredLabel', 'altLabels', 'hiddenLabels')
+TOP_ROLES_PER_SKILL = 5
+
+Arrays = Dict[str, np.ndarray]
+
+
+# --- ARRAY PACKING HELPERS ---
+
+def put_strings(arrays: Arrays, prefix: str, table: StringTable):
+    arrays[f"{prefix}_blob"] = table.blob
+    arrays[f"{prefix}_offsets"] = table.offsets
+
+
+def get_strings(arrays: Arrays, prefix: str) -> StringTable:
+    return StringTable(arrays[f"{prefix}_blob"], arrays[f"{prefix}_offsets"])
+
+
+def put_key_index(arrays: Arrays, prefix: str, index: KeyIndex):
+    put_strings(arrays, prefix, index.keys)
+    arrays[f"{prefix}_hashes"] = index.hashes
+    arrays[f"{prefix}_positions"] = index.positions
+
+
+def get_key_index(arrays: Arrays, prefix: str) -> KeyIndex:
+    return KeyIndex(get_strings(arrays, prefix), arrays[f"{prefix}_hashes"], arrays[f"{prefix}_positions"])
+
+
+_AUTOMATON_ARRAYS = ('edge_keys', 'edge_targets', 'fail', 'output', 'output_link', 'depth')
+
+
+def put_automaton(arrays: Arrays, prefix: str, automaton: DictionaryAutomaton):
+    put_key_index(arrays, f"{prefix}_token", automaton.tokens)
+    for name in _AUTOMATON_ARRAYS:
+        arrays[f"{prefix}_{name}"] = getattr(automaton, name)
+
+
+def get_automaton(arrays: Arrays, prefix: str) -> DictionaryAutomaton:
+    return DictionaryAutomaton(
+        get_key_index(arrays, f"{prefix}_token"), *(arrays[f"{prefix}_{name}"] for name in _AUTOMATON_ARRAYS)
+    )
+
+
+# --- BUILD FROM SOURCE CSVs ---
+
+def _build_esco_arrays(esco_skills_path: str, arrays: Arrays):
+    """
+    ESCO concepts (preferredLabel, conceptUri, skillType) plus an index of
+    every lowercased label -> (concept, label column). altLabels/hiddenLabels
+    hold several newline-separated labels per concept.
+    """
+    esco_df = pd.read_csv(esco_skills_path)
+    skill_types = esco_df['skillType'].fillna('unknown') if 'skillType' in esco_df else ['unknown'] * len(esco_df)
+    put_strings(arrays, "esco_preferred", StringTable.from_strings(esco_df['preferredLabel'].astype(str)))
+    put_strings(arrays, "esco_uri", StringTable.from_strings(esco_df['conceptUri'].astype(str)))
+    put_strings(arrays, "esco_type", StringTable.from_strings(str(t) for t in skill_types))
+
+    label_rows: Dict[str, Tuple[int, int]] = {}
+    for column_id, column in enumerate(ESCO_LABEL_COLUMNS):
+        if column not in esco_df:
+            continue
+        for record_id, labels in enumerate(esco_df[column]):
+            if not isinstance(labels, str):
+                continue
+            for label in labels.split('\n'):
+                key = label.strip().lower()
+                if key and key not in label_rows:
+                    label_rows[key] = (record_id, column_id)
+
+    label_keys = list(label_rows.keys())
+    put_key_index(arrays, "esco_label", KeyIndex.build(StringTable.from_strings(label_keys)))
+    arrays["esco_label_record"] = np.fromiter((r for r, _ in label_rows.values()), dtype=np.int32, count=len(label_rows))
+    arrays["esco_label_column"] = np.fromiter((c for _, c in label_rows.values()), dtype=np.int8, count=len(label_rows))
+
+    # Character-trigram TF-IDF over the same labels, for approximate matches
+    matcher = CharNgramMatcher(label_keys)
+    vocabulary = sorted(matcher.vocabulary, key=matcher.vocabulary.get)
+    put_strings(arrays, "fuzzy_vocab", StringTable.from_strings(vocabulary))
+    arrays["fuzzy_idf"] = matcher.idf
+    arrays["fuzzy_indptr"] = matcher.label_matrix_t.indptr
+    arrays["fuzzy_indices"] = matcher.label_matrix_t.indices
+    arrays["fuzzy_data"] = matcher.label_matrix_t.data
+    arrays["fuzzy_shape"] = np.asarray(matcher.label_matrix_t.shape, dtype=np.int64)
+
+    # Token-level Aho-Corasick automaton over the same labels (pattern id =
+    # label row), for dictionary skill extraction in one pass over a text
+    put_automaton(arrays, "esco_dict", DictionaryAutomaton.build(label_keys))
+
+
+def _build_demand_arrays(usa_jobs_path: str, arrays: Arrays):
+    """
+    Total demand per lowercased skill keyword and its top job titles, stored
+    CSR-style: roles of keyword i are role_offsets[i]:role_offsets[i+1].
+    """
+    usa_jobs_df = pd.read_csv(usa_jobs_path, usecols=['Job Posting Title', 'Skill Keyword', 'Count'])
+    usa_jobs_df['Skill_Keyword_lower'] = usa_jobs_df['Skill Keyword'].str.lower()
+    usa_jobs_df = usa_jobs_df.dropna(subset=['Skill_Keyword_lower'])
+
+    totals = usa_jobs_df.groupby('Skill_Keyword_lower', sort=True)['Count'].sum()
+    keywords = totals.index.tolist()
+
+    # Same result as groupby().apply(nlargest(5)) without the Python-level apply
+    ranked = usa_jobs_df.sort_values(['Skill_Keyword_lower', 'Count'], ascending=[True, False], kind='mergesort')
+    top = ranked.groupby('Skill_Keyword_lower', sort=True).head(TOP_ROLES_PER_SKILL)
+    titles, title_ids = np.unique(top['Job Posting Title'].astype(str).to_numpy(), return_inverse=True)
+    roles_per_keyword = top.groupby('Skill_Keyword_lower', sort=True).size().reindex(keywords, fill_value=0)
+
+    put_key_index(arrays, "demand_key", KeyIndex.build(StringTable.from_strings(keywords)))
+    arrays["demand_total"] = totals.to_numpy(dtype=np.int64)
+    arrays["role_offsets"] = np.concatenate([[0], np.cumsum(roles_per_keyword.to_numpy())]).astype(np.int64)
+    arrays["role_title_ids"] = title_ids.astype(np.int32)
+    arrays["role_counts"] = top['Count'].to_numpy(dtype=np.int64)
+    put_strings(arrays, "role_title", StringTable.from_strings(titles.tolist()))
+
+
+def build_arrays(usa_jobs_path: str, esco_skills_path: str) -> Arrays:
+    arrays: Arrays = {}
+    _build_esco_arrays(esco_skills_path, arrays)
+    _build_demand_arrays(usa_jobs_path, arrays)
+    return arrays
+
+
+# --- SNAPSHOT FILES ---
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _sha256_file(path),
+    }
+
+
+def write_snapshot(arrays: Arrays, sources: Dict[str, Dict[str, Any]], snapshot_dir: str) -> Dict[str, Any]:
+    """Writes arrays + manifest into a temp dir, then swaps it in atomically."""
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = {}
+    for name, array in arrays.items():
+        path = os.path.join(tmp_dir, f"{name}.npy")
+        np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+        files[name] = {"sha256": _sha256_file(path), "dtype": str(array.dtype), "shape": list(array.shape)}
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sources": sources,
+        "arrays": files,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Processes that already mapped the old files keep their (unlinked) pages
+    old_dir = f"{snapshot_dir}.old-{os.getpid()}"
+    if os.path.isdir(snapshot_dir):
+        os.replace(snapshot_dir, old_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_snapshot(snapshot_dir: str, manifest: Dict[str, Any]) -> Arrays:
+    """Maps every array read-only."""
+    return {
+        name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+        for name in manifest["arrays"]
+    }
+
+
+def verify_snapshot(snapshot_dir: str) -> List[str]:
+    """Re-hashes every array file against the manifest. Returns the problems found."""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return [f"No readable manifest in {snapshot_dir}"]
+    problems = []
+    for name, meta in manifest["arrays"].items():
+        path = os.path.join(snapshot_dir, f"{name}.npy")
+        if not os.path.isfile(path):
+            problems.append(f"{name}: missing")
+        elif _sha256_file(path) != meta["sha256"]:
+            problems.append(f"{name}: checksum mismatch")
+    return problems
+
+
+def is_fresh(manifest: Optional[Dict[str, Any]], sources: Dict[str, str]) -> bool:
+    """
+    True when the snapshot was built from the current source files. Size and
+    mtime are compared first; content hashes only when those differ. A source
+    that is absent (e.g. CSVs not shipped to the host) does not stale it.
+    """
+    if manifest is None or manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return False
+    for name, path in sources.items():
+        if not os.path.exists(path):
+            continue
+        recorded = manifest.get("sources", {}).get(name)
+        if recorded is None:
+            return False
+        stat = os.stat(path)
+        if recorded["size"] == stat.st_size and recorded["mtime_ns"] == stat.st_mtime_ns:
+            continue
+        if recorded["sha256"] != _sha256_file(path):
+            return False
+    return True
+
+
+def load_or_build(usa_jobs_path: str, esco_skills_path: str,
+                  snapshot_dir: str = MARKET_SNAPSHOT_DIR, force: bool = False) -> Tuple[Arrays, Dict[str, Any]]:
+    """
+    Maps the snapshot if it is fresh, otherwise rebuilds it from the CSVs.
+    A file lock makes concurrent workers wait for a single build.
+    """
+    sources = {"usa_jobs": usa_jobs_path, "esco_skills": esco_skills_path}
+
+    manifest = read_manifest(snapshot_dir)
+    if not force and is_fresh(manifest, sources):
+        return _open(snapshot_dir, manifest)
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(snapshot_dir)), exist_ok=True)
+        lock = FileLock(f"{snapshot_dir}.lock")
+    except OSError as e:
+        print(f"⚠️  Market snapshot directory not writable ({e}), building in memory")
+        return _build_in_memory(sources)
+
+    with lock:
+        manifest = read_manifest(snapshot_dir)
+        if not force and is_fresh(manifest, sources):
+            # Another worker built it while we were waiting
+            return _open(snapshot_dir, manifest)
+
+        print(f"Building market data snapshot in {snapshot_dir}...")
+        start_time = time.time()
+        arrays = build_arrays(usa_jobs_path, esco_skills_path)
+        fingerprints = {name: _source_fingerprint(path) for name, path in sources.items()}
+        try:
+            manifest = write_snapshot(arrays, fingerprints, snapshot_dir)
+        except OSError as e:
+            print(f"⚠️  Could not write market snapshot ({e}), using in-memory arrays")
+            return arrays, {"format_version": SNAPSHOT_FORMAT_VERSION, "sources": fingerprints, "arrays": {}}
+        print(f"✅ Market snapshot built in {time.time() - start_time:.2f} seconds.")
+        return _open(snapshot_dir, manifest)
+
+
+def _open(snapshot_dir: str, manifest: Dict[str, Any]) -> Tuple[Arrays, Dict[str, Any]]:
+    if MARKET_SNAPSHOT_VERIFY:
+        problems = verify_snapshot(snapshot_dir)
+        if problems:
+            raise RuntimeError(f"Market snapshot failed verification: {problems}")
+    return read_snapshot(snapshot_dir, manifest), manifest
+
+
+def _build_in_memory(sources: Dict[str, str]) -> Tuple[Arrays, Dict[str, Any]]:
+    arrays = build_arrays(sources["usa_jobs"], sources["esco_skills"])
+    fingerprints = {name: _source_fingerprint(path) for name, path in sources.items()}
+    return arrays, {"format_version": SNAPSHOT_FORMAT_VERSION, "sources": fingerprints, "arrays": {}}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Market data snapshot management")
+    parser.add_argument("command", choices=["build", "verify", "info"])
+    parser.add_argument("--snapshot-dir", default=MARKET_SNAPSHOT_DIR)
+    parser.add_argument("--usa-jobs", default=USA_JOBS_PATH)
+    parser.add_argument("--esco-skills", default=ESCO_SKILLS_PATH)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is fresh")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        _, manifest = load_or_build(args.usa_jobs, args.esco_skills, args.snapshot_dir, force=args.force)
+        total = sum(os.path.getsize(os.path.join(args.snapshot_dir, f"{n}.npy")) for n in manifest["arrays"])
+        print(f"✅ Snapshot ready: {len(manifest['arrays'])} arrays, {total / 1e6:.1f} MB")
+        return 0
+
+    if args.command == "verify":
+        problems = verify_snapshot(args.snapshot_dir)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print("✅ All snapshot arrays match their checksums")
+        return 1 if problems else 0
+
+    manifest = read_manifest(args.snapshot_dir)
+    if manifest is None:
+        print(f"No snapshot found in {args.snapshot_dir}")
+        return 1
+    fresh = is_fresh(manifest, {"usa_jobs": args.usa_jobs, "esco_skills": args.esco_skills})
+    print(json.dumps({"fresh": fresh, "built_at": manifest["built_at"], "sources": manifest["sources"]}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
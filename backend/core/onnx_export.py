@@ -0,0 +1,278 @@
+"""
+One-time ONNX export / int8 quantization of the GLiNER skill extractor,
+plus a parity check of every engine against the torch reference.
+
+Usage (from the backend/ directory):
+    python -m core.onnx_export export [--model urchade/gliner_base] [--no-quantize]
+    python -m core.onnx_export parity [--min-jaccard 0.9] [--max-score-delta 0.05]
+
+The exported artifact lives in MODEL_ARTIFACTS_DIR (default data/models/) and
+is picked up at runtime with SKILL_EXTRACTOR_ENGINE=onnx or onnx-int8.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from core.skill_extractor import (
+    DEFAULT_MODEL_NAME,
+    ENGINE_ONNX,
+    ENGINE_ONNX_INT8,
+    ENGINE_TORCH,
+    ONNX_MANIFEST_FILE,
+    ONNX_MODEL_FILES,
+    GLiNERSkillExtractor,
+    onnx_artifact_dir,
+)
+
+PARITY_CORPUS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "skill_parity_corpus.json")
+MANIFEST_FILE = ONNX_MANIFEST_FILE
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_onnx(model_name: str = DEFAULT_MODEL_NAME, output_dir: str = None, quantize: bool = True) -> str:
+    """
+    Exports the GLiNER span model to ONNX (and optionally a dynamic-int8 copy).
+    Config and tokenizer are saved alongside so the artifact loads offline.
+    """
+    import torch
+    import gliner
+    from gliner import GLiNER
+
+    output_dir = output_dir or onnx_artifact_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Loading torch model {model_name}...")
+    model = GLiNER.from_pretrained(model_name)
+    model.eval()
+    model.save_pretrained(output_dir)
+    model.data_processor.transformer_tokenizer.save_pretrained(output_dir)
+
+    # Sample inputs only fix the graph signature; all axes are dynamic
+    text = "Experienced with Python, SQL and financial modeling in Excel."
+    labels = ["skill", "tool"]
+    inputs, _ = model.prepare_model_inputs([text], labels)
+
+    if model.config.span_mode == "token_level":
+        input_names = ["input_ids", "attention_mask", "words_mask", "text_lengths"]
+        dynamic_axes = {
+            "input_ids": {0: "batch_size", 1: "sequence_length"},
+            "attention_mask": {0: "batch_size", 1: "sequence_length"},
+            "words_mask": {0: "batch_size", 1: "sequence_length"},
+            "text_lengths": {0: "batch_size", 1: "value"},
+            "logits": {0: "position", 1: "batch_size", 2: "sequence_length", 3: "num_classes"},
+        }
+    else:
+        input_names = ["input_ids", "attention_mask", "words_mask", "text_lengths", "span_idx", "span_mask"]
+        dynamic_axes = {
+            "input_ids": {0: "batch_size", 1: "sequence_length"},
+            "attention_mask": {0: "batch_size", 1: "sequence_length"},
+            "words_mask": {0: "batch_size", 1: "sequence_length"},
+            "text_lengths": {0: "batch_size", 1: "value"},
+            "span_idx": {0: "batch_size", 1: "num_spans", 2: "idx"},
+            "span_mask": {0: "batch_size", 1: "num_spans"},
+            "logits": {0: "batch_size", 1: "sequence_length", 2: "num_spans", 3: "num_classes"},
+        }
+    all_inputs = tuple(inputs[name] for name in input_names)
+
+    onnx_path = os.path.join(output_dir, ONNX_MODEL_FILES[ENGINE_ONNX])
+    print(f"Exporting ONNX graph to {onnx_path}...")
+    start = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(
+            model.model,
+            all_inputs,
+            f=onnx_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            # TorchScript exporter: the dynamo one (torch >= 2.9 default) needs
+            # onnxscript and treats dynamic_axes differently
+            dynamo=False,
+        )
+    print(f"✅ ONNX export finished in {time.perf_counter() - start:.1f}s")
+
+    files = [ONNX_MODEL_FILES[ENGINE_ONNX]]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, ONNX_MODEL_FILES[ENGINE_ONNX_INT8])
+        print(f"Quantizing (dynamic int8) to {quantized_path}...")
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QUInt8)
+        files.append(ONNX_MODEL_FILES[ENGINE_ONNX_INT8])
+        print("✅ Quantization finished")
+
+    manifest = {
+        "model_name": model_name,
+        "gliner_version": getattr(gliner, "__version__", "unknown"),
+        "torch_version": torch.__version__,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": {
+            name: {
+                "sha256": _sha256_file(os.path.join(output_dir, name)),
+                "size_bytes": os.path.getsize(os.path.join(output_dir, name)),
+            }
+            for name in files
+        },
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return output_dir
+
+
+def _load_corpus(path: str) -> List[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return float("nan")
+
+
+def check_parity(model_name: str = DEFAULT_MODEL_NAME,
+                 engines: List[str] = (ENGINE_ONNX, ENGINE_ONNX_INT8),
+                 corpus_path: str = PARITY_CORPUS_PATH,
+                 min_jaccard: float = 0.9,
+                 max_score_delta: float = 0.05) -> Dict[str, Any]:
+    """
+    Runs the fixture corpus through the torch reference and each ONNX engine.
+    An engine passes when, on every document, the Jaccard overlap of extracted
+    skills is >= min_jaccard and the mean score delta on shared skills is
+    <= max_score_delta.
+    """
+    corpus = _load_corpus(corpus_path)
+    texts = [doc["text"] for doc in corpus]
+
+    def run(engine: str):
+        rss_before = _rss_mb()
+        # An earlier failed parity check must not keep the engine from being re-checked
+        extractor = GLiNERSkillExtractor(model_name=model_name, engine=engine, require_parity=False)
+        if extractor.engine != engine:
+            return None
+        start = time.perf_counter()
+        results = extractor.extract_batch(texts)
+        elapsed = time.perf_counter() - start
+        return {
+            "results": [{s["word"].lower(): s["score"] for s in doc} for doc in results],
+            "latency_ms_per_doc": round(elapsed / len(texts) * 1000, 2),
+            "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+        }
+
+    reference = run(ENGINE_TORCH)
+    report = {
+        "model_name": model_name,
+        "documents": len(texts),
+        "torch": {k: v for k, v in reference.items() if k != "results"},
+        "engines": {},
+    }
+
+    for engine in engines:
+        candidate = run(engine)
+        if candidate is None:
+            report["engines"][engine] = {"status": "missing_artifact", "passed": False}
+            continue
+
+        per_doc = []
+        for doc, ref, got in zip(corpus, reference["results"], candidate["results"]):
+            union = set(ref) | set(got)
+            shared = set(ref) & set(got)
+            jaccard = len(shared) / len(union) if union else 1.0
+            score_delta = (sum(abs(ref[s] - got[s]) for s in shared) / len(shared)) if shared else 0.0
+            per_doc.append({
+                "id": doc["id"],
+                "jaccard": round(jaccard, 3),
+                "mean_score_delta": round(score_delta, 4),
+                "only_torch": sorted(set(ref) - set(got)),
+                "only_engine": sorted(set(got) - set(ref)),
+            })
+
+        passed = all(d["jaccard"] >= min_jaccard and d["mean_score_delta"] <= max_score_delta for d in per_doc)
+        report["engines"][engine] = {
+            "status": "ok",
+            "passed": passed,
+            "latency_ms_per_doc": candidate["latency_ms_per_doc"],
+            "rss_delta_mb": candidate["rss_delta_mb"],
+            "documents": per_doc,
+        }
+
+    return report
+
+
+def record_parity(report: Dict[str, Any], output_dir: str = None) -> None:
+    """
+    Stores each engine's parity verdict in the export manifest, tied to the
+    sha256 of the file checked; the runtime refuses engines that failed.
+    """
+    output_dir = output_dir or onnx_artifact_dir(report["model_name"])
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return # Nothing exported
+    checked_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for engine, result in report["engines"].items():
+        file_entry = manifest.get("files", {}).get(ONNX_MODEL_FILES[engine])
+        if result["status"] != "ok" or file_entry is None:
+            continue
+        manifest.setdefault("parity", {})[engine] = {
+            "passed": result["passed"],
+            "sha256": file_entry["sha256"],
+            "checked_at": checked_at,
+        }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="GLiNER ONNX export and parity check")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Export (and quantize) the model to ONNX")
+    export_cmd.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    export_cmd.add_argument("--output-dir", default=None)
+    export_cmd.add_argument("--no-quantize", action="store_true")
+
+    parity_cmd = sub.add_parser("parity", help="Compare ONNX engines against torch on the fixture corpus")
+    parity_cmd.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parity_cmd.add_argument("--corpus", default=PARITY_CORPUS_PATH)
+    parity_cmd.add_argument("--min-jaccard", type=float, default=0.9)
+    parity_cmd.add_argument("--max-score-delta", type=float, default=0.05)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        output_dir = export_onnx(args.model, args.output_dir, quantize=not args.no_quantize)
+        print(f"✅ ONNX artifact ready in {output_dir}")
+        return 0
+
+    report = check_parity(
+        args.model,
+        corpus_path=args.corpus,
+        min_jaccard=args.min_jaccard,
+        max_score_delta=args.max_score_delta,
+    )
+    print(json.dumps(report, indent=2))
+    record_parity(report)
+    return 0 if all(e["passed"] for e in report["engines"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Redact PII from CV / job text before it is sent to the LLM
+PII_REDACTION_ENABLED = os.getenv("PII_REDACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Pre-flight patterns, tried left to right at each position. Precise enough to
+# leave skills, dates and figures alone; the LLM still needs the CV content.
+_PREFLIGHT_PATTERNS = [
+    ("EMAIL", r"[A-Za-z0-9_.+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+"),
+    ("URL", r"(?:https?://|www\.)[^\s<>\"')\]]+|\b(?:linkedin|github)\.com/[^\s<>\"')\]]+"),
+    ("SSN", r"\b\d{3}-\d{2}-\d{4}\b"),
+    ("NUMBER", r"\b\d{16,}\b"),
+    # Candidate only: kept when it holds 9-15 digits and isn't a run of years
+    ("PHONE", r"(?<![\w@])\+?\(?\d[\d \t().-]{6,18}\d(?!\w)"),
+    ("ADDRESS", r"\b\d{1,5}\s+(?:[A-Z][\w.'-]*\s+){0,4}"
+                r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way|Place|Pl)\b\.?"
+                r"(?:,?\s*(?:Apt|Suite|Unit|#)\s*[\w-]+)?"),
+    ("ZIP", r"\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"),
+]
+
+# Extra patterns for the aggressive pass used after a safety block: whole
+# address-looking lines, any ZIP-like number, and runs of blank lines.
+_AGGRESSIVE_PATTERNS = [
+    ("ADDRESS", r"(?im:^[^\n]*\b(?:street|st\.|avenue|ave|road|rd\.|boulevard|blvd|apt|suite|unit)\b[^\n]*$)"),
+] + _PREFLIGHT_PATTERNS + [
+    ("ZIP", r"\b\d{5}(?:-\d{4})?\b"),
+    ("BLANK", r"\n{3,}"),
+]
+
+
+def _compile(patterns) -> "re.Pattern":
+    # One capturing group per kind; inner groups are non-capturing so match.lastindex names the kind
+    return re.compile("|".join(f"({pattern})" for _, pattern in patterns))
+
+
+PREFLIGHT_PATTERN = _compile(_PREFLIGHT_PATTERNS)
+AGGRESSIVE_PATTERN = _compile(_AGGRESSIVE_PATTERNS)
+_KINDS = {
+    PREFLIGHT_PATTERN.pattern: [kind for kind, _ in _PREFLIGHT_PATTERNS],
+    AGGRESSIVE_PATTERN.pattern: [kind for kind, _ in _AGGRESSIVE_PATTERNS],
+}
+TOKEN_PATTERN = re.compile(r"\[(?:EMAIL|URL|SSN|NUMBER|PHONE|ADDRESS|ZIP)_\d+\]")
+_YEAR_PATTERN = re.compile(r"(?:19|20)\d\d")
+# Month + year in either order ("01.2019", "03/2021", "2019.01"): employment dates, never phones
+_MONTH_YEAR_PATTERN = re.compile(r"(?<!\d)(?:(?:0?[1-9]|1[0-2])[./](?:19|20)\d\d|(?:19|20)\d\d[./](?:0?[1-9]|1[0-2]))(?!\d)")
+# Thousands grouping ("1 200 000 000", "12.500.000")
+_THOUSANDS_PATTERN = re.compile(r"\d{1,3}(?:[ .]\d{3})+")
+
+
+def _is_phone(candidate: str) -> bool:
+    """
+    Whether a PHONE candidate has the shape of a phone number: 9-15 digits,
+    and either a leading "+" / "(", a national number starting with 0, or
+    digit groups of the sizes phone numbers are written in. Date ranges,
+    runs of years and thousands-grouped figures are rejected.
+    """
+    digits = re.sub(r"\D", "", candidate)
+    if not 9 <= len(digits) <= 15:
+        return False
+    groups = re.findall(r"\d+", candidate)
+    if all(_YEAR_PATTERN.fullmatch(g) for g in groups): # "2015 - 2019 2020"
+        return False
+    if _MONTH_YEAR_PATTERN.search(candidate): # "01.2019 - 03.2021"
+        return False
+    candidate = candidate.strip()
+    if candidate.startswith(("+", "(")):
+        return True
+    if len(groups) == 1: # Ungrouped: only national numbers like 0612345678
+        return groups[0].startswith("0") and len(groups[0]) in (10, 11)
+    if _THOUSANDS_PATTERN.fullmatch(candidate) and (len(groups[0]) < 3 or groups[-1] == "000"):
+        return False # "1 200 000 000" (while "612 345 678" stays a phone)
+    return (len(groups[0]) <= 4 and 2 <= len(groups[-1]) <= 8
+            and all(2 <= len(g) <= 4 for g in groups[1:-1]))
+
+
+@dataclass
+class RedactionSpan:
+    kind: str
+    token: str
+    original_start: int
+    original_end: int
+    redacted_start: int
+    redacted_end: int
+
+
+@dataclass
+class RedactedText:
+    text: str
+    spans: List[RedactionSpan] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.spans)
+
+    def to_original_offset(self, position: int) -> int:
+        """Maps an offset in the redacted text back to the original text."""
+        shift = 0
+        for span in self.spans:
+            if position < span.redacted_start:
+                break
+            if position < span.redacted_end:
+                return span.original_start
+            shift = span.original_end - span.redacted_end
+        return position + shift
+
+
+class RedactionSession:
+    """
+    Redacts the texts of one analysis request in a single regex pass each.
+    The same value always gets the same numbered token ([EMAIL_1], [PHONE_2]),
+    across the CV, the job description and the evidence snippets, so LLM output
+    that quotes a token can be re-hydrated locally with `rehydrate`.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+        self.originals: Dict[str, str] = {}
+        self.counts: Counter = Counter()
+
+    def _token(self, kind: str, original: str) -> str:
+        token = self._tokens.get(original)
+        if token is None:
+            token = f"[{kind}_{len(self._tokens) + 1}]"
+            self._tokens[original] = token
+            self.originals[token] = original
+        self.counts[kind] += 1
+        return token
+
+    def redact(self, text: str, aggressive: bool = False) -> RedactedText:
+        """
+        Replaces PII with session tokens. Dates and figures are left alone:
+
+        >>> RedactionSession().redact("Call +33 6 12 34 56 78 or 555-123-4567").text
+        'Call [PHONE_1] or [PHONE_2]'
+        >>> RedactionSession().redact("Worked 01.2019 - 03.2021 at ACME").text
+        'Worked 01.2019 - 03.2021 at ACME'
+        >>> RedactionSession().redact("Worked 01/2019 - 03/2021 at ACME").text
+        'Worked 01/2019 - 03/2021 at ACME'
+        >>> RedactionSession().redact("Revenue 1 200 000 000 USD").text
+        'Revenue 1 200 000 000 USD'
+        >>> RedactionSession().redact("Grew ARR to 12.500.000 EUR, 2015 - 2019 2020").text
+        'Grew ARR to 12.500.000 EUR, 2015 - 2019 2020'
+        """
+        if not text:
+            return RedactedText(text or "")
+        pattern = AGGRESSIVE_PATTERN if aggressive else PREFLIGHT_PATTERN
+        kinds = _KINDS[pattern.pattern]
+        parts: List[str] = []
+        spans: List[RedactionSpan] = []
+        last = 0
+        length = 0
+        for match in pattern.finditer(text):
+            kind = kinds[match.lastindex - 1]
+            original = match.group(0)
+            if kind == "PHONE" and not _is_phone(original):
+                continue
+            replacement = "\n\n" if kind == "BLANK" else self._token(kind, original)
+            parts.append(text[last:match.start()])
+            length += match.start() - last
+            if kind != "BLANK":
+                spans.append(RedactionSpan(kind, replacement, match.start(), match.end(), length, length + len(replacement)))
+            parts.append(replacement)
+            length += len(replacement)
+            last = match.end()
+        parts.append(text[last:])
+        return RedactedText("".join(parts), spans)
+
+    def rehydrate(self, text: str) -> str:
+        """Puts the original values back in place of any known token."""
+        if not self.originals or not text:
+            return text
+        for _ in range(2): # An aggressive-pass token may wrap an earlier one
+            restored = TOKEN_PATTERN.sub(lambda m: self.originals.get(m.group(0), m.group(0)), text)
+            if restored == text:
+                break
+            text = restored
+        return text
+
+    def rehydrate_value(self, value: Any) -> Any:
+        """rehydrate() applied to every string in a JSON-like value."""
+        if isinstance(value, str):
+            return self.rehydrate(value)
+        if isinstance(value, list):
+            return [self.rehydrate_value(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.rehydrate_value(v) for k, v in value.items()}
+        return value
+
+
+class RedactionMetrics:
+    """Process-wide counters exposed on /api/metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.documents_changed = 0
+        self.aggressive_passes = 0
+        self.safety_retries = 0
+        self.spans_by_kind: Counter = Counter()
+
+    def record(self, redacted: RedactedText, aggressive: bool = False):
+        with self._lock:
+            self.documents += 1
+            self.documents_changed += redacted.changed
+            self.aggressive_passes += aggressive
+            self.spans_by_kind.update(span.kind for span in redacted.spans)
+
+    def record_safety_retry(self):
+        with self._lock:
+            self.safety_retries += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": PII_REDACTION_ENABLED,
+                "documents": self.documents,
+                "documents_changed": self.documents_changed,
+                "changed_rate": round(self.documents_changed / self.documents, 4) if self.documents else 0.0,
+                "aggressive_passes": self.aggressive_passes,
+                "safety_retries": self.safety_retries,
+                "spans_by_kind": dict(self.spans_by_kind),
+            }
+
+
+redaction_metrics = RedactionMetrics()
+
+
+def redact(session: Optional[RedactionSession], text: str, aggressive: bool = False) -> str:
+    """Redacts `text` within `session` and records the counters; returns the redacted text."""
+    if session is None or (not PII_REDACTION_ENABLED and not aggressive):
+        return text
+    redacted = session.redact(text, aggressive)
+    redaction_metrics.record(redacted, aggressive)
+    return redacted.text
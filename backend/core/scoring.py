@@ -0,0 +1,200 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy import sparse
+
+from core.data_loader import DataLoader
+
+# Extra weight of a must-have job skill relative to a nice-to-have one
+MUST_HAVE_WEIGHT = float(os.getenv("MUST_HAVE_WEIGHT", "2.0"))
+# Score reported when no skill could be extracted from the job description
+NO_JOB_SKILLS_SCORE = 50.0
+
+# "Python (computer programming)" -> "Python": market keywords are plain skill names
+_QUALIFIER_PATTERN = re.compile(r"\s*\([^)]*\)")
+
+# Job description wording that marks skills as required / optional
+_REQUIRED_CUE = re.compile(r"\b(?:must|required|requirements?|mandatory|essential|qualifications|you have)\b", re.IGNORECASE)
+_OPTIONAL_CUE = re.compile(r"\b(?:nice[- ]to[- ]have|preferred|a plus|bonus|desirable|ideally|optional)\b", re.IGNORECASE)
+_SEGMENT_SPLIT = re.compile(r"\n|(?<=[.;!?])\s+") # Lines and sentences ("Node.js" stays whole)
+_HEADER_MAX_WORDS = 6
+
+
+def must_have_skills(job_text: str, job_skills: Sequence[Dict]) -> List[str]:
+    """
+    Normalized labels of the job skills the description marks as required:
+    skills mentioned in a sentence with required wording ("must", "required",
+    ...) or under a requirements header, and not in one with optional wording
+    ("nice to have", "a plus", "preferred", ...).
+    """
+    if not job_text or not job_skills:
+        return []
+    required_text = []
+    section = None # Set by short header lines like "Requirements:" / "Nice to have:"
+    for segment in _SEGMENT_SPLIT.split(job_text):
+        segment = segment.strip()
+        if not segment:
+            continue
+        optional = bool(_OPTIONAL_CUE.search(segment))
+        required = not optional and bool(_REQUIRED_CUE.search(segment))
+        if len(segment.split()) <= _HEADER_MAX_WORDS and segment.endswith(":"):
+            section = "optional" if optional else ("required" if required else None)
+            continue
+        if required or (section == "required" and not optional):
+            required_text.append(segment.lower())
+    if not required_text:
+        return []
+    required_text = "\n".join(required_text)
+    return list(dict.fromkeys(
+        skill['normalized'] for skill in job_skills
+        if re.search(rf"(?<!\w){re.escape(skill['original'].lower())}(?!\w)", required_text)
+    ))
+
+
+def demand_weight(total_demand):
+    """Weight of a job skill: 1 for unknown demand, growing slowly with it (scalar or array)."""
+    weight = 1.0 + np.log1p(np.maximum(total_demand, 0))
+    return float(weight) if np.ndim(weight) == 0 else weight
+
+
+class SkillSpace:
+    """
+    Column space shared by a set of sparse skill vectors. Skills found in ESCO
+    are interned to their concept id (column = id); the others get columns
+    after the ESCO block, local to this space. Lookups are case-insensitive.
+    """
+
+    def __init__(self, data_loader: DataLoader):
+        self.data_loader = data_loader
+        self.esco_count = data_loader.esco_count
+        self._extra: Dict[str, int] = {}
+        self.labels: Dict[int, str] = {} # Column -> first spelling seen
+
+    @property
+    def dim(self) -> int:
+        return self.esco_count + len(self._extra)
+
+    def columns(self, skills: Sequence[str], add: bool = True) -> np.ndarray:
+        """Column of each skill; unknown non-ESCO skills are added, or -1 with add=False."""
+        ids = self.data_loader.get_esco_ids(list(skills)) if len(skills) else np.zeros(0, dtype=np.int64)
+        for i in np.flatnonzero(ids < 0).tolist():
+            key = skills[i].strip().lower()
+            if add:
+                ids[i] = self.esco_count + self._extra.setdefault(key, len(self._extra))
+            elif key in self._extra:
+                ids[i] = self.esco_count + self._extra[key]
+        if add:
+            for skill, column in zip(skills, ids.tolist()):
+                self.labels.setdefault(column, skill)
+        return ids
+
+    def vectors(self, skill_lists: Sequence[Sequence[str]]) -> sparse.csr_matrix:
+        """One binary row per skill list (duplicates collapse)."""
+        lengths = [len(skills) for skills in skill_lists]
+        columns = self.columns([skill for skills in skill_lists for skill in skills])
+        rows = np.repeat(np.arange(len(skill_lists)), lengths)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float32), (rows, columns)),
+            shape=(len(skill_lists), self.dim),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        return matrix
+
+    def row_labels(self, matrix: sparse.csr_matrix, row: int) -> List[str]:
+        return [self.labels[c] for c in matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist()]
+
+
+class SkillScorer:
+    """
+    Demand-weighted skill coverage over sparse vectors.
+
+    A job vector holds one weight per required skill: demand_weight of its
+    market demand, times MUST_HAVE_WEIGHT for must-haves. The coverage of a
+    CV is the share of that weight it holds (0-100). Coverage of every CV
+    against every job is one sparse matrix product; coverage of aligned
+    (CV, job) pairs is one element-wise product.
+    """
+
+    def __init__(self, data_loader: DataLoader, must_have_weight: float = MUST_HAVE_WEIGHT):
+        self.data_loader = data_loader
+        self.must_have_weight = must_have_weight
+
+    def skill_demand(self, skills: List[str]) -> np.ndarray:
+        """Market demand per skill, retrying qualified ESCO labels without their qualifier."""
+        demand = self.data_loader.skill_demand(skills)
+        unknown = np.flatnonzero(demand == 0)
+        if len(unknown):
+            stripped = [_QUALIFIER_PATTERN.sub("", skills[i]).strip() for i in unknown.tolist()]
+            demand[unknown] = self.data_loader.skill_demand(stripped)
+        return demand
+
+    def market_demand(self, skills: List[str]) -> List[Dict]:
+        """get_market_demand_batch, with the same qualifier stripping as skill_demand (labels kept as given)."""
+        demand = self.data_loader.get_market_demand_batch(skills)
+        unknown = [i for i, entry in enumerate(demand) if not entry['total_demand']]
+        if unknown:
+            retried = self.data_loader.get_market_demand_batch(
+                [_QUALIFIER_PATTERN.sub("", skills[i]).strip() for i in unknown]
+            )
+            for i, entry in zip(unknown, retried):
+                demand[i] = {**entry, 'skill': skills[i]}
+        return demand
+
+    def job_weights(self, space: SkillSpace, jobs: sparse.csr_matrix,
+                    must_have: Optional[Sequence[Iterable[str]]] = None) -> sparse.csr_matrix:
+        """Binary job vectors -> weighted job vectors (one demand lookup for all columns)."""
+        weighted = jobs.astype(np.float64, copy=True)
+        used = np.unique(weighted.indices)
+        column_weight = np.ones(space.dim)
+        if len(used):
+            column_weight[used] = demand_weight(self.skill_demand([space.labels[c] for c in used.tolist()]))
+        weighted.data = column_weight[weighted.indices]
+
+        if must_have is not None:
+            for row, skills in enumerate(must_have):
+                skills = list(skills)
+                if not skills:
+                    continue
+                start, end = weighted.indptr[row], weighted.indptr[row + 1]
+                flagged = np.isin(weighted.indices[start:end], space.columns(skills, add=False))
+                weighted.data[start:end][flagged] *= self.must_have_weight
+        return weighted
+
+    @staticmethod
+    def _align(a: sparse.csr_matrix, b: sparse.csr_matrix):
+        """Vectors built before the space grew are narrower; widen to a common dim."""
+        dim = max(a.shape[1], b.shape[1])
+        return (a if a.shape[1] == dim else sparse.csr_matrix(a, shape=(a.shape[0], dim)),
+                b if b.shape[1] == dim else sparse.csr_matrix(b, shape=(b.shape[0], dim)))
+
+    @staticmethod
+    def _coverage(held: np.ndarray, totals: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(totals > 0, 100.0 * held / totals, NO_JOB_SKILLS_SCORE)
+
+    def coverage_matrix(self, cvs: sparse.csr_matrix, weighted_jobs: sparse.csr_matrix) -> np.ndarray:
+        """(n_cvs x n_jobs) coverage of every CV against every job."""
+        cvs, weighted_jobs = self._align(cvs, weighted_jobs)
+        held = (cvs @ weighted_jobs.T).toarray()
+        totals = np.asarray(weighted_jobs.sum(axis=1)).ravel()
+        return self._coverage(held, totals[np.newaxis, :])
+
+    def pair_coverage(self, cvs: sparse.csr_matrix, weighted_jobs: sparse.csr_matrix) -> np.ndarray:
+        """Coverage of CV row i against job row i, for aligned matrices (or one CV row against all jobs)."""
+        if cvs.shape[0] == 1 and weighted_jobs.shape[0] != 1:
+            return self.coverage_matrix(cvs, weighted_jobs)[0]
+        cvs, weighted_jobs = self._align(cvs, weighted_jobs)
+        held = np.asarray(weighted_jobs.multiply(cvs).sum(axis=1)).ravel()
+        totals = np.asarray(weighted_jobs.sum(axis=1)).ravel()
+        return self._coverage(held, totals)
+
+    def score(self, cv_skills: Sequence[str], job_skills: Sequence[str],
+              must_have: Iterable[str] = ()) -> float:
+        """Coverage of a single CV / job pair."""
+        space = SkillSpace(self.data_loader)
+        vectors = space.vectors([cv_skills, job_skills])
+        weighted = self.job_weights(space, vectors[1], [must_have])
+        return float(self.pair_coverage(vectors[0], weighted)[0])
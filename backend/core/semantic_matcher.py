@@ -0,0 +1,261 @@
+"""
+Semantic ESCO matching: every ESCO label (preferred, alternative and hidden)
+is embedded once, offline, with a small local sentence-embedding model and
+stored as an L2-normalized float16 matrix that is memory-mapped at runtime.
+Skills that have no exact or trigram match are embedded in one batch and
+matched by a blocked top-k matrix multiply against that matrix ("ML" ->
+"machine learning").
+
+Usage (from the backend/ directory, needs network once to fetch the model):
+    python -m core.semantic_matcher build [--model sentence-transformers/all-MiniLM-L6-v2]
+    python -m core.semantic_matcher query "ML" "k8s" [--cutoff 0.75]
+
+The artifact (model + tokenizer + embeddings.npy + manifest.json) lives in
+MODEL_ARTIFACTS_DIR/esco_embeddings/; at runtime the model is loaded from
+there with local_files_only, on CPU, so no network access is needed.
+Enable with ESCO_SEMANTIC_MATCHING=true.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_MODEL_NAME = os.getenv("SEMANTIC_MODEL_NAME", DEFAULT_EMBEDDING_MODEL)
+ESCO_SEMANTIC_MATCHING = os.getenv("ESCO_SEMANTIC_MATCHING", "false").lower() in ("1", "true", "yes")
+ESCO_SEMANTIC_CUTOFF = float(os.getenv("ESCO_SEMANTIC_CUTOFF", "0.75"))
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "5"))
+# After a failed load (artifact missing or stale, model error) semantic
+# matching is skipped for this long, then the load is tried again
+SEMANTIC_RETRY_SECONDS = float(os.getenv("SEMANTIC_RETRY_SECONDS", "300"))
+# Same artifact root as the GLiNER ONNX export (core/skill_extractor.py)
+MODEL_ARTIFACTS_DIR = os.getenv("MODEL_ARTIFACTS_DIR", os.path.join("data", "models"))
+
+EMBEDDINGS_FILE = "embeddings.npy"
+MANIFEST_FILE = "manifest.json"
+MODEL_SUBDIR = "model"
+EMBED_BATCH_SIZE = 256
+# Label rows scored per block, bounds the float32 working set at request time
+SCORE_BLOCK_ROWS = 32768
+MAX_LABEL_TOKENS = 32
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def semantic_artifact_dir(model_name: str) -> str:
+    return os.path.join(MODEL_ARTIFACTS_DIR, "esco_embeddings", model_name.replace("/", "__"))
+
+
+class SentenceEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from a transformers encoder, on CPU."""
+
+    def __init__(self, source: str, local_files_only: bool = True):
+        import torch # Heavy imports, deferred until the model is actually needed
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local_files_only)
+        self.model = AutoModel.from_pretrained(source, local_files_only=local_files_only).to("cpu").eval()
+        self.dim = int(self.model.config.hidden_size)
+
+    def save(self, output_dir: str):
+        self.tokenizer.save_pretrained(output_dir)
+        self.model.save_pretrained(output_dir)
+
+    def embed(self, texts: Sequence[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+        torch = self._torch
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                batch = list(texts[start:start + batch_size])
+                encoded = self.tokenizer(batch, padding=True, truncation=True,
+                                         max_length=MAX_LABEL_TOKENS, return_tensors="pt")
+                hidden = self.model(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+                out[start:start + len(batch)] = pooled.numpy()
+        return out
+
+
+def top_k_similar(queries: np.ndarray, matrix: np.ndarray, k: int,
+                  block_rows: int = SCORE_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k rows of `matrix` by dot product for every query row, best first.
+    `matrix` may be a float16 memmap: it is scored block by block so only one
+    float32 block is materialized at a time. Returns (rows, scores), each
+    (n_queries x k'); k' = min(k, len(matrix)).
+    """
+    n_queries, n_rows = len(queries), len(matrix)
+    k = min(k, n_rows)
+    best_rows = np.full((n_queries, 0), -1, dtype=np.int64)
+    best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+    if not n_queries or not k:
+        return best_rows, best_scores
+
+    for start in range(0, n_rows, block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        scores = queries @ block.T
+        block_k = min(k, scores.shape[1])
+        candidates = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+        rows = np.concatenate([best_rows, candidates + start], axis=1)
+        merged = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+        if merged.shape[1] > k:
+            keep = np.argpartition(-merged, k - 1, axis=1)[:, :k]
+            rows, merged = np.take_along_axis(rows, keep, axis=1), np.take_along_axis(merged, keep, axis=1)
+        best_rows, best_scores = rows, merged
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class SemanticMatcher:
+    """
+    Runtime side: the memory-mapped label embedding matrix (rows aligned with
+    the ESCO label index of the market snapshot) plus the cached encoder.
+    """
+
+    def __init__(self, artifact_dir: str):
+        with open(os.path.join(artifact_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.embeddings = np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        self.embedder = SentenceEmbedder(os.path.join(artifact_dir, MODEL_SUBDIR), local_files_only=True)
+
+    def fingerprint(self) -> str:
+        """Identifies the match output (used in the normalization cache version)."""
+        return f"{self.manifest['model']}:{self.manifest['embeddings_sha256']}"
+
+    def match(self, queries: Sequence[str], cutoff: float, top_k: int = SEMANTIC_TOP_K) -> List[List[Tuple[int, float]]]:
+        """For each query, up to top_k (label_row, cosine) pairs scoring >= cutoff, best first."""
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries]
+        wanted = [i for i, q in enumerate(queries) if q and q.strip()]
+        if not wanted:
+            return results
+        vectors = self.embedder.embed([queries[i].strip() for i in wanted])
+        rows, scores = top_k_similar(vectors, self.embeddings, top_k)
+        for n, i in enumerate(wanted):
+            results[i] = [(int(r), float(s)) for r, s in zip(rows[n].tolist(), scores[n].tolist()) if s >= cutoff]
+        return results
+
+
+def build_embeddings(data_loader, model_name: str = SEMANTIC_MODEL_NAME) -> str:
+    """
+    Offline job: embeds every ESCO label of the snapshot into a float16
+    matrix written straight to disk (never fully held in memory), under
+    semantic_artifact_dir(model_name) where the runtime looks for it.
+    """
+    output_dir = semantic_artifact_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = time.time()
+
+    print(f"Loading embedding model {model_name}...")
+    embedder = SentenceEmbedder(model_name, local_files_only=False)
+    embedder.save(os.path.join(output_dir, MODEL_SUBDIR))
+
+    labels = data_loader.esco_label_index.keys.to_list()
+    tmp_path = os.path.join(output_dir, EMBEDDINGS_FILE + ".tmp")
+    matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(len(labels), embedder.dim))
+    chunk = EMBED_BATCH_SIZE * 16
+    for start in range(0, len(labels), chunk):
+        matrix[start:start + chunk] = embedder.embed(labels[start:start + chunk]).astype(np.float16)
+        print(f"🧮 Embedded {min(start + chunk, len(labels)):,}/{len(labels):,} ESCO labels")
+    matrix.flush()
+    del matrix
+    embeddings_path = os.path.join(output_dir, EMBEDDINGS_FILE)
+    os.replace(tmp_path, embeddings_path)
+
+    manifest = {
+        "model": model_name,
+        "dim": embedder.dim,
+        "dtype": "float16",
+        "label_count": len(labels),
+        "esco_fingerprint": data_loader.esco_fingerprint,
+        "embeddings_sha256": _sha256_file(embeddings_path),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ ESCO embeddings built in {time.time() - start_time:.1f} seconds ({output_dir})")
+    return output_dir
+
+
+_semantic_matcher: Optional[SemanticMatcher] = None
+_semantic_matcher_retry_at = 0.0 # time.monotonic() before which a failed load isn't retried
+_semantic_matcher_lock = threading.Lock()
+
+def get_semantic_matcher(data_loader) -> Optional[SemanticMatcher]:
+    """
+    Shared matcher, or None when semantic matching is disabled or the artifact
+    is missing / was built from a different ESCO snapshot. A failed load is
+    retried after SEMANTIC_RETRY_SECONDS (e.g. once the artifact is built).
+    """
+    global _semantic_matcher, _semantic_matcher_retry_at
+    if not ESCO_SEMANTIC_MATCHING:
+        return None
+    if _semantic_matcher is None:
+        if time.monotonic() < _semantic_matcher_retry_at:
+            return None
+        with _semantic_matcher_lock:
+            if _semantic_matcher is None and time.monotonic() >= _semantic_matcher_retry_at:
+                artifact_dir = semantic_artifact_dir(SEMANTIC_MODEL_NAME)
+                try:
+                    matcher = SemanticMatcher(artifact_dir)
+                    if (matcher.manifest["esco_fingerprint"] != data_loader.esco_fingerprint
+                            or matcher.manifest["label_count"] != len(data_loader.esco_label_index)):
+                        raise RuntimeError("built from a different ESCO snapshot")
+                    _semantic_matcher = matcher
+                    print(f"✅ Semantic ESCO matcher ready ({matcher.manifest['label_count']:,} labels, {SEMANTIC_MODEL_NAME})")
+                except Exception as e:
+                    _semantic_matcher_retry_at = time.monotonic() + SEMANTIC_RETRY_SECONDS
+                    print(f"⚠️  Semantic ESCO matching unavailable: {e} (retrying in {SEMANTIC_RETRY_SECONDS:.0f}s)")
+                    print("    Run `python -m core.semantic_matcher build` if the artifact is missing or stale.")
+    return _semantic_matcher
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="ESCO label embeddings for semantic skill matching")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = sub.add_parser("build", help="Embed every ESCO label (offline, once)")
+    build_cmd.add_argument("--model", default=SEMANTIC_MODEL_NAME,
+                           help="Served once SEMANTIC_MODEL_NAME names it (artifacts go under MODEL_ARTIFACTS_DIR)")
+
+    query_cmd = sub.add_parser("query", help="Match skills against the built embeddings")
+    query_cmd.add_argument("skills", nargs="+")
+    query_cmd.add_argument("--model", default=SEMANTIC_MODEL_NAME)
+    query_cmd.add_argument("--cutoff", type=float, default=ESCO_SEMANTIC_CUTOFF)
+    query_cmd.add_argument("--top-k", type=int, default=SEMANTIC_TOP_K)
+
+    args = parser.parse_args(argv)
+    from core.data_loader import get_data_loader
+    data_loader = get_data_loader()
+
+    if args.command == "build":
+        build_embeddings(data_loader, args.model)
+        return 0
+
+    matcher = SemanticMatcher(semantic_artifact_dir(args.model))
+    for skill, hits in zip(args.skills, matcher.match(args.skills, args.cutoff, args.top_k)):
+        print(json.dumps({
+            "skill": skill,
+            "matches": [{"label": data_loader.esco_label_index.keys[row], "score": round(score, 4)} for row, score in hits],
+        }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,84 @@
-import torch
+import json
+import os
 import re
-from typing import List, Dict, Set
-from gliner import GLiNER
-from core.data_loader import DataLoader # Import our data loader class
+import threading
+from typing import List, Dict, Optional, Set, Tuple
+from core.data_loader import DataLoader, get_data_loader # Import our data loader class
+from core.cache import TieredCache, make_cache_key
+from core.semantic_matcher import ESCO_SEMANTIC_CUTOFF, get_semantic_matcher
 
 print("Initializing Skill Extractor...")
 
+# --- 0. INFERENCE ENGINE SELECTION ---
+# torch      -> full PyTorch fp32 model (default)
+# onnx       -> ONNX Runtime fp32 export
+# onnx-int8  -> ONNX Runtime with dynamic int8 quantized weights
+# dictionary -> degraded mode, no neural model: ESCO dictionary + regex only
+# ONNX artifacts are produced once with `python -m core.onnx_export export`.
+ENGINE_TORCH = "torch"
+ENGINE_ONNX = "onnx"
+ENGINE_ONNX_INT8 = "onnx-int8"
+ENGINE_DICTIONARY = "dictionary"
+ONNX_MODEL_FILES = {
+    ENGINE_ONNX: "model.onnx",
+    ENGINE_ONNX_INT8: "model_quantized.onnx",
+}
+# Written next to the ONNX files by the export, completed by the parity check
+ONNX_MANIFEST_FILE = "export_manifest.json"
+DEFAULT_MODEL_NAME = "urchade/gliner_base"
+SKILL_EXTRACTOR_ENGINE = os.getenv("SKILL_EXTRACTOR_ENGINE", ENGINE_TORCH).lower()
+MODEL_ARTIFACTS_DIR = os.getenv("MODEL_ARTIFACTS_DIR", os.path.join("data", "models"))
+# Skip GLiNER for documents in which neither the ESCO dictionary nor the
+# regex patterns find a single skill (empty, garbled or off-topic text)
+SKILL_DICTIONARY_PREFILTER = os.getenv("SKILL_DICTIONARY_PREFILTER", "false").lower() in ("1", "true", "yes")
+
+
+def onnx_artifact_dir(model_name: str) -> str:
+    """Directory holding the exported ONNX model, config and tokenizer."""
+    return os.path.join(MODEL_ARTIFACTS_DIR, model_name.replace("/", "__") + "-onnx")
+
+
+def onnx_artifact_problem(artifact_dir: str, model_name: str, engine: str,
+                          require_parity: bool = True) -> Optional[str]:
+    """
+    Why the ONNX artifact of `engine` must not be served, or None if it may:
+    no export manifest, exported from another model or GLiNER version, model
+    file replaced since the export, or a failed parity check for this exact
+    file. A file whose parity was never checked is served with a warning.
+    """
+    import gliner
+    onnx_file = ONNX_MODEL_FILES[engine]
+    try:
+        with open(os.path.join(artifact_dir, ONNX_MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return f"no readable export manifest ({e})"
+    if manifest.get("model_name") != model_name:
+        return f"exported from {manifest.get('model_name')!r}, not {model_name!r}"
+    installed = getattr(gliner, "__version__", "unknown")
+    if manifest.get("gliner_version") != installed:
+        return f"exported with GLiNER {manifest.get('gliner_version')}, running {installed}"
+    file_entry = (manifest.get("files") or {}).get(onnx_file)
+    if file_entry is None:
+        return f"{onnx_file} is not part of the export"
+    if os.path.getsize(os.path.join(artifact_dir, onnx_file)) != file_entry.get("size_bytes"):
+        return f"{onnx_file} changed since the export"
+    parity = (manifest.get("parity") or {}).get(engine)
+    if parity is None or parity.get("sha256") != file_entry.get("sha256"):
+        print(f"⚠️  Parity of the {engine} engine was never checked: python -m core.onnx_export parity")
+    elif require_parity and not parity.get("passed"):
+        return f"failed the parity check against torch ({parity.get('checked_at')})"
+    return None
+
+
 # --- 1. GLiNER MODEL LOADER (SINGLETON) ---
 
 class GLiNERSkillExtractor:
-    def __init__(self, model_name="urchade/gliner_base"):
-        print(f"Loading GLiNER model: {model_name}...")
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, engine=SKILL_EXTRACTOR_ENGINE, require_parity=True):
+        print(f"Loading GLiNER model: {model_name} (engine: {engine})...")
         self.model_name = model_name
         print("This may take a moment on first run as it downloads...")
+        import torch # Heavy import, deferred until the model is actually loaded
         
         # Check for GPU
         device = 0 if torch.cuda.is_available() else -1
@@ -21,8 +87,8 @@ class GLiNERSkillExtractor:
         else:
             print("CUDA not available. Loading model on CPU.")
             
-        self.model = GLiNER.from_pretrained(model_name)
-        print("✅ GLiNER model loaded successfully.")
+        self.engine, self.model = self._load_model(model_name, engine, require_parity)
+        print(f"✅ GLiNER model loaded successfully ({self.engine}).")
 
         # Define non-skill words to filter out
         self.NON_SKILLS = {
@@ -40,23 +106,104 @@ class GLiNERSkillExtractor:
             "programming language", "framework", "platform",
             "certification", "competency", "methodology"
         ]
+        self.threshold = 0.3 # Use a slightly higher threshold for better precision
+
+    def fingerprint(self) -> str:
+        """Identifies everything that changes extraction output (used as cache version)."""
+        return make_cache_key(
+            self.model_name, self.engine, sorted(self.labels), self.threshold,
+            sorted(self.NON_SKILLS), CHUNK_MAX_WORDS, CHUNK_OVERLAP_WORDS,
+        )
+
+    @staticmethod
+    def _load_model(model_name: str, engine: str, require_parity: bool = True):
+        """
+        Loads the requested engine, falling back to torch if no ONNX export
+        exists or its manifest doesn't vouch for it (onnx_artifact_problem).
+        """
+        from gliner import GLiNER
+        if engine in ONNX_MODEL_FILES:
+            artifact_dir = onnx_artifact_dir(model_name)
+            onnx_file = ONNX_MODEL_FILES[engine]
+            onnx_path = os.path.join(artifact_dir, onnx_file)
+            if not os.path.isfile(onnx_path):
+                print(f"⚠️  ONNX artifact {onnx_path} not found.")
+                print("    Run `python -m core.onnx_export export` once. Falling back to torch.")
+            elif problem := onnx_artifact_problem(artifact_dir, model_name, engine, require_parity):
+                print(f"⚠️  ONNX artifact {onnx_path} not used: {problem}.")
+                print("    Re-run `python -m core.onnx_export export` (and parity). Falling back to torch.")
+            else:
+                model = GLiNER.from_pretrained(
+                    artifact_dir,
+                    load_onnx_model=True,
+                    load_tokenizer=True,
+                    onnx_model_file=onnx_file,
+                )
+                return engine, model
+        elif engine != ENGINE_TORCH:
+            print(f"⚠️  Unknown skill extractor engine '{engine}'. Falling back to torch.")
+
+        return ENGINE_TORCH, GLiNER.from_pretrained(model_name)
 
     def __call__(self, text: str) -> List[Dict[str, any]]:
         """Extracts skills using GLiNER with filtering."""
-        
-        # Note: GLiNER's predict_entities doesn't use the 'device' param
-        # It auto-detects if the model was loaded onto a device.
-        entities = self.model.predict_entities(
-            text, 
+        return self.extract_batch([text])[0]
+
+    def _max_chunk_words(self) -> int:
+        """Chunk size in words, capped by the model's own max sequence length."""
+        model_max_len = getattr(getattr(self.model, 'config', None), 'max_len', None) or CHUNK_MAX_WORDS
+        return max(CHUNK_OVERLAP_WORDS * 2, min(CHUNK_MAX_WORDS, model_max_len))
+
+    def _predict_chunks(self, chunks: List[str]) -> List[List[Dict[str, any]]]:
+        """Runs every chunk through GLiNER in a single batched call."""
+        # Newer GLiNER releases expose `inference`; older ones `batch_predict_entities`.
+        predict = getattr(self.model, 'inference', None) or self.model.batch_predict_entities
+        return predict(
+            chunks,
             self.labels,
-            threshold=0.3, # Use a slightly higher threshold for better precision
+            threshold=self.threshold,
+            batch_size=INFERENCE_BATCH_SIZE,
         )
-        
+
+    def extract_batch(self, texts: List[str]) -> List[List[Dict[str, any]]]:
+        """
+        Extracts skills from several documents in one GLiNER forward pass.
+        Each document is split into sentence-aware overlapping chunks so long
+        CVs are not truncated at the model's max sequence length; entity spans
+        are mapped back to document offsets before filtering.
+        """
+        max_words = self._max_chunk_words()
+        chunk_texts = []
+        chunk_owners = [] # (document index, chunk start offset)
+
+        for doc_idx, text in enumerate(texts):
+            for start, end in chunk_text(text or "", max_words, CHUNK_OVERLAP_WORDS):
+                chunk_texts.append(text[start:end])
+                chunk_owners.append((doc_idx, start))
+
+        doc_entities = [[] for _ in texts]
+        if chunk_texts:
+            # Note: GLiNER auto-detects if the model was loaded onto a device.
+            batch_entities = self._predict_chunks(chunk_texts)
+            for (doc_idx, offset), entities in zip(chunk_owners, batch_entities):
+                for entity in entities:
+                    doc_entities[doc_idx].append({
+                        **entity,
+                        'start': entity['start'] + offset,
+                        'end': entity['end'] + offset,
+                    })
+
+        return [
+            self._filter_entities(text, merge_chunk_entities(entities))
+            for text, entities in zip(texts, doc_entities)
+        ]
+
+    def _filter_entities(self, text: str, entities: List[Dict[str, any]]) -> List[Dict[str, any]]:
         results = []
         seen = set()
         
         for entity in entities:
-            skill_text = entity['text'].strip()
+            skill_text = text[entity['start']:entity['end']].strip() or entity['text'].strip()
             skill_lower = skill_text.lower()
             
             # Filter aggressively
@@ -70,17 +217,125 @@ class GLiNERSkillExtractor:
                     'entity_group': entity['label'],
                     'score': entity['score'],
                     # Also return the context for Stage 3
-                    'evidence': text[max(0, entity['start']-30) : min(len(text), entity['end']+30)]
+                    'evidence': evidence_window(text, entity['start'], entity['end'])
                 })
         
         return results
 
-# Create a single, shared instance of the extractor
-# This runs ONE time when the server starts.
-gliner_extractor = GLiNERSkillExtractor()
+
+# --- CHUNKING HELPERS ---
+
+# Chunk sizes are counted in GLiNER "words" (same split as its tokenizer)
+CHUNK_MAX_WORDS = 256
+CHUNK_OVERLAP_WORDS = 32
+INFERENCE_BATCH_SIZE = 8
+EVIDENCE_CONTEXT_CHARS = 30
+
+_WORD_PATTERN = re.compile(r'\w+(?:[-_]\w+)*|\S')
+_SENTENCE_END_PATTERN = re.compile(r'[.!?;:]+|\n')
+
+
+def evidence_window(text: str, start: int, end: int) -> str:
+    """Returns the text around a span, used as evidence for the AI stage."""
+    return text[max(0, start - EVIDENCE_CONTEXT_CHARS) : min(len(text), end + EVIDENCE_CONTEXT_CHARS)]
+
+
+def chunk_text(text: str, max_words: int = CHUNK_MAX_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[Tuple[int, int]]:
+    """
+    Splits text into overlapping (start, end) character windows of at most
+    `max_words` words. Window ends snap back to a sentence boundary when one
+    is available in the second half of the window, and the next window starts
+    `overlap_words` earlier (snapped forward to a sentence start if possible).
+    """
+    words = [(m.start(), m.end()) for m in _WORD_PATTERN.finditer(text)]
+    if not words:
+        return []
+    if len(words) <= max_words:
+        return [(words[0][0], words[-1][1])]
+
+    # Word indices that begin a new sentence
+    sentence_starts = set()
+    for i in range(1, len(words)):
+        gap_and_prev = text[words[i - 1][0]:words[i][0]]
+        if _SENTENCE_END_PATTERN.search(gap_and_prev):
+            sentence_starts.add(i)
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = min(start + max_words, len(words))
+        if end < len(words):
+            for candidate in range(end, start + max_words // 2, -1):
+                if candidate in sentence_starts:
+                    end = candidate
+                    break
+        chunks.append((words[start][0], words[end - 1][1]))
+        if end >= len(words):
+            break
+
+        next_start = max(end - overlap_words, start + 1)
+        for candidate in range(next_start, end):
+            if candidate in sentence_starts:
+                next_start = candidate
+                break
+        start = next_start
+
+    return chunks
+
+
+def merge_chunk_entities(entities: List[Dict[str, any]]) -> List[Dict[str, any]]:
+    """
+    Merges entities coming from overlapping chunks of the same document.
+    Spans are resolved greedily by score (flat NER): the best-scoring span wins
+    and any span overlapping it is dropped. Result is in document order.
+    """
+    kept = []
+    for entity in sorted(entities, key=lambda e: (-e['score'], e['start'])):
+        if all(entity['end'] <= k['start'] or entity['start'] >= k['end'] for k in kept):
+            kept.append(entity)
+    kept.sort(key=lambda e: e['start'])
+    return kept
 
 
-# --- 2. HYBRID EXTRACTION & NORMALIZATION LOGIC ---
+# Single, shared instance of the extractor. It is created on first use
+# (normally by the background warmup started from the app lifespan) so that
+# importing this module stays cheap.
+_gliner_extractor = None
+_gliner_extractor_lock = threading.Lock()
+
+def get_gliner_extractor() -> GLiNERSkillExtractor:
+    global _gliner_extractor
+    if _gliner_extractor is None:
+        with _gliner_extractor_lock:
+            if _gliner_extractor is None:
+                _gliner_extractor = GLiNERSkillExtractor()
+    return _gliner_extractor
+
+
+# --- 2. CONTENT-ADDRESSED RESULT CACHES ---
+# Memory LRU in front of a SQLite file that survives restarts. Each cache is
+# versioned by a fingerprint (model/labels/threshold/NON_SKILLS for
+# extraction, ESCO snapshot hash for normalization) and wiped when it changes.
+SKILL_CACHE_ENABLED = os.getenv("SKILL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SKILL_CACHE_DB = os.getenv("SKILL_CACHE_DB", os.path.join("data", "cache", "skill_cache.sqlite3"))
+SKILL_CACHE_MEMORY_ITEMS = int(os.getenv("SKILL_CACHE_MEMORY_ITEMS", "2048"))
+SKILL_CACHE_DISK_ITEMS = int(os.getenv("SKILL_CACHE_DISK_ITEMS", "100000"))
+
+skill_extraction_cache = TieredCache(
+    "skill_extraction",
+    max_memory_items=SKILL_CACHE_MEMORY_ITEMS if SKILL_CACHE_ENABLED else 0,
+    db_path=SKILL_CACHE_DB if SKILL_CACHE_ENABLED else None,
+    max_disk_items=SKILL_CACHE_DISK_ITEMS,
+)
+skill_normalization_cache = TieredCache(
+    "skill_normalization",
+    max_memory_items=SKILL_CACHE_MEMORY_ITEMS if SKILL_CACHE_ENABLED else 0,
+    db_path=SKILL_CACHE_DB if SKILL_CACHE_ENABLED else None,
+    max_disk_items=SKILL_CACHE_DISK_ITEMS,
+)
+
+
+# --- 3. HYBRID EXTRACTION & NORMALIZATION LOGIC ---
 
 # Common skills for regex backup (from your Cell 7)
 COMMON_SKILLS_PATTERN = re.compile(r'\b(' + r'|'.join([
@@ -107,29 +362,115 @@ BAD_ESCO_TERMS = [
     'manage', 'perform', 'ensure', 'coordinate'
 ]
 
+# Bump when the shape or logic of normalize_skills output changes
+NORMALIZATION_VERSION = 3
+
+# Approximate (character-trigram) ESCO matching for skills without exact match
+ESCO_FUZZY_MATCHING = os.getenv("ESCO_FUZZY_MATCHING", "true").lower() in ("1", "true", "yes")
+ESCO_FUZZY_CUTOFF = float(os.getenv("ESCO_FUZZY_CUTOFF", "0.75"))
+
 def extract_skills_from_text(text: str) -> List[Dict[str, any]]:
     """
     Extracts skills using GLiNER + common patterns (Hybrid Approach).
     Returns a list of skill dictionaries, each including 'word' and 'evidence'.
     """
-    found_skills_map = {} # Use a map to avoid duplicates, key = skill_lower
+    return extract_skills_from_texts([text])[0]
 
-    # Method 1: GLiNER (Primary)
+
+def extract_skills_from_texts(texts: List[str]) -> List[List[Dict[str, any]]]:
+    """
+    Batched version of extract_skills_from_text: all documents (e.g. CV and
+    job description) go through GLiNER together in one forward pass.
+    Documents already seen (same text, labels, threshold, model) are served
+    from the skill extraction cache and skipped.
+    """
+    if SKILL_EXTRACTOR_ENGINE == ENGINE_DICTIONARY:
+        # Degraded mode: the dictionary pass is cheap enough to skip the cache
+        return [extract_skills_without_model(text) for text in texts]
+
+    gliner_extractor = get_gliner_extractor()
+    extractor_version = make_cache_key(
+        gliner_extractor.fingerprint(), COMMON_SKILLS_PATTERN.pattern, SKILL_DICTIONARY_PREFILTER
+    )
+    skill_extraction_cache.ensure_version(extractor_version)
+    cache_keys = [make_cache_key(text, extractor_version) for text in texts]
+    results = [skill_extraction_cache.get(key) for key in cache_keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if SKILL_DICTIONARY_PREFILTER:
+        for i in list(missing):
+            if not COMMON_SKILLS_PATTERN.search(texts[i]) and not extract_dictionary_skills(texts[i]):
+                results[i] = []
+                skill_extraction_cache.set(cache_keys[i], results[i])
+                missing.remove(i)
+    if not missing:
+        return results
+
+    missing_texts = [texts[i] for i in missing]
     try:
-        gliner_skills = gliner_extractor(text)
-        for skill_info in gliner_skills:
-            if skill_info['score'] > 0.3:
-                found_skills_map[skill_info['word'].lower()] = {
-                    "skill": skill_info['word'],
-                    "source": "gliner",
-                    "evidence": skill_info['evidence']
-                }
+        gliner_results = gliner_extractor.extract_batch(missing_texts)
+        cacheable = True
     except Exception as e:
-        print(f"Error during GLiNER extraction: {e}")
-        pass
+        print(f"Error during GLiNER extraction: {e}. Falling back to dictionary extraction.")
+        gliner_results = None
+        cacheable = False # Don't persist degraded fallbacks
+
+    for n, (i, text) in enumerate(zip(missing, missing_texts)):
+        if gliner_results is None:
+            results[i] = extract_skills_without_model(text)
+        else:
+            results[i] = _merge_hybrid_skills(text, gliner_results[n])
+        if cacheable:
+            skill_extraction_cache.set(cache_keys[i], results[i])
+    return results
+
+
+def extract_dictionary_skills(text: str, data_loader: DataLoader = None) -> List[Dict[str, any]]:
+    """
+    Skills found by the ESCO dictionary automaton (every preferred/alt label,
+    one linear pass, longest match wins), in the same shape as GLiNER hits.
+    """
+    data_loader = data_loader or get_data_loader()
+    return [
+        {
+            "word": text[hit['start']:hit['end']],
+            "label": hit['label'],
+            "score": 1.0,
+            "evidence": evidence_window(text, hit['start'], hit['end'])
+        }
+        for hit in data_loader.find_esco_skills(text)
+    ]
+
+
+def extract_skills_without_model(text: str, data_loader: DataLoader = None) -> List[Dict[str, any]]:
+    """Dictionary + regex extraction only (no GLiNER), same output shape as extract_skills_from_texts."""
+    return _merge_hybrid_skills(text, [], extract_dictionary_skills(text, data_loader))
+
+
+def _merge_hybrid_skills(text: str, gliner_skills: List[Dict[str, any]],
+                         dictionary_skills: List[Dict[str, any]] = ()) -> List[Dict[str, any]]:
+    found_skills_map = {} # Use a map to avoid duplicates, key = skill_lower
+
+    # Method 1: GLiNER (Primary)
+    for skill_info in gliner_skills:
+        if skill_info['score'] > 0.3:
+            found_skills_map[skill_info['word'].lower()] = {
+                "skill": skill_info['word'],
+                "source": "gliner",
+                "evidence": skill_info['evidence']
+            }
+
+    # Method 2: ESCO dictionary (degraded mode, when GLiNER is off or failed)
+    for skill_info in dictionary_skills:
+        skill_lower = skill_info['word'].lower()
+        if skill_lower not in found_skills_map:
+            found_skills_map[skill_lower] = {
+                "skill": skill_info['word'],
+                "source": "dictionary",
+                "evidence": skill_info['evidence']
+            }
     
-    # Method 2: Common skill patterns (Backup)
-    text_lower = text.lower()
+    # Method 3: Common skill patterns (Backup)
     for match in COMMON_SKILLS_PATTERN.finditer(text):
         skill = match.group(0)
         skill_lower = skill.lower()
@@ -137,22 +478,54 @@ def extract_skills_from_text(text: str) -> List[Dict[str, any]]:
             found_skills_map[skill_lower] = {
                 "skill": skill.title(), # Capitalize for consistency
                 "source": "regex",
-                "evidence": text[max(0, match.start()-30) : min(len(text), match.end()+30)]
+                "evidence": evidence_window(text, match.start(), match.end())
             }
     
     return list(found_skills_map.values())
 
 
-def normalize_skills(skills: List[Dict[str, any]], data_loader: DataLoader) -> List[Dict[str, any]]:
+def normalize_skills(skills: List[Dict[str, any]], data_loader: DataLoader,
+                     fuzzy: bool = ESCO_FUZZY_MATCHING) -> List[Dict[str, any]]:
     """
     Normalizes a list of skill dictionaries using the ESCO database.
     We pass in the data_loader to access its pre-loaded data.
+    Skills without an exact label match are matched approximately in a single
+    batched query when `fuzzy` is enabled, then by embedding similarity when
+    semantic matching is enabled.
     """
+    semantic_matcher = get_semantic_matcher(data_loader)
+    normalizer_version = make_cache_key(
+        NORMALIZATION_VERSION, data_loader.esco_fingerprint, BAD_ESCO_TERMS, fuzzy, ESCO_FUZZY_CUTOFF,
+        semantic_matcher.fingerprint() if semantic_matcher else None, ESCO_SEMANTIC_CUTOFF
+    )
+    skill_normalization_cache.ensure_version(normalizer_version)
+    cache_key = make_cache_key(skills, normalizer_version)
+    cached = skill_normalization_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     normalized_list = []
+    esco_matches = data_loader.get_esco_matches([s['skill'] for s in skills]) # One pass over the index
+    match_types = ['exact' if m else 'none' for m in esco_matches]
+
+    if fuzzy:
+        unmatched = [i for i, m in enumerate(esco_matches) if m is None]
+        fuzzy_matches = data_loader.get_esco_fuzzy_matches([skills[i]['skill'] for i in unmatched], ESCO_FUZZY_CUTOFF)
+        for i, fuzzy_match in zip(unmatched, fuzzy_matches):
+            if fuzzy_match:
+                esco_matches[i] = fuzzy_match
+                match_types[i] = 'fuzzy'
+
+    if semantic_matcher is not None:
+        unmatched = [i for i, m in enumerate(esco_matches) if m is None]
+        semantic_matches = data_loader.get_esco_semantic_matches([skills[i]['skill'] for i in unmatched], ESCO_SEMANTIC_CUTOFF)
+        for i, semantic_match in zip(unmatched, semantic_matches):
+            if semantic_match:
+                esco_matches[i] = semantic_match
+                match_types[i] = 'semantic'
     
-    for skill_info in skills:
+    for skill_info, esco_match, match_type in zip(skills, esco_matches, match_types):
         skill_name = skill_info['skill']
-        esco_match = data_loader.get_esco_match(skill_name) # Use fast lookup
         
         if esco_match:
             match_label = esco_match['normalized']
@@ -166,7 +539,9 @@ def normalize_skills(skills: List[Dict[str, any]], data_loader: DataLoader) -> L
                     'skill_type': esco_match['skill_type'],
                     'evidence': skill_info['evidence'],
                     'source': skill_info['source'],
-                    'match_type': 'exact'
+                    'match_type': match_type,
+                    'matched_on': esco_match['matched_on'],
+                    'match_score': esco_match.get('score', 1.0)
                 })
                 continue
         
@@ -178,7 +553,10 @@ def normalize_skills(skills: List[Dict[str, any]], data_loader: DataLoader) -> L
             'skill_type': 'unknown',
             'evidence': skill_info['evidence'],
             'source': skill_info['source'],
-            'match_type': 'none'
+            'match_type': 'none',
+            'matched_on': None,
+            'match_score': None
         })
     
+    skill_normalization_cache.set(cache_key, normalized_list)
     return normalized_list
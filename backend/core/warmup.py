@@ -0,0 +1,122 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Seconds clients are told to wait (Retry-After) while the subsystem warms up
+WARMUP_RETRY_AFTER_SECONDS = int(os.getenv("WARMUP_RETRY_AFTER_SECONDS", "10"))
+
+STATUS_PENDING = "pending"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def _load_market_data():
+    from core.data_loader import get_data_loader
+    from core.semantic_matcher import get_semantic_matcher
+    loader = get_data_loader()
+    print(f"📊 Loaded {loader.esco_count} ESCO skills from market data")
+    get_semantic_matcher(loader) # Maps the label embeddings and loads the encoder, when enabled
+
+
+def _load_skill_extractor():
+    from core.skill_extractor import ENGINE_DICTIONARY, SKILL_EXTRACTOR_ENGINE, get_gliner_extractor
+    if SKILL_EXTRACTOR_ENGINE == ENGINE_DICTIONARY:
+        print("📖 Skill extraction in dictionary mode (GLiNER not loaded)")
+        return
+    extractor = get_gliner_extractor()
+    # One tiny inference so the first real request doesn't pay for lazy kernel/graph setup
+    extractor.extract_batch(["Experience with Python and SQL."])
+    print(f"🤖 GLiNER model '{extractor.model_name}' loaded and ready ({extractor.engine})")
+
+
+def _load_cv_index():
+    from core.cv_index import get_cv_index
+    from core.data_loader import get_data_loader
+    # Backfills stored CVs once; later restarts only pick up new files
+    cv_index = get_cv_index()
+    cv_index.sync_stored_cvs(get_data_loader())
+    print(f"📇 CV index ready ({len(cv_index.documents)} CVs)")
+
+
+class SubsystemWarmup:
+    """
+    Loads the heavy skills-gap components (market data snapshot, GLiNER model)
+    in worker threads after the server has started accepting requests, and
+    records per-subsystem readiness and load durations for /health.
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self.loaders = loaders
+        self.state: Dict[str, Dict[str, Any]] = {
+            name: {"status": STATUS_PENDING, "duration_seconds": None, "error": None}
+            for name in loaders
+        }
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Schedules the warmup on the running loop (idempotent)."""
+        if self._task is None:
+            self.started_at = time.perf_counter()
+            self._task = asyncio.create_task(self._run(), name="skills-gap-warmup")
+        return self._task
+
+    async def _load(self, name: str, loader: Callable[[], Any]):
+        entry = self.state[name]
+        entry["status"] = STATUS_LOADING
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(loader)
+            entry["status"] = STATUS_READY
+        except Exception as e:
+            entry["status"] = STATUS_FAILED
+            entry["error"] = str(e)
+            print(f"❌ Warmup of '{name}' failed: {e}")
+        finally:
+            entry["duration_seconds"] = round(time.perf_counter() - start, 3)
+
+    async def _run(self):
+        print("⏳ Warming up Skills Gap Analysis in the background...")
+        await asyncio.gather(*(self._load(name, loader) for name, loader in self.loaders.items()))
+        self.finished_at = time.perf_counter()
+        if self.is_ready():
+            print(f"✅ Skills Gap Analysis ready (warmup {self.finished_at - self.started_at:.1f}s)")
+        else:
+            print("⚠️  Skills Gap Analysis warmup finished with errors")
+
+    def is_ready(self, names: Optional[List[str]] = None) -> bool:
+        names = names or list(self.state)
+        return all(self.state[name]["status"] == STATUS_READY for name in names)
+
+    def has_failed(self, names: Optional[List[str]] = None) -> bool:
+        names = names or list(self.state)
+        return any(self.state[name]["status"] == STATUS_FAILED for name in names)
+
+    def status(self) -> Dict[str, Any]:
+        if self.is_ready():
+            overall = STATUS_READY
+        elif self.has_failed():
+            overall = STATUS_FAILED
+        elif self.started_at is None:
+            overall = STATUS_PENDING
+        else:
+            overall = STATUS_LOADING
+        end = self.finished_at or time.perf_counter()
+        return {
+            "status": overall,
+            "warmup_seconds": round(end - self.started_at, 3) if self.started_at else None,
+            "subsystems": {name: dict(entry) for name, entry in self.state.items()},
+        }
+
+
+# Subsystems the CV-side analysis endpoints need; the CV index only gates /api/cvs/rank
+ANALYSIS_SUBSYSTEMS = ["market_data", "skill_extractor"]
+
+skills_gap_warmup = SubsystemWarmup({
+    "market_data": _load_market_data,
+    "skill_extractor": _load_skill_extractor,
+    "cv_index": _load_cv_index,
+})
@@ -102,9 +102,12 @@ export async function analyzeStructuredCV(
   formData.append('cv_file', cvFile);
   formData.append('job_description', jobDescription);
 
+  // Signed-in users get the structured CV stored under their account
+  const token = localStorage.getItem('token');
   const response = await fetch(`${API_BASE_URL}/analyze-structured`, {
     method: 'POST',
     body: formData,
+    headers: token ? { Authorization: `Bearer ${token}` } : undefined,
   });
 
   if (!response.ok) {
@@ -223,11 +223,13 @@ export interface Analysis {
   structured?: StructuredCV;
 }
 
+/** Reference to the uploaded CV, downloadable from `url` (relative to the server root) */
 export interface OriginalFile {
+  id: string;
   filename: string;
   content_type: string;
-  data: string;
   size: number;
+  url: string;
 }
 
 export interface AnalyzeResponse {